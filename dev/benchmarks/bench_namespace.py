@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the per-example cost of setting up the global namespace.
+
+Every example gets its own copy of its module's namespace, so this cost grows
+with the number of names in the module (e.g. modules that use star imports).
+Examples copy a snapshot of the module namespace that is shared by all
+examples of the module. The original implementation inserted every name of
+the live module namespace into the example namespace, and ``copy`` clones the
+live namespace directly.
+
+Modules that delete names (e.g. helpers removed at the end of the module)
+leave holes in their namespace that make both alternatives slow, because
+neither can use the fast path for cloning compact dicts. Use ``--deleted`` to
+benchmark such modules.
+
+CommandLine:
+    python dev/benchmarks/bench_namespace.py
+    python dev/benchmarks/bench_namespace.py --sizes 1000 100000 --compare
+    python dev/benchmarks/bench_namespace.py --deleted 0.5 --compare
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+import argparse
+import timeit
+import types
+from xdoctest import cache
+from xdoctest import doctest_example
+
+
+def make_module(n_names, deleted=0.0):
+    module = types.ModuleType('bench_namespace_module')
+    n_total = int(n_names / (1 - deleted))
+    for i in range(n_total):
+        setattr(module, 'name_{}'.format(i), i)
+    for i in range(n_total - n_names):
+        delattr(module, 'name_{}'.format(i))
+    return module
+
+
+def _update_test_globals(self):
+    # The original implementation, which inserts every module name into the
+    # example namespace.
+    test_globals = self.global_namespace
+    test_globals.update(self.module.__dict__)
+    compileflags = self._extract_future_flags(test_globals)
+    return test_globals, compileflags
+
+
+def _copy_test_globals(self):
+    # Clones the live module namespace for each example
+    test_globals = self.module.__dict__.copy()
+    for key, value in self.global_namespace.items():
+        test_globals.setdefault(key, value)
+    self.global_namespace = test_globals
+    compileflags = self._extract_future_flags(test_globals)
+    return test_globals, compileflags
+
+
+def bench(sizes, number, func, deleted=0.0):
+    rows = []
+    for n_names in sizes:
+        cache.NAMESPACE_CACHE.clear()
+        example = doctest_example.DocTest('>>> x = 1')
+        example.module = make_module(n_names, deleted)
+
+        def setup_example():
+            example.global_namespace = {}
+            func(example)
+
+        seconds = min(timeit.repeat(setup_example, number=number,
+                                    repeat=3)) / number
+        rows.append((n_names, seconds))
+    return rows
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    argparser.add_argument('--sizes', type=int, nargs='+',
+                           default=[10, 100, 1000, 10000, 100000])
+    argparser.add_argument('--number', type=int, default=100,
+                           help='number of examples timed per size')
+    argparser.add_argument('--deleted', type=float, default=0.0,
+                           help='fraction of the module names that were deleted')
+    argparser.add_argument('--compare', action='store_true',
+                           help='also time the update and copy based setups')
+    args = argparser.parse_args()
+
+    methods = [('snapshot', doctest_example.DocTest._test_globals)]
+    if args.compare:
+        methods.append(('update', _update_test_globals))
+        methods.append(('copy', _copy_test_globals))
+
+    for name, func in methods:
+        print('method = {}'.format(name))
+        print('{:>8} {:>16}'.format('names', 'usec / example'))
+        for n_names, seconds in bench(args.sizes, args.number, func,
+                                      args.deleted):
+            print('{:>8} {:>16.2f}'.format(n_names, 1e6 * seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark how the time to parse a doctest scales with its length.
+
+Long generated doctests (e.g. hundreds of lines of data literals) used to take
+quadratic time to parse. The time per line reported here should stay roughly
+constant as the number of lines grows.
+
+CommandLine:
+    python dev/benchmarks/bench_parser.py
+    python dev/benchmarks/bench_parser.py --sizes 100 200 400 800 --compare
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+import argparse
+import timeit
+from xdoctest import parser
+from xdoctest import static_analysis as static
+
+
+def make_doctest(n_lines):
+    """
+    Creates a doctest with roughly ``n_lines`` lines of source that is
+    dominated by a single long data literal.
+    """
+    lines = []
+    lines.append('>>> # a comment before the data')
+    lines.append(">>> text = '''")
+    lines.append('... some text in a multi-line string')
+    lines.append("... '''")
+    lines.append('>>> data = [')
+    for i in range(max(n_lines - 8, 1)):
+        lines.append('...     {{"key": {0}, "value": [{0}, {0}]}},'.format(i))
+    lines.append('... ]')
+    lines.append('>>> len(data) > 0')
+    lines.append('True')
+    return '\n'.join(lines)
+
+
+def _use_balanced_interval_search(lines):
+    # forces the parser to use the original quadratic search
+    raise SyntaxError('benchmarking the fallback')
+
+
+def bench(sizes, number):
+    self = parser.DoctestParser()
+    rows = []
+    for n_lines in sizes:
+        docsrc = make_doctest(n_lines)
+        seconds = min(timeit.repeat(lambda: self.parse(docsrc),
+                                    number=number, repeat=3)) / number
+        rows.append((n_lines, seconds))
+    return rows
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    argparser.add_argument('--sizes', type=int, nargs='+',
+                           default=[50, 100, 200, 400, 800, 1600])
+    argparser.add_argument('--number', type=int, default=3,
+                           help='number of parses timed per size')
+    argparser.add_argument('--compare', action='store_true',
+                           help='also time the original balanced interval search')
+    args = argparser.parse_args()
+
+    engines = [('tokenize', static.logical_line_starts,
+                 parser._find_balanced_extent)]
+    if args.compare:
+        engines.append(('balanced', _use_balanced_interval_search,
+                        lambda *args: None))
+
+    orig = static.logical_line_starts, parser._find_balanced_extent
+    try:
+        for name, starts_func, extent_func in engines:
+            static.logical_line_starts = starts_func
+            parser._find_balanced_extent = extent_func
+            print('engine = {}'.format(name))
+            print('{:>8} {:>12} {:>14}'.format('lines', 'seconds', 'usec / line'))
+            for n_lines, seconds in bench(args.sizes, args.number):
+                print('{:>8} {:>12.5f} {:>14.2f}'.format(
+                    n_lines, seconds, 1e6 * seconds / n_lines))
+    finally:
+        static.logical_line_starts, parser._find_balanced_extent = orig
+
+
+if __name__ == '__main__':
+    main()
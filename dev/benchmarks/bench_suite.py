@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite used to catch timing regressions between versions.
+
+Synthetic packages of varied shape are generated in a temporary directory and
+the main stages of xdoctest are timed separately on each of them:
+
+    * package_calldefs - statically finding the docstrings of a package
+    * parse_doctestables - finding and parsing all examples of a package
+    * DoctestParser.parse - parsing the source of each example
+    * DocTest.run - importing, executing and checking each example
+    * check_output - comparing got and want text (only for corpora with wants)
+
+Each timing is the best of several repeats. The caches that xdoctest keeps for
+the lifetime of a process are emptied before every repeat, so each repeat
+measures what a new ``xdoctest`` process would do. Results are saved as JSON
+so a run can be compared against the results of another version.
+
+CommandLine:
+    python dev/benchmarks/bench_suite.py
+    python dev/benchmarks/bench_suite.py --scale 0.2 --repeat 1
+    python dev/benchmarks/bench_suite.py --out new.json --compare old.json
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+from os.path import join
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import xdoctest
+from xdoctest import cache
+from xdoctest import checker
+from xdoctest import core
+from xdoctest import directive
+from xdoctest import parser
+from xdoctest import utils
+from xdoctest.utils import util_import
+
+
+BENCHMARKS = ['package_calldefs', 'parse_doctestables', 'DoctestParser.parse',
+              'DocTest.run', 'check_output']
+
+
+def _func_source(name, docstr_lines, body='return None'):
+    lines = ['def {}():'.format(name), '    """']
+    lines.extend(('    ' + line).rstrip() for line in docstr_lines)
+    lines.extend(['    """', '    ' + body, '', ''])
+    return '\n'.join(lines)
+
+
+def _small_func(i):
+    return _func_source('func_{}'.format(i), [
+        'Returns a number.',
+        '',
+        'Example:',
+        '    >>> func_{}() + {}'.format(i, i),
+        '    {}'.format(i + 1),
+    ], body='return 1')
+
+
+def make_many_small(scale):
+    """ Many modules with a few short examples each """
+    modules = {}
+    for m in range(int(200 * scale) or 1):
+        modules['small_{}'.format(m)] = ''.join(
+            _small_func(i) for i in range(5))
+    return modules, []
+
+
+def make_huge_modules(scale):
+    """ A few modules with thousands of functions and methods """
+    modules = {}
+    for m in range(3):
+        parts = []
+        for i in range(int(1000 * scale) or 1):
+            parts.append(_small_func(i))
+            if i % 10 == 0:
+                method = _func_source('method', [
+                    'Example:',
+                    '    >>> Class_{}().method()'.format(i),
+                    '    {}'.format(i),
+                ], body='return {}'.format(i)).replace('():', '(self):', 1)
+                parts.append('class Class_{}(object):\n'.format(i))
+                parts.append(utils.indent(method.rstrip()) + '\n\n\n')
+        modules['huge_{}'.format(m)] = ''.join(parts)
+    return modules, []
+
+
+def make_long_doctests(scale):
+    """ Examples with hundreds of lines, including multi-line statements """
+    modules = {}
+    funcs = []
+    for i in range(int(20 * scale) or 1):
+        lines = ['Example:', '    >>> total = 0']
+        for j in range(100):
+            lines.append('    >>> data_{} = {{'.format(j))
+            lines.append("    ...     'key': {},".format(j))
+            lines.append("    ...     'values': [{0}, {0} + 1],".format(j))
+            lines.append('    ... }')
+            lines.append("    >>> total += sum(data_{}['values'])".format(j))
+        lines.append('    >>> total')
+        lines.append('    {}'.format(sum(2 * j + 1 for j in range(100))))
+        funcs.append(_func_source('long_{}'.format(i), lines))
+    modules['long_doctests'] = ''.join(funcs)
+    return modules, []
+
+
+def make_many_wants(scale):
+    """ Examples where most statements are checked against a want """
+    modules = {}
+    funcs = []
+    pairs = []
+    for i in range(int(30 * scale) or 1):
+        lines = ['Example:']
+        for j in range(100):
+            want = 'row {} {}'.format(j, list(range(j % 5)))
+            lines.append("    >>> print('row', {}, list(range({} % 5)))".format(j, j))
+            lines.append('    ' + want)
+            lines.append('    >>> {} * 2'.format(j))
+            lines.append('    {}'.format(j * 2))
+            pairs.append((want + '\n', want))
+        funcs.append(_func_source('wants_{}'.format(i), lines))
+    modules['many_wants'] = ''.join(funcs)
+    return modules, pairs
+
+
+def make_heavy_ellipsis(scale):
+    """ Long outputs that are matched against wants with many ellipses """
+    modules = {}
+    funcs = []
+    pairs = []
+    for i in range(int(30 * scale) or 1):
+        lines = ['Example:']
+        for j in range(20):
+            n = 200 + j
+            got = ' '.join(map(str, range(n)))
+            want = ' ... '.join(str(k) for k in range(0, n, 25)) + ' ...'
+            lines.append("    >>> print(' '.join(map(str, range({}))))".format(n))
+            lines.append('    ' + want)
+            pairs.append((got + '\n', want))
+            got = '\n'.join('line {}'.format(k) for k in range(n))
+            want = 'line 0\n...\nline {}'.format(n - 1)
+            lines.append("    >>> print('\\\\n'.join('line {{}}'.format(k) "
+                         "for k in range({})))".format(n))
+            lines.extend('    ' + line for line in want.split('\n'))
+            pairs.append((got + '\n', want))
+        funcs.append(_func_source('ellipsis_{}'.format(i), lines))
+    modules['heavy_ellipsis'] = ''.join(funcs)
+    return modules, pairs
+
+
+CORPORA = [
+    ('many_small', make_many_small),
+    ('huge_modules', make_huge_modules),
+    ('long_doctests', make_long_doctests),
+    ('many_wants', make_many_wants),
+    ('heavy_ellipsis', make_heavy_ellipsis),
+]
+
+
+def write_package(dpath, pkgname, modules):
+    pkgpath = join(dpath, pkgname)
+    utils.ensuredir(pkgpath)
+    with io.open(join(pkgpath, '__init__.py'), 'w', encoding='utf8') as file:
+        file.write('')
+    for modname, source in modules.items():
+        with io.open(join(pkgpath, modname + '.py'), 'w', encoding='utf8') as file:
+            file.write(source)
+    return pkgpath
+
+
+def best_of(func, repeat):
+    """
+    Returns the fastest of ``repeat`` calls to ``func`` in seconds. The
+    process-level caches are reset before each call.
+    """
+    times = []
+    for _ in range(repeat):
+        _fresh_caches()
+        tic = time.time()
+        func()
+        times.append(time.time() - tic)
+    return min(times)
+
+
+def _fresh_caches():
+    # A new process has not compiled, parsed, normalized or searched anything
+    # yet. Imported modules are kept: importing is not what we time.
+    cache.CODE_CACHE = cache.CodeCache()
+    cache.NAMESPACE_CACHE.clear()
+    cache.ParseCache._SHARED.clear()
+    checker._NORMALIZED_WANT_CACHE.clear()
+    directive._OPTPARTS_CACHE.clear()
+    directive._DIRECTIVE_CACHE.clear()
+    directive._MODNAME_EXISTS_CACHE.clear()
+    util_import._SYSPATH_INDEX = util_import._SysPathIndex()
+
+
+def _run_all(examples):
+    for example in examples:
+        summary = example.run(verbose=0, on_error='return')
+        if not summary['passed']:
+            raise AssertionError('benchmark example failed: {}\n{}'.format(
+                example, '\n'.join(example.repr_failure())))
+
+
+def bench_corpus(pkgpath, pairs, benchmarks, repeat):
+    results = {}
+
+    if 'package_calldefs' in benchmarks:
+        results['package_calldefs'] = best_of(
+            lambda: list(core.package_calldefs(pkgpath)), repeat)
+
+    if 'parse_doctestables' in benchmarks:
+        results['parse_doctestables'] = best_of(
+            lambda: list(core.parse_doctestables(pkgpath, style='auto')),
+            repeat)
+
+    examples = list(core.parse_doctestables(pkgpath, style='auto'))
+    if not examples:
+        raise AssertionError('benchmark corpus has no examples')
+    results['n_examples'] = len(examples)
+
+    if 'DoctestParser.parse' in benchmarks:
+        self = parser.DoctestParser()
+        docsrcs = [example.docsrc for example in examples]
+        results['DoctestParser.parse'] = best_of(
+            lambda: [self.parse(docsrc) for docsrc in docsrcs], repeat)
+
+    if 'DocTest.run' in benchmarks:
+        for example in examples:
+            example.mode = 'native'
+        # The first run imports the modules, which is not what we time
+        _run_all(examples)
+        results['DocTest.run'] = best_of(lambda: _run_all(examples), repeat)
+
+    if 'check_output' in benchmarks and pairs:
+        runstate = directive.RuntimeState()
+        for got, want in pairs:
+            assert checker.check_output(got, want, runstate), (got, want)
+        results['n_checks'] = len(pairs)
+        results['check_output'] = best_of(
+            lambda: [checker.check_output(got, want, runstate)
+                     for got, want in pairs], repeat)
+    return results
+
+
+def _git_revision():
+    dpath = os.path.dirname(os.path.abspath(__file__))
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=dpath,
+                                      stderr=subprocess.STDOUT)
+    except Exception:
+        return None
+    return out.decode('utf8').strip()
+
+
+def run_suite(corpora, benchmarks, scale, repeat):
+    temp = utils.TempDir()
+    dpath = temp.ensure()
+    sys.path.insert(0, dpath)
+    report = {
+        'meta': {
+            'xdoctest_version': xdoctest.__version__,
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'scale': scale,
+            'repeat': repeat,
+        },
+        'results': {},
+    }
+    try:
+        for name, make in CORPORA:
+            if name not in corpora:
+                continue
+            modules, pairs = make(scale)
+            pkgpath = write_package(dpath, 'bench_' + name, modules)
+            print('benchmarking {} ({} modules)'.format(name, len(modules)))
+            results = bench_corpus(pkgpath, pairs, benchmarks, repeat)
+            report['results'][name] = results
+            for key in BENCHMARKS:
+                if key in results:
+                    print('    {:<22} {:>10.4f}s'.format(key, results[key]))
+    finally:
+        sys.path.remove(dpath)
+        temp.cleanup()
+    return report
+
+
+def print_comparison(report, baseline):
+    """
+    Prints the ratio of each timing to the same timing in a baseline report.
+    Ratios above 1 are slower than the baseline.
+    """
+    print('')
+    print('compared to {} ({})'.format(
+        baseline['meta'].get('xdoctest_version'),
+        baseline['meta'].get('git_revision')))
+    print('{:<16} {:<22} {:>10} {:>10} {:>7}'.format(
+        'corpus', 'benchmark', 'baseline', 'current', 'ratio'))
+    for name, results in report['results'].items():
+        old_results = baseline['results'].get(name, {})
+        for key in BENCHMARKS:
+            if key in results and key in old_results:
+                old, new = old_results[key], results[key]
+                ratio = new / old if old else float('nan')
+                print('{:<16} {:<22} {:>10.4f} {:>10.4f} {:>7.2f}'.format(
+                    name, key, old, new, ratio))
+
+
+def main():
+    corpus_names = [name for name, _ in CORPORA]
+    argparser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    argparser.add_argument('--scale', type=float, default=1.0,
+                           help='multiplies the size of every corpus')
+    argparser.add_argument('--repeat', type=int, default=3,
+                           help='number of repeats timed per benchmark')
+    argparser.add_argument('--corpora', nargs='+', default=corpus_names,
+                           choices=corpus_names)
+    argparser.add_argument('--benchmarks', nargs='+', default=BENCHMARKS,
+                           choices=BENCHMARKS)
+    argparser.add_argument('--out', default='xdoctest-bench.json',
+                           help='path to write the JSON results to')
+    argparser.add_argument('--compare', default=None,
+                           help='JSON results of a previous run to compare to')
+    args = argparser.parse_args()
+
+    report = run_suite(args.corpora, args.benchmarks, args.scale, args.repeat)
+
+    with io.open(args.out, 'w', encoding='utf8') as file:
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if not isinstance(text, type('')):  # nocover
+            text = text.decode('utf8')
+        file.write(text)
+    print('wrote results to {}'.format(args.out))
+
+    if args.compare:
+        with io.open(args.compare, 'r', encoding='utf8') as file:
+            baseline = json.load(file)
+        print_comparison(report, baseline)
+
+
+if __name__ == '__main__':
+    main()
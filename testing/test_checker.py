@@ -50,3 +50,17 @@ def test_blankline_not_accept():
     got = 'foo\n\nbar'
     want = 'foo\n<BLANKLINE>\nbar'
     assert not checker.check_output(got, want, runstate)
+
+
+def test_normalized_want_cache():
+    # The normalized want is reused, but depends on the runtime state
+    want = 'foo   bar\n<BLANKLINE>\n'
+    got = 'foo bar\n\n'
+    runstate = directive.RuntimeState({'NORMALIZE_WHITESPACE': True})
+    assert checker.check_output(got, want, runstate)
+    assert checker.check_output(got, want, runstate)
+    runstate = directive.RuntimeState({'NORMALIZE_WHITESPACE': False})
+    assert not checker.check_output(got, want, runstate)
+    runstate = directive.RuntimeState({'DONT_ACCEPT_BLANKLINE': True,
+                                       'NORMALIZE_WHITESPACE': True})
+    assert not checker.check_output(got, want, runstate)
@@ -499,6 +499,123 @@ def test_backwards_compat_indent_value():
     assert status['passed']
 
 
+def test_parse_cache():
+    """
+    A warm run should reuse cached parses until the module changes
+
+    CommandLine:
+        xdoctest -m ~/code/xdoctest/testing/test_core.py test_parse_cache
+    """
+    from xdoctest import static_analysis as static
+    temp = utils.TempDoctest('>>> x = 1')
+    cache_dpath = join(temp.dpath, 'cache')
+    cold = list(core.parse_doctestables(temp.modpath, cache_dpath=cache_dpath))
+    assert len(cold) == 1
+
+    def _parse_calldefs(*args, **kwargs):
+        raise AssertionError('the cache should have been used')
+
+    orig = static.parse_calldefs
+    static.parse_calldefs = _parse_calldefs
+    try:
+        warm = list(core.parse_doctestables(temp.modpath,
+                                            cache_dpath=cache_dpath))
+        assert [e.node for e in warm] == [e.node for e in cold]
+
+        # Modifying the file should invalidate the cache
+        with open(temp.modpath, 'w') as file:
+            file.write('"""\n>>> x = 1\n>>> y = 2\n"""\n')
+        try:
+            list(core.parse_doctestables(temp.modpath, cache_dpath=cache_dpath))
+        except AssertionError:
+            pass
+        else:
+            raise AssertionError('a stale cache entry was used')
+    finally:
+        static.parse_calldefs = orig
+
+    changed = list(core.parse_doctestables(temp.modpath,
+                                           cache_dpath=cache_dpath))
+    assert changed[0].format_src() != cold[0].format_src()
+
+
+def test_parse_parallel():
+    """
+    Parsing with workers gives the same examples, order, and warnings as a
+    serial parse.
+
+    CommandLine:
+        xdoctest -m ~/code/xdoctest/testing/test_core.py test_parse_parallel
+    """
+    import pytest
+    import warnings
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'test_parse_parallel')
+        utils.ensuredir(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        for i in range(6):
+            with open(join(dpath, 'mod{}.py'.format(i)), 'w') as file:
+                file.write(utils.codeblock(
+                    '''
+                    def func{0}():
+                        """
+                        >>> x = {0}
+                        """
+
+                    def other{0}():
+                        """
+                        >>> y = {0}
+                        """
+                    ''').format(i))
+        with open(join(dpath, 'no_doctests.py'), 'w') as file:
+            file.write('x = 1')
+        with open(join(dpath, 'bad_syntax.py'), 'w') as file:
+            file.write('def func(:\n    """\n    >>> x = 1\n    """\n')
+        with open(join(dpath, 'bad_doctest.py'), 'w') as file:
+            file.write('def func():\n    """\n    >>> x = (\n    """\n')
+
+        def _parse(**kwargs):
+            stats = {}
+            with warnings.catch_warnings(record=True) as recorded:
+                warnings.simplefilter('always')
+                with utils.CaptureStdout():
+                    examples = list(core.parse_doctestables(
+                        dpath, style='freeform', stats=stats, **kwargs))
+            messages = [str(warn.message).split('\n')[0] for warn in recorded]
+            return [e.node for e in examples], messages, stats
+
+        serial = _parse()
+        parallel = _parse(workers=3)
+        assert len(serial[0]) == 12
+        assert len(serial[1]) == 2
+        assert serial[2]['n_prefiltered'] == 2
+        assert parallel == serial
+
+        with pytest.raises(SyntaxError), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            list(core.parse_doctestables(dpath, ignore_syntax_errors=False,
+                                         workers=2))
+
+
+def test_parse_parallel_single_module(monkeypatch):
+    """
+    A single module is parsed without starting any pools.
+
+    CommandLine:
+        pytest testing/test_core.py::test_parse_parallel_single_module
+    """
+    import multiprocessing
+
+    def _no_pool(*args, **kwargs):
+        raise AssertionError('no pool should be started')
+
+    monkeypatch.setattr(multiprocessing, 'Pool', _no_pool)
+    temp = utils.TempDoctest('>>> x = 1')
+    examples = list(core.parse_doctestables(temp.modpath, workers=2))
+    assert len(examples) == 1
+
+
 if __name__ == '__main__':
     """
     CommandLine:
@@ -35,6 +35,27 @@ def test_block_skip_directive():
     assert result['passed']
 
 
+
+def test_cached_directive_warnings():
+    """
+    Unknown directives warn every time they are extracted, even though the
+    parsed text is cached.
+
+    pytest testing/test_directive.py::test_cached_directive_warnings
+    """
+    import warnings
+    from xdoctest import directive
+    text = "print('#')  # xdoctest: +NOT_A_DIRECTIVE, +SKIP"
+    for _ in range(2):
+        with warnings.catch_warnings(record=True) as record:
+            warnings.simplefilter('always')
+            found = list(directive.Directive.extract(text))
+        assert [str(d) for d in found] == ['<Directive(+SKIP)>']
+        assert found[0].inline
+        assert len(record) == 1
+        assert 'NOT_A_DIRECTIVE' in str(record[0].message)
+
+
 if __name__ == '__main__':
     """
     CommandLine:
@@ -282,6 +282,195 @@ def test_want_error_msg_failure():
         self.run(on_error='raise')
 
 
+def test_module_namespace_isolation():
+    """
+    Examples see the names in their module, but never modify the module or
+    each other's namespaces.
+
+    pytest testing/test_doctest_example.py::test_module_namespace_isolation
+    """
+    import types
+    module = types.ModuleType('test_module_namespace_isolation')
+    module.shared = 'from module'
+
+    example1 = doctest_example.DocTest(docsrc=utils.codeblock(
+        '''
+        >>> assert shared == 'from module'
+        >>> assert extra == 'from namespace'
+        >>> leaked = True
+        >>> shared = 'changed'
+        '''))
+    example1.module = module
+    example1.global_namespace.update({'extra': 'from namespace',
+                                      'shared': 'overwritten by module'})
+    assert example1.run(on_error='raise')['passed']
+
+    example2 = doctest_example.DocTest(docsrc=utils.codeblock(
+        '''
+        >>> assert shared == 'from module'
+        >>> assert 'leaked' not in globals()
+        '''))
+    example2.module = module
+    assert example2.run(on_error='raise')['passed']
+    assert example2.global_namespace is not example1.global_namespace
+
+    assert module.shared == 'from module'
+    assert not hasattr(module, 'leaked')
+
+    # Names added to the module after its first example are seen
+    module.added = 'later'
+    example3 = doctest_example.DocTest(docsrc=utils.codeblock(
+        '''
+        >>> assert added == 'later'
+        >>> assert shared == 'from module'
+        '''))
+    example3.module = module
+    assert example3.run(on_error='raise')['passed']
+
+
+def test_reuse_compiled_code():
+    """
+    pytest testing/test_doctest_example.py::test_reuse_compiled_code
+    """
+    from xdoctest import cache
+    string = utils.codeblock(
+        '''
+        >>> x = y + 1
+        >>> print(x)
+        3
+        ''')
+    global_exec = 'y = 2'
+
+    self = doctest_example.DocTest(docsrc=string, callname='reuse1')
+    self.config['global_exec'] = global_exec
+    assert self.run(on_error='raise')['passed']
+    n_codes = len(cache.CODE_CACHE._codes)
+    part_codes = [cache.CODE_CACHE._codes[key]
+                  for key in cache.CODE_CACHE._codes
+                  if key[2] == '<doctest:' + self.node + '>']
+    assert len(part_codes) == 2
+    # The global exec code is compiled with the node of the example
+    global_key = (global_exec, 'exec', '<doctest:' + self.node + ':global_exec>')
+    assert sum(key[0:3] == global_key for key in cache.CODE_CACHE._codes) == 1
+
+    # Running the same example again does not compile anything new
+    assert self.run(on_error='raise')['passed']
+    assert len(cache.CODE_CACHE._codes) == n_codes
+
+    # Other examples compile their own code
+    other = doctest_example.DocTest(docsrc=string, callname='reuse2')
+    other.config['global_exec'] = global_exec
+    assert other.run(on_error='raise')['passed']
+    assert len(cache.CODE_CACHE._codes) == n_codes + 3
+
+
+
+def test_stream_large_output():
+    """
+    python testing/test_doctest_example.py test_stream_large_output
+    """
+    string = utils.codeblock(
+        """
+        >>> print('unmatched')
+        >>> for i in range(2000):
+        ...     print('row', i)
+        unmatched
+        row 0
+        ...
+        row 1999
+        >>> for i in range(2000):
+        ...     print('row', i)
+        row 0
+        row 2
+        ...
+        """)
+    # Without streaming all of the output is kept
+    self = doctest_example.DocTest(docsrc=string, callname='stream')
+    self.config['stream_threshold'] = 0
+    assert not self.run(on_error='return')['passed']
+    assert len(self.logged_stdout[2]) > 15000
+
+    self = doctest_example.DocTest(docsrc=string, callname='stream')
+    self.config['stream_threshold'] = 100
+    assert not self.run(on_error='return')['passed']
+    assert self.failed_part is self._parts[2]
+    # Only a window of the failing output is kept
+    got = self.exc_info[1].got
+    assert got.startswith('row 0\nrow 1\n')
+    assert 'characters omitted' in got
+    assert len(got) < 3 * checker.STREAM_CONTEXT
+    assert self.logged_stdout[2] == got
+    # The first part was not streamed because of the unmatched output
+    assert len(self.logged_stdout[1]) > 15000
+
+
+def test_cleanup_when_raising():
+    """
+    pytest testing/test_doctest_example.py::test_cleanup_when_raising
+    """
+    import pytest
+    import signal
+    import threading
+    if not hasattr(signal, 'setitimer'):
+        pytest.skip('requires signal.setitimer')
+    try:
+        import tracemalloc
+    except ImportError:
+        tracemalloc = None
+    string = utils.codeblock(
+        """
+        >>> # xdoctest: +TIMEOUT(10)
+        >>> raise ValueError('failure')
+        """)
+    prev_handler = signal.getsignal(signal.SIGALRM)
+    thread = threading.current_thread()
+    orig_name = thread.name
+    # A renamed main thread can still use SIGALRM
+    thread.name = 'renamed'
+    try:
+        self = doctest_example.DocTest(docsrc=string, callname='cleanup')
+        self.config['tracemalloc'] = tracemalloc is not None
+        with utils.TempDir() as temp:
+            self.config['profile_dpath'] = temp.dpath
+            with pytest.raises(ValueError):
+                self.run(on_error='raise')
+    finally:
+        thread.name = orig_name
+    # The alarm, profiler and capture are cleaned up by the raising run
+    assert signal.getsignal(signal.SIGALRM) is prev_handler
+    if tracemalloc is not None:
+        assert not tracemalloc.is_tracing()
+    assert len(self.profile_fpaths) > 0
+
+
+def test_spilled_part_output():
+    """
+    Large output of a part is kept in the spill file instead of memory.
+
+    pytest testing/test_doctest_example.py::test_spilled_part_output
+    """
+    string = utils.codeblock(
+        """
+        >>> for i in range(1000):
+        ...     print('row', i)
+        >>> print('x' * 500)
+        xxx...
+        >>> assert False
+        """)
+    self = doctest_example.DocTest(docsrc=string, callname='spilled')
+    self.config['capture_memory'] = 100
+    self.config['stream_threshold'] = 0
+    assert not self.run(on_error='return')['passed']
+    # Parts that were not checked are never read from the file
+    assert isinstance(self.logged_stdout[0], utils.SpilledText)
+    assert len(self.logged_stdout[0]) == len(''.join(
+        'row {}\n'.format(i) for i in range(1000)))
+    # Their text is still available to report the failure
+    text = '\n'.join(self.repr_failure())
+    assert 'row 999' in text
+    assert self.failed_part is self._parts[2]
+
+
 if __name__ == '__main__':
     """
     CommandLine:
@@ -387,3 +387,38 @@ def test_modpath_to_modname():
             assert '_tmproot.sub1.mod1' not in sys.modules
             assert '_tmproot.sub1.sub2' not in sys.modules
             assert '_tmproot.sub1.mod2.mod2' not in sys.modules
+
+
+def test_modname_to_modpath_index():
+    """
+    Modules created or removed after a directory was indexed are resolved
+    the same as they would be without the index.
+
+    CommandLine:
+        pytest testing/test_import.py::test_modname_to_modpath_index
+    """
+    import os
+    from xdoctest.utils import util_import
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        sys_path = [dpath]
+        assert util_import._syspath_modname_to_modpath(
+            '_tmpindexed', sys_path=sys_path) is None
+
+        # Force the directory mtime to change even on coarse filesystems
+        modpath = touch((dpath, '_tmpindexed.py'))
+        stat = os.stat(dpath)
+        os.utime(dpath, (stat.st_atime, stat.st_mtime + 10))
+        found = util_import._syspath_modname_to_modpath(
+            '_tmpindexed', sys_path=sys_path)
+        assert found == modpath
+
+        os.remove(modpath)
+        assert util_import._syspath_modname_to_modpath(
+            '_tmpindexed', sys_path=sys_path) is None
+
+        # Changing the search path changes the candidate directories
+        pkg = utils.ensuredir((dpath, 'other'))
+        touch((pkg, '_tmpindexed.py'))
+        assert util_import._syspath_modname_to_modpath(
+            '_tmpindexed', sys_path=[pkg, dpath]) == join(pkg, '_tmpindexed.py')
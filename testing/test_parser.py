@@ -737,6 +737,73 @@ def test_gh_issue_25_parsing_failure():
     assert len(parts) == 1
 
 
+def test_single_pass_matches_balanced_search():
+    """
+    The single tokenize pass used to find statements must agree with the
+    original search for balanced intervals.
+
+    CommandLine:
+        xdoctest -m ~/code/xdoctest/testing/test_parser.py test_single_pass_matches_balanced_search
+    """
+    from xdoctest import static_analysis as static
+    string = utils.codeblock(
+        '''
+        >>> # a comment
+        >>> x = """
+        ... # not a comment
+        ... """
+        >>> data = [
+        >>> # inside the literal
+        ...     {'a': (1, 2)},
+        ...     {'b': [3, 4]},
+        ... ]
+        >>> @staticmethod
+        ... def foo():
+        ...     # inner comment
+        ...     return 1
+        >>> len(data)
+        2
+        ''')
+    self = parser.DoctestParser()
+    source_lines = string.splitlines()[:-1]
+    fast = self._locate_ps1_linenos(source_lines)
+    fast_parts = [(p.source, p.want) for p in self.parse(string)]
+
+    def _use_balanced_search(lines):
+        raise SyntaxError('force the fallback')
+
+    orig_starts = static.logical_line_starts
+    orig_extent = parser._find_balanced_extent
+    static.logical_line_starts = _use_balanced_search
+    parser._find_balanced_extent = lambda *args: None
+    try:
+        slow = self._locate_ps1_linenos(source_lines)
+        slow_parts = [(p.source, p.want) for p in self.parse(string)]
+    finally:
+        static.logical_line_starts = orig_starts
+        parser._find_balanced_extent = orig_extent
+    assert fast == slow
+    assert fast_parts == slow_parts
+
+
+def test_long_data_literal():
+    """
+    Long generated doctests should parse in linear time
+
+    CommandLine:
+        xdoctest -m ~/code/xdoctest/testing/test_parser.py test_long_data_literal
+    """
+    lines = ['>>> data = [']
+    lines += ['...     {{"key": {0}, "value": [{0}, {0}]}},'.format(i)
+              for i in range(2000)]
+    lines += ['... ]', '>>> len(data)', '2000']
+    string = '\n'.join(lines)
+    self = parser.DoctestParser()
+    parts = self.parse(string)
+    assert len(parts) == 2
+    assert parts[1].want == '2000'
+
+
 if __name__ == '__main__':
     """
     CommandLine:
@@ -262,6 +262,100 @@ class TestXDoctest(object):
         reprec = testdir.inline_run(p, "--xdoctest-modules", *EXTRA_ARGS)
         reprec.assertoutcome(skipped=1, failed=0, passed=0)
 
+    def test_xdoctest_changed(self, testdir):
+        """
+        CommandLine:
+            pytest testing/test_plugin.py::TestXDoctest::test_xdoctest_changed
+        """
+        p = testdir.makepyfile('''
+            def add_one(x):
+                """
+                >>> add_one(1)
+                2
+                """
+                return x + 1
+
+            def add_two(x):
+                """
+                >>> add_two(1)
+                4
+                """
+                return x + 2
+        ''')
+        args = ["--xdoctest-modules", "--xdoctest-changed"] + EXTRA_ARGS
+        reprec = testdir.inline_run(p, *args)
+        reprec.assertoutcome(failed=1, passed=1)
+        # Only the failing doctest is collected again
+        reprec = testdir.inline_run(p, *args)
+        reprec.assertoutcome(failed=1, passed=0)
+
+    def test_xdoctest_phase_times(self, testdir):
+        """
+        CommandLine:
+            pytest testing/test_plugin.py::TestXDoctest::test_xdoctest_phase_times
+        """
+        p = testdir.makepyfile('''
+            def add_one(x):
+                """
+                >>> add_one(1)
+                2
+                """
+                return x + 1
+        ''')
+        args = ["--xdoctest-modules", "--xdoctest-phase-times"] + EXTRA_ARGS
+        result = testdir.runpytest(p, *args)
+        result.stdout.fnmatch_lines([
+            '*xdoctest phase times*',
+            'phase *seconds*percent',
+            'parse *',
+            'exec *',
+            'check *',
+            '*1 passed*',
+        ])
+
+    def test_xdoctest_shards(self, testdir):
+        """
+        CommandLine:
+            pytest testing/test_plugin.py::TestXDoctest::test_xdoctest_shards
+        """
+        p = testdir.makepyfile('''
+            def f1():
+                """
+                >>> x = 1
+                """
+
+            def f2():
+                """
+                >>> x = 2
+                """
+
+            def f3():
+                """
+                >>> x = 3
+                """
+        ''')
+        args = ["--xdoctest-modules"] + EXTRA_ARGS
+        # Durations are only recorded with a cache directory
+        reprec = testdir.inline_run(p, *args)
+        reprec.assertoutcome(passed=3)
+        assert not testdir.tmpdir.join('.xdoctest_cache').check()
+        reprec = testdir.inline_run(p, '--xdoctest-cache-dir', *args)
+        reprec.assertoutcome(passed=3)
+        assert testdir.tmpdir.join('.xdoctest_cache', 'durations.json').check()
+
+        n_passed = 0
+        for shard_id in range(2):
+            reprec = testdir.inline_run(p, '--xdoctest-num-shards=2',
+                                        '--xdoctest-shard-id={}'.format(shard_id),
+                                        *args)
+            passed, skipped, failed = reprec.listoutcomes()
+            assert len(passed) in {1, 2}
+            n_passed += len(passed)
+        assert n_passed == 3
+
+        result = testdir.runpytest(p, '--xdoctest-shard-id=0', *args)
+        result.stderr.fnmatch_lines(['*must be given together*'])
+
     def test_doctest_unexpected_exception(self, testdir):
         """
         CommandLine:
@@ -984,6 +1078,50 @@ class TestXDoctestModuleLevel(object):
             assert isinstance(items[0].parent, XDoctestModule)
             assert items[0].parent is items[1].parent
 
+    def test_collect_module_lazy_examples(self, testdir):
+        """
+        Examples are not parsed during collection, only when they run.
+
+        CommandLine:
+            pytest testing/test_plugin.py::TestXDoctestModuleLevel::test_collect_module_lazy_examples
+        """
+        path = testdir.makepyfile(whatever="""
+            def google():
+                '''
+                Example:
+                    >>> x = 1
+                    >>> x
+                    1
+
+                Example:
+                    >>> x = (
+                '''
+            def freeform():
+                '''
+                >>> y = 2
+
+                >>> y
+                2
+                '''
+        """)
+        args = ['--xdoc', '--xdoc-style=auto'] + EXTRA_ARGS
+        items, reprec = testdir.inline_genitems(path, *args)
+        assert [item.name for item in items] == [
+            'google:0', 'google:1', 'freeform:0']
+        assert all(item.example is None for item in items)
+        assert [item.location[1] for item in items] == [4, 9, 13]
+
+        # the malformed example errors instead of failing the module
+        reprec = testdir.inline_run(path, *args)
+        reprec.assertoutcome(passed=2, failed=1)
+        failed = reprec.getfailures()[0]
+        assert failed.when == 'setup'
+        assert 'unable to parse doctest' in str(failed.longrepr)
+
+        result = testdir.runpytest(path, *args)
+        result.stdout.fnmatch_lines(['*ERROR at setup of *google:1*',
+                                     '*unable to parse doctest*'])
+
 
 class TestLiterals(object):
 
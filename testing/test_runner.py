@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 from os.path import join
+import json
+import os
+import six
 from xdoctest import utils
 
 
@@ -63,6 +66,53 @@ def test_zero_args():
                                        'zero_args3', 'zero_args4'])
 
 
+
+def test_runner_prefilter():
+    """
+    Files without a doctest prompt are skipped before they are parsed, but
+    zero-arg functions in them can still be run.
+
+    pytest testing/test_runner.py::test_runner_prefilter -s
+    """
+    from xdoctest import runner
+
+    source1 = utils.codeblock(
+        '''
+        def zero_args():
+            print('running ' + 'zero_args')
+        ''')
+
+    source2 = utils.codeblock(
+        '''
+        def foo():
+            """
+                Example:
+                    >>> print('output from ' + 'foo')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'test_runner_prefilter')
+        utils.ensuredir(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        with open(join(dpath, 'mod1.py'), 'w') as file:
+            file.write(source1)
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source2)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(dpath, 'all', argv=[''])
+        assert run_summary['n_passed'] == 1
+        assert 'skipped parsing 2 / 3 file(s) without doctests' in cap.text
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(join(dpath, 'mod1.py'),
+                                                'zero-args', argv=[''])
+        assert run_summary['n_passed'] == 1
+        assert 'running zero_args' in cap.text
+
+
 def test_list():
     from xdoctest import runner
 
@@ -332,6 +382,894 @@ def test_runner_config():
     assert 'SKIPPED' in cap.text
 
 
+def test_runner_jobs():
+    """
+    pytest testing/test_runner.py::test_runner_jobs -s
+    """
+    from xdoctest import runner
+
+    source1 = utils.codeblock(
+        '''
+        def foo():
+            """
+                Example:
+                    >>> print('output from ' + 'foo')
+            """
+
+        def bar():
+            """
+                Example:
+                    >>> assert False, 'bar' + ' fails'
+            """
+        ''')
+
+    source2 = utils.codeblock(
+        '''
+        def baz():
+            """
+                Example:
+                    >>> print('output from ' + 'baz')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'test_runner_jobs')
+        utils.ensuredir(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        with open(join(dpath, 'mod1.py'), 'w') as file:
+            file.write(source1)
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source2)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(dpath, 'all', argv=[''],
+                                                jobs=2)
+
+    assert run_summary['n_passed'] == 2
+    assert run_summary['n_failed'] == 1
+    assert 'output from foo' in cap.text
+    assert 'output from baz' in cap.text
+    # the failure is reported in the consolidated summary
+    assert 'bar fails' in cap.text
+    assert '=== Found 1 errors ===' in cap.text
+    assert '1 failed, 2 passed' in cap.text
+
+
+def test_runner_maxfail():
+    """
+    pytest testing/test_runner.py::test_runner_maxfail -s
+    """
+    from xdoctest import runner
+
+    source1 = utils.codeblock(
+        '''
+        def first():
+            """
+                Example:
+                    >>> assert False, 'first' + ' fails'
+            """
+
+        def second():
+            """
+                Example:
+                    >>> assert False, 'second' + ' fails'
+            """
+
+        def passes():
+            """
+                Example:
+                    >>> x = 1
+            """
+        ''')
+
+    source2 = utils.codeblock(
+        '''
+        def third():
+            """
+                Example:
+                    >>> assert False, 'third' + ' fails'
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'test_runner_maxfail')
+        utils.ensuredir(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        with open(join(dpath, 'mod1.py'), 'w') as file:
+            file.write(source1)
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source2)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(dpath, 'all', argv=[''],
+                                                maxfail=2)
+        assert run_summary['n_failed'] == 2
+        assert len(run_summary['times']) == 2
+        assert 'Stopping after 2 failure(s)' in cap.text
+        # the failures so far are reported in the consolidated summary
+        assert '=== Found 2 errors ===' in cap.text
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(dpath, 'all', argv=[''],
+                                                maxfail=1, jobs=2)
+        assert run_summary['n_failed'] == 1
+        assert 'Stopping after 1 failure(s)' in cap.text
+
+        if hasattr(os, 'fork'):
+            # The child running the first module stops at its first failure
+            with utils.CaptureStdout() as cap:
+                run_summary = runner.doctest_module(dpath, 'all', argv=[''],
+                                                    maxfail=1, isolate='fork')
+            assert run_summary['n_failed'] == 1
+            assert len(run_summary['times']) == 1
+
+
+def test_runner_report():
+    """
+    pytest testing/test_runner.py::test_runner_report -s
+    """
+    from xdoctest import runner
+    import json
+    import xml.etree.ElementTree as ET
+
+    source1 = utils.codeblock(
+        '''
+        def foo():
+            """
+                Example:
+                    >>> print('output from ' + 'foo')
+            """
+
+        def bar():
+            """
+                Example:
+                    >>> x = 1
+                    >>> assert False, 'bar' + ' fails'
+            """
+        ''')
+
+    source2 = utils.codeblock(
+        '''
+        def baz():
+            """
+                Example:
+                    >>> print('output from ' + 'baz')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'test_runner_report')
+        utils.ensuredir(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        with open(join(dpath, 'mod1.py'), 'w') as file:
+            file.write(source1)
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source2)
+
+        for jobs in [None, 2]:
+            jsonl_fpath = join(temp.dpath, 'report.jsonl')
+            with utils.CaptureStdout():
+                runner.doctest_module(dpath, 'all', argv=[''], jobs=jobs,
+                                      report_format='jsonl',
+                                      report_file=jsonl_fpath)
+            with open(jsonl_fpath, 'r') as file:
+                records = [json.loads(line) for line in file]
+            assert [r['type'] for r in records] == ['example'] * 3 + ['summary']
+            nodes = {r['node'].split('::')[1]: r for r in records[0:3]}
+            assert nodes['foo:0']['outcome'] == 'passed'
+            assert nodes['foo:0']['stdout'] == 'output from foo\n'
+            assert nodes['foo:0']['failed_lineno'] is None
+            assert nodes['bar:0']['outcome'] == 'failed'
+            assert nodes['bar:0']['failed_lineno'] == 11
+            assert 'bar fails' in nodes['bar:0']['failure']
+            assert all(r['duration'] >= 0 for r in records[0:3])
+            assert records[-1]['n_failed'] == 1
+
+            junit_fpath = join(temp.dpath, 'junit.xml')
+            with utils.CaptureStdout():
+                runner.doctest_module(dpath, 'all', argv=[''], jobs=jobs,
+                                      report_file=junit_fpath)
+            suite = ET.parse(junit_fpath).getroot()
+            assert suite.get('tests') == '3'
+            assert suite.get('failures') == '1'
+            cases = {case.get('name'): case for case in suite.findall('testcase')}
+            assert 'bar fails' in cases['bar:0'].find('failure').text
+            assert cases['baz:0'].find('system-out').text == 'output from baz\n'
+
+
+def test_runner_phase_times():
+    """
+    pytest testing/test_runner.py::test_runner_phase_times -s
+    """
+    from xdoctest import runner
+    from xdoctest import doctest_example
+
+    source = utils.codeblock(
+        '''
+        def foo():
+            """
+                Example:
+                    >>> print('output from ' + 'foo')
+                    output from foo
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_runner_phase_times.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                durations=0, phase_times=True)
+
+    phase_times = run_summary['phase_times']
+    assert list(phase_times.keys()) == list(doctest_example.PHASES)
+    assert phase_times['exec'] > 0
+    assert phase_times['check'] > 0
+    assert '=== Time spent in each phase ===' in cap.text
+    assert 'exec=' in cap.text
+
+
+def test_runner_profile():
+    """
+    pytest testing/test_runner.py::test_runner_profile -s
+    """
+    from xdoctest import runner
+    from xdoctest import doctest_example
+
+    source = utils.codeblock(
+        '''
+        def foo():
+            """
+                Example:
+                    >>> def make():
+                    ...     return list(map(str, range(1000)))
+                    >>> # xdoctest: +PROFILE
+                    >>> y = make()
+                    >>> # xdoctest: -PROFILE
+                    >>> z = 2
+
+                Example:
+                    >>> print('not profiled')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_runner_profile.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+        dpath = join(temp.dpath, 'profiles')
+        config = doctest_example.Config()
+        config['profile_dpath'] = dpath
+
+        with utils.CaptureStdout() as cap:
+            runner.doctest_module(modpath, 'all', argv=[''], config=config)
+        assert 'Wrote profiles of 1 example(s)' in cap.text
+        assert sorted(os.listdir(dpath)) == [
+            'test_runner_profile.foo_0.prof.txt',
+            'test_runner_profile.foo_0.pstats']
+        with open(join(dpath, 'test_runner_profile.foo_0.prof.txt')) as file:
+            text = file.read()
+        # Code in the doctest is attributed to its line in the module
+        assert '>:4(make)' in text
+        assert '>:7(<module>)' in text
+        # The time limit of the example is not part of the profile
+        assert '(arm)' not in text
+        assert '(disarm)' not in text
+
+        # Options profile every example
+        config['profile_top'] = 5
+        config['tracemalloc'] = True
+        with utils.CaptureStdout() as cap:
+            runner.doctest_module(modpath, 'all', argv=[''], config=config)
+        assert 'Wrote profiles of 2 example(s)' in cap.text
+        with open(join(dpath, 'test_runner_profile.foo_0.alloc.txt')) as file:
+            text = file.read()
+        assert 'Top 5 doctest lines' in text
+        assert '>:5\n' in text
+        assert os.path.exists(join(dpath, 'test_runner_profile.foo_1.pstats'))
+
+
+def test_runner_isolate_fork():
+    """
+    pytest testing/test_runner.py::test_runner_isolate_fork -s
+    """
+    import pytest
+    from xdoctest import runner
+    from xdoctest import cache
+    if not hasattr(os, 'fork'):
+        pytest.skip('requires os.fork')
+
+    source = utils.codeblock(
+        '''
+        STATE = []
+
+        def mutate():
+            """
+                Example:
+                    >>> STATE.append(1)
+                    >>> assert STATE == [1]
+            """
+
+        def check():
+            """
+                Example:
+                    >>> assert STATE == []
+            """
+
+        def crash():
+            """
+                Example:
+                    >>> import os
+                    >>> os._exit(3)
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_runner_isolate.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                isolate='fork-example')
+        assert run_summary['n_passed'] == 2
+        assert run_summary['n_failed'] == 1
+        assert 'isolated process exited with status 3' in cap.text
+        # The module was imported by this process, but never modified
+        module = cache.MODULE_CACHE.import_module(modpath)
+        assert module.STATE == []
+
+        # Examples of a module share one child, which crashes at the end
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                isolate='fork')
+        assert run_summary['n_failed'] == 3
+        assert module.STATE == []
+
+
+def test_runner_clears_passing_output():
+    """
+    pytest testing/test_runner.py::test_runner_clears_passing_output -s
+    """
+    from xdoctest import runner
+    source = utils.codeblock(
+        '''
+        def passing():
+            """
+                Example:
+                    >>> print('passing output ' * 10)
+            """
+
+        def failing():
+            """
+                Example:
+                    >>> print('failing output ' * 10)
+                    >>> assert False
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_runner_clears.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        # The capture of each example spills to a file after 50 characters
+        config = {'capture_memory': 50}
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                config=config)
+        assert run_summary['n_passed'] == 1
+        assert run_summary['n_failed'] == 1
+        examples = {example.callname: example
+                    for example in run_summary['times']}
+        assert not any(examples['passing'].logged_stdout.values())
+        assert six.text_type(examples['failing'].logged_stdout[0]) == 'failing output ' * 10 + '\n'
+        assert 'failing output failing output' in cap.text
+
+
+def test_runner_timeout():
+    """
+    pytest testing/test_runner.py::test_runner_timeout -s
+    """
+    import pytest
+    import signal
+    from xdoctest import runner
+    if not hasattr(signal, 'setitimer'):
+        pytest.skip('requires signal.setitimer')
+    source = utils.codeblock(
+        '''
+        def hangs():
+            """
+                Example:
+                    >>> import time
+                    >>> print('partial output')
+                    >>> while True:
+                    ...     time.sleep(0.01)
+            """
+
+        def swallows():
+            """
+                Example:
+                    >>> # xdoctest: +TIMEOUT(0.1)
+                    >>> import time
+                    >>> while True:
+                    ...     try:
+                    ...         time.sleep(0.01)
+                    ...     except Exception:
+                    ...         pass
+            """
+
+        def quick():
+            """
+                Example:
+                    >>> x = 1
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_runner_timeout.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        config = {'timeout': 0.3}
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                config=config)
+        assert run_summary['n_passed'] == 1
+        assert run_summary['n_failed'] == 2
+        assert run_summary['n_timed_out'] == 2
+        assert '2 failed (2 timed out)' in cap.text
+        examples = {example.callname: example
+                    for example in run_summary['times']}
+        hangs = examples['hangs']
+        assert hangs.timed_out
+        assert hangs.logged_stdout[0] == 'partial output\n'
+        assert hangs.failed_lineno() == 7
+        assert 'DoctestTimeout' in '\n'.join(hangs.repr_failure())
+
+
+def test_runner_timeout_watchdog(monkeypatch):
+    """
+    pytest testing/test_runner.py::test_runner_timeout_watchdog -s
+    """
+    import pytest
+    import signal
+    from xdoctest import runner
+    if not hasattr(os, 'fork') or not hasattr(signal, 'pthread_sigmask'):
+        pytest.skip('requires os.fork and signal.pthread_sigmask')
+    source = utils.codeblock(
+        '''
+        def blocked():
+            """
+                Example:
+                    >>> import signal, time
+                    >>> _ = signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGALRM])
+                    >>> while True:
+                    ...     time.sleep(0.01)
+            """
+
+        def quick():
+            """
+                Example:
+                    >>> x = 1
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_runner_watchdog.py')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        # The alarm cannot interrupt the child, so it is killed instead
+        monkeypatch.setattr(runner, '_WATCHDOG_GRACE', 0.2)
+        config = {'timeout': 0.2}
+        with utils.CaptureStdout() as cap:
+            run_summary = runner.doctest_module(modpath, 'all', argv=[''],
+                                                config=config,
+                                                isolate='fork-example')
+        assert run_summary['n_passed'] == 1
+        assert run_summary['n_timed_out'] == 1
+        assert 'isolated process was killed after 0.40 seconds' in cap.text
+
+
+def test_runner_changed():
+    """
+    pytest testing/test_runner.py::test_runner_changed -s
+    """
+    from xdoctest import runner
+
+    source1 = utils.codeblock(
+        '''
+        def foo():
+            """
+                Example:
+                    >>> print('output from ' + 'foo')
+            """
+
+        def bar():
+            """
+                Example:
+                    >>> assert False, 'bar' + ' fails'
+            """
+        ''')
+
+    source2 = utils.codeblock(
+        '''
+        def baz():
+            """
+                Example:
+                    >>> print('output from ' + 'baz')
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'test_runner_changed')
+        cache_dpath = join(temp.dpath, 'cache')
+        utils.ensuredir(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        with open(join(dpath, 'mod1.py'), 'w') as file:
+            file.write(source1)
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source2)
+
+        def _run():
+            with utils.CaptureStdout() as cap:
+                run_summary = runner.doctest_module(
+                    dpath, 'all', argv=[''], cache_dpath=cache_dpath,
+                    changed=True)
+            return run_summary, cap.text
+
+        # Everything runs the first time
+        run_summary, text = _run()
+        assert run_summary['n_total'] == 3
+
+        # Only the failing example runs while nothing changes
+        run_summary, text = _run()
+        assert run_summary['n_total'] == 1
+        assert run_summary['n_failed'] == 1
+        assert 'deselected 2 unchanged example(s)' in text
+
+        # Changing a module reruns its examples
+        with open(join(dpath, 'mod2.py'), 'a') as file:
+            file.write('\n# modified\n')
+        run_summary, text = _run()
+        assert run_summary['n_total'] == 2
+        assert 'output from baz' in text
+        assert 'output from foo' not in text
+
+
+def test_runner_last_failed():
+    """
+    pytest testing/test_runner.py::test_runner_last_failed -s
+    """
+    from xdoctest import runner
+
+    source = utils.codeblock(
+        '''
+        def foo():
+            """
+                Example:
+                    >>> print('output from ' + 'foo')
+            """
+
+        def bar():
+            """
+                Example:
+                    >>> print('output from ' + 'bar')
+                    >>> assert FLAG, 'bar' + ' fails'
+            """
+
+        FLAG = False
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_runner_last_failed.py')
+        cache_dpath = join(temp.dpath, 'cache')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        def _run(**kw):
+            with utils.CaptureStdout() as cap:
+                run_summary = runner.doctest_module(
+                    modpath, 'all', argv=[''], cache_dpath=cache_dpath, **kw)
+            return run_summary, cap.text
+
+        # Nothing failed yet, so everything runs
+        run_summary, text = _run(last_failed=True)
+        assert run_summary['n_total'] == 2
+        assert 'no previously failed examples, running all' in text
+
+        run_summary, text = _run(last_failed=True)
+        assert run_summary['n_total'] == 1
+        assert 'output from bar' in text
+        assert 'output from foo' not in text
+        assert 'deselected 1' in text
+
+        run_summary, text = _run(failed_first=True)
+        assert run_summary['n_total'] == 2
+        assert text.index('output from bar') < text.index('output from foo')
+
+        # Failures are not stored without a cache directory or --lf/--ff
+        orig_cwd = os.getcwd()
+        try:
+            os.chdir(temp.dpath)
+            with utils.CaptureStdout():
+                runner.doctest_module(modpath, 'all', argv=[''])
+        finally:
+            os.chdir(orig_cwd)
+        assert not os.path.exists(join(temp.dpath, '.xdoctest_cache'))
+
+        # Once the failure is fixed it is forgotten
+        with open(modpath, 'a') as file:
+            file.write('\nFLAG = True\n')
+        runner._reload_modpath(modpath)
+        run_summary, text = _run(last_failed=True)
+        assert run_summary['n_passed'] == 1
+        run_summary, text = _run(last_failed=True)
+        assert run_summary['n_total'] == 2
+
+
+def test_runner_shards():
+    """
+    pytest testing/test_runner.py::test_runner_shards -s
+    """
+    from xdoctest import runner
+    source = utils.codeblock(
+        '''
+        def slow():
+            """
+                Example:
+                    >>> import time
+                    >>> time.sleep(0.2)
+            """
+
+        def fast1():
+            """
+                Example:
+                    >>> x = 1
+            """
+
+        def fast2():
+            """
+                Example:
+                    >>> x = 2
+            """
+
+        def fast3():
+            """
+                Example:
+                    >>> x = 3
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        modpath = join(temp.dpath, 'test_runner_shards.py')
+        cache_dpath = join(temp.dpath, 'cache')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        def _run(**kw):
+            with utils.CaptureStdout() as cap:
+                run_summary = runner.doctest_module(
+                    modpath, 'all', argv=[''], cache_dpath=cache_dpath, **kw)
+            return run_summary, cap.text
+
+        def _shard_callnames():
+            shards = []
+            for shard_id in range(2):
+                run_summary, text = _run(shard_id=shard_id, num_shards=2)
+                assert 'selected shard {} of 2'.format(shard_id) in text
+                shards.append(sorted(example.callname
+                                     for example in run_summary['times']))
+            assert sorted(shards[0] + shards[1]) == [
+                'fast1', 'fast2', 'fast3', 'slow']
+            return shards
+
+        # Without durations the shards have the same number of examples
+        assert list(map(len, _shard_callnames())) == [2, 2]
+
+        # After a run without shards, the slow example gets its own shard
+        _run()
+        shards = _shard_callnames()
+        assert ['slow'] in shards
+
+        # Sharded runs do not change the durations, so the split is stable
+        assert _shard_callnames() == shards
+
+        import pytest
+        with pytest.raises(ValueError):
+            _run(shard_id=2, num_shards=2)
+
+        # The cache directory does not leak into later runs
+        from xdoctest import cache
+        assert cache.CODE_CACHE.dpath is None
+
+        # Without a cache directory nothing is written
+        orig_cwd = os.getcwd()
+        try:
+            os.chdir(temp.dpath)
+            with utils.CaptureStdout():
+                runner.doctest_module(modpath, 'all', argv=[''])
+        finally:
+            os.chdir(orig_cwd)
+        assert not os.path.exists(join(temp.dpath, '.xdoctest_cache'))
+
+
+def test_runner_watch():
+    """
+    pytest testing/test_runner.py::test_runner_watch -s
+    """
+    from xdoctest import cache
+    from xdoctest import runner
+    from xdoctest import doctest_example
+
+    source1 = utils.codeblock(
+        '''
+        def foo():
+            """
+                Example:
+                    >>> print('output from ' + 'foo')
+            """
+        ''')
+
+    source2 = utils.codeblock(
+        '''
+        VALUE = 1
+
+        def baz():
+            """
+                Example:
+                    >>> print('value is {}'.format(VALUE))
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = join(temp.dpath, 'test_runner_watch')
+        utils.ensuredir(dpath)
+        with open(join(dpath, '__init__.py'), 'w') as file:
+            file.write('')
+        with open(join(dpath, 'mod1.py'), 'w') as file:
+            file.write(source1)
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source2)
+
+        watcher = runner._ModuleWatcher(dpath, exclude=[])
+        with utils.CaptureStdout() as cap:
+            runner.doctest_module(dpath, 'all', argv=[''])
+        assert 'value is 1' in cap.text
+
+        # Nothing is run while nothing changes
+        config = doctest_example.Config()
+        with utils.CaptureStdout() as cap:
+            run_summary = runner._watch_and_rerun(
+                watcher, 'all', 'auto', 3, config, None, interval=0,
+                max_polls=1)
+        assert run_summary is None
+
+        # Only the examples in the changed module are run with its new code
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source2.replace('VALUE = 1', 'VALUE = 2'))
+        report_fpath = join(temp.dpath, 'report.jsonl')
+        with utils.CaptureStdout() as cap:
+            run_summary = runner._watch_and_rerun(
+                watcher, 'all', 'auto', 3, config, None, interval=0,
+                max_polls=1, report_file=report_fpath, phase_times=True)
+        assert run_summary['n_total'] == 1
+        assert run_summary['n_passed'] == 1
+        assert 'value is 2' in cap.text
+        assert 'output from foo' not in cap.text
+        assert 'Time spent in each phase' in cap.text
+
+        # Re-runs are reported
+        with open(report_fpath, 'r') as file:
+            records = [json.loads(line) for line in file]
+        assert [r['callname'] for r in records if r['type'] == 'example'] == [
+            'baz:0']
+        assert records[-1]['type'] == 'summary'
+
+        # The outcomes of re-runs are remembered for --lf
+        cache_dpath = join(temp.dpath, 'cache')
+        failed_state = cache.LastFailedState(cache_dpath)
+        source3 = source2.replace("print('value is {}'.format(VALUE))",
+                                  'assert VALUE == 3')
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source3)
+        with utils.CaptureStdout() as cap:
+            run_summary = runner._watch_and_rerun(
+                watcher, 'all', 'auto', 3, config, None, interval=0,
+                max_polls=1, failed_state=failed_state)
+        assert run_summary['n_failed'] == 1
+        example = run_summary['failed'][0]
+        assert cache.LastFailedState(cache_dpath).is_failed(example)
+
+        with open(join(dpath, 'mod2.py'), 'w') as file:
+            file.write(source3.replace('VALUE = 1', 'VALUE = 3'))
+        with utils.CaptureStdout() as cap:
+            run_summary = runner._watch_and_rerun(
+                watcher, 'all', 'auto', 3, config, None, interval=0,
+                max_polls=1, failed_state=failed_state)
+        assert run_summary['n_passed'] == 1
+        assert not cache.LastFailedState(cache_dpath).is_failed(example)
+
+
+def test_runner_server():
+    """
+    pytest testing/test_runner.py::test_runner_server -s
+    """
+    import socket
+    import subprocess
+    import sys
+    import time
+    import pytest
+    from xdoctest import server
+    if not hasattr(socket, 'AF_UNIX'):
+        pytest.skip('requires Unix sockets')
+
+    source = utils.codeblock(
+        '''
+        VALUE = 1
+
+        def value():
+            """
+                Example:
+                    >>> from test_runner_server import VALUE
+                    >>> print('value is {}'.format(VALUE))
+                    >>> assert VALUE == 1
+            """
+        ''')
+
+    with utils.TempDir() as temp:
+        dpath = temp.dpath
+        modpath = join(dpath, 'test_runner_server.py')
+        socket_fpath = join(dpath, 'server.sock')
+        with open(modpath, 'w') as file:
+            file.write(source)
+
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'xdoctest', '--serve', '--socket',
+             socket_fpath], cwd=dpath)
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_fpath):
+                    break
+                time.sleep(0.1)
+
+            reply = server.request([modpath, 'all'], socket_fpath, cwd=dpath)
+            assert reply['exit_code'] == 0
+            assert '1 passed' in reply['stdout']
+            assert 'value is 1' in reply['stdout']
+            # Requests use the cache directory in the directory of the client
+            assert os.path.exists(join(dpath, '.xdoctest_cache'))
+
+            # The changed module is reloaded before the next request
+            with open(modpath, 'w') as file:
+                file.write(source.replace('VALUE = 1', 'VALUE = 2'))
+            reply = server.request([modpath, 'all'], socket_fpath, cwd=dpath)
+            assert reply['exit_code'] == 1
+            assert 'reloaded 1 changed module(s)' in reply['stdout']
+            assert 'value is 2' in reply['stdout']
+
+            reply = server.request([modpath, '--watch'], socket_fpath)
+            assert reply['exit_code'] == 2
+
+            server.shutdown(socket_fpath)
+            assert proc.wait() == 0
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+        assert not os.path.exists(socket_fpath)
+        with pytest.raises(server.ServerUnavailable):
+            server.request([modpath, 'all'], socket_fpath)
+
+
 if __name__ == '__main__':
     """
     CommandLine:
@@ -8,14 +8,8 @@ This should work even if the target module is unaware of xdoctest.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 
-def main():
-    """
-    python -m xdoctest xdoctest all
-    python -m xdoctest networkx all --options=+IGNORE_WHITESPACE
-    """
-    import sys
+def _build_parser():
     import argparse
-    from os.path import exists
     from xdoctest import utils
 
     parser = argparse.ArgumentParser(
@@ -34,15 +28,60 @@ def main():
             '''))
     parser.add_argument('--version', action='store_true', help='display version info and quit')
 
+    from xdoctest import server
+    parser.add_argument('--serve', action='store_true', help=utils.codeblock(
+        '''
+        Start a server that keeps imported modules and parsed doctests in
+        memory and runs the doctests requested with --client.
+        '''))
+    parser.add_argument('--client', action='store_true', help=utils.codeblock(
+        '''
+        Run the doctests in a server started with --serve. Runs in this
+        process if no server is listening.
+        '''))
+    parser.add_argument('--socket', dest='socket_fpath',
+                        default=server.DEFAULT_SOCKET_FPATH,
+                        help='path of the Unix socket used by --serve and --client')
+
     # The bulk of the argparse CLI is defined in the doctest example
     from xdoctest import doctest_example
     from xdoctest import runner
     runner._update_argparse_cli(parser.add_argument)
     doctest_example.Config()._update_argparse_cli(parser.add_argument)
+    return parser
+
+
+def main(argv=None):
+    """
+    python -m xdoctest xdoctest all
+    python -m xdoctest networkx all --options=+IGNORE_WHITESPACE
+    python -m xdoctest --serve
+    python -m xdoctest --client xdoctest all
+    """
+    import sys
+    from os.path import exists
+    from xdoctest import server
 
-    args, unknown = parser.parse_known_args()
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = _build_parser()
+
+    args, unknown = parser.parse_known_args(argv)
     ns = args.__dict__.copy()
 
+    if ns['serve']:
+        server.serve(ns['socket_fpath'])
+        sys.exit(0)
+
+    if ns['client']:
+        try:
+            exit_code = server.client(server._strip_client_args(argv),
+                                      ns['socket_fpath'])
+        except server.ServerUnavailable as ex:
+            sys.stderr.write('{}, running without the server\n'.format(ex))
+        else:
+            sys.exit(exit_code)
+
     if ns['version']:
         import xdoctest
         print(xdoctest.__version__)
@@ -107,7 +146,20 @@ def main():
 
     run_summary = xdoctest.doctest_module(modname, argv=[command], style=style,
                                           verbose=config['verbose'],
-                                          config=config, durations=durations)
+                                          config=config, durations=durations,
+                                          jobs=ns['jobs'],
+                                          isolate=ns['isolate'],
+                                          maxfail=ns['maxfail'],
+                                          last_failed=ns['last_failed'],
+                                          failed_first=ns['failed_first'],
+                                          shard_id=ns['shard_id'],
+                                          num_shards=ns['num_shards'],
+                                          cache_dpath=ns['cache_dpath'],
+                                          changed=ns['changed'],
+                                          watch=ns['watch'],
+                                          report_format=ns['report_format'],
+                                          report_file=ns['report_file'],
+                                          phase_times=ns['phase_times'])
     n_failed = run_summary.get('n_failed', 0)
     if n_failed > 0:
         sys.exit(1)
@@ -0,0 +1,725 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent on-disk caches that let xdoctest avoid redundant work between runs.
+
+By default the cache lives in a ``.xdoctest_cache`` directory relative to the
+current working directory. Every entry is keyed on the module path and is
+validated against the file's modification time, size, and content hash as
+well as the xdoctest version that wrote it. Stale or unreadable entries are
+simply treated as cache misses.
+
+CommandLine:
+    python -m xdoctest xdoctest all --cache-dir
+    python -m xdoctest xdoctest all --cache-dir=.xdoctest_cache
+    python -m xdoctest xdoctest all --changed
+    python -m xdoctest xdoctest all --lf
+    python -m xdoctest xdoctest all --num-shards 2 --shard-id 0
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+from os.path import abspath
+from os.path import exists
+from os.path import join
+import collections
+import hashlib
+import json
+import marshal
+import os
+import six
+import sys
+from six.moves import cPickle as pickle
+from xdoctest import utils
+
+
+DEFAULT_CACHE_DPATH = '.xdoctest_cache'
+
+
+def _hash_file(fpath):
+    """ Returns the sha1 hexdigest of the contents of a file """
+    hasher = hashlib.sha1()
+    with open(fpath, 'rb') as file:
+        hasher.update(file.read())
+    return hasher.hexdigest()
+
+
+def _hash_text(text):
+    """ Returns the sha1 hexdigest of a string """
+    return hashlib.sha1(text.encode('utf8')).hexdigest()
+
+
+class ParseCache(object):
+    """
+    Caches the statically parsed `CallDefNode` objects and `DocTest` examples
+    of each module so warm runs can skip `ast.parse` and docstring parsing for
+    unchanged files.
+
+    Args:
+        dpath (str): directory to store the cache in.
+            Defaults to `DEFAULT_CACHE_DPATH`.
+
+    Example:
+        >>> from xdoctest.cache import *
+        >>> from xdoctest import static_analysis as static
+        >>> from xdoctest import utils
+        >>> temp = utils.TempDoctest('>>> x = 1')
+        >>> self = ParseCache(join(temp.dpath, 'cache'))
+        >>> assert self.load_calldefs(temp.modpath) is None
+        >>> calldefs = static.parse_calldefs(fpath=temp.modpath)
+        >>> self.save_calldefs(temp.modpath, calldefs)
+        >>> cached = self.load_calldefs(temp.modpath)
+        >>> assert list(cached.keys()) == list(calldefs.keys())
+        >>> # Changing the file invalidates the entry
+        >>> with open(temp.modpath, 'a') as file:
+        ...     _ = file.write('\\ny = 2\\n')
+        >>> assert self.load_calldefs(temp.modpath) is None
+
+    Example:
+        >>> # Each load returns new examples, so running them cannot change
+        >>> # the cached ones
+        >>> from xdoctest.cache import *
+        >>> from xdoctest import core
+        >>> from xdoctest import utils
+        >>> temp = utils.TempDoctest('>>> x = 1')
+        >>> self = ParseCache.shared(join(temp.dpath, 'cache'))
+        >>> assert ParseCache.shared(join(temp.dpath, 'cache')) is self
+        >>> examples = list(core.parse_doctestables(temp.modpath))
+        >>> self.save_examples(temp.modpath, 'auto', examples)
+        >>> loaded = self.load_examples(temp.modpath, 'auto')
+        >>> assert loaded[0] is not self.load_examples(temp.modpath, 'auto')[0]
+    """
+    # instances shared by the session for each cache directory
+    _SHARED = {}
+
+    def __init__(self, dpath=None):
+        if dpath is None:
+            dpath = DEFAULT_CACHE_DPATH
+        self.dpath = dpath
+        # entries that were already read or written in this session
+        self._entries = {}
+
+    @classmethod
+    def shared(cls, dpath=None):
+        """
+        Returns the cache of a directory that is shared by this session, so
+        entries are only read from disk once. Long running processes (e.g.
+        ``xdoctest --serve``) keep the calldefs of every module in memory.
+        """
+        if dpath is None:
+            dpath = DEFAULT_CACHE_DPATH
+        key = abspath(dpath)
+        self = cls._SHARED.get(key, None)
+        if self is None:
+            self = cls._SHARED[key] = cls(dpath)
+        return self
+
+    def _entry_fpath(self, fpath):
+        key = _hash_text(abspath(fpath))
+        return join(self.dpath, 'parse', key + '.pkl')
+
+    def _stamp(self, fpath):
+        """
+        Returns information that identifies the current state of a file
+        """
+        import xdoctest
+        stat = os.stat(fpath)
+        stamp = {
+            'fpath': abspath(fpath),
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'version': xdoctest.__version__,
+        }
+        return stamp
+
+    def _read_entry(self, fpath):
+        """
+        Returns the cache entry for a file if it is still valid, otherwise
+        None.
+        """
+        if not exists(fpath):
+            return None
+        stamp = self._stamp(fpath)
+        entry = self._entries.get(stamp['fpath'], None)
+        if entry is None:
+            entry_fpath = self._entry_fpath(fpath)
+            if not exists(entry_fpath):
+                return None
+            try:
+                with open(entry_fpath, 'rb') as file:
+                    entry = pickle.load(file)
+            except Exception:
+                # corrupted entries are treated as a miss
+                return None
+            self._entries[stamp['fpath']] = entry
+        cached = entry['stamp']
+        if cached['fpath'] != stamp['fpath'] or cached['version'] != stamp['version']:
+            return None
+        if cached['mtime'] != stamp['mtime'] or cached['size'] != stamp['size']:
+            # The file was touched, but its content may still be the same
+            if cached['hash'] != _hash_file(fpath):
+                return None
+            entry['stamp'].update(stamp)
+            self._write_entry(fpath, entry)
+        return entry
+
+    def _write_entry(self, fpath, entry):
+        self._entries[entry['stamp']['fpath']] = entry
+        entry_fpath = self._entry_fpath(fpath)
+        utils.ensuredir(join(self.dpath, 'parse'))
+        try:
+            with open(entry_fpath, 'wb') as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:  # nocover
+            # failing to write a cache is never fatal
+            if exists(entry_fpath):
+                os.remove(entry_fpath)
+
+    def _new_entry(self, fpath):
+        stamp = self._stamp(fpath)
+        stamp['hash'] = _hash_file(fpath)
+        return {'stamp': stamp, 'calldefs': None, 'examples': {}}
+
+    def load_calldefs(self, fpath):
+        """
+        Returns:
+            OrderedDict | None: the cached calldefs or None on a cache miss
+        """
+        entry = self._read_entry(fpath)
+        if entry is None:
+            return None
+        return entry['calldefs']
+
+    def save_calldefs(self, fpath, calldefs):
+        """
+        Stores calldefs for a file. Any examples cached for a previous version
+        of the file are discarded.
+        """
+        entry = self._read_entry(fpath)
+        if entry is None:
+            entry = self._new_entry(fpath)
+        entry['calldefs'] = calldefs
+        self._write_entry(fpath, entry)
+
+    def load_examples(self, fpath, style):
+        """
+        Returns:
+            List[DocTest] | None: the examples parsed from the file in a
+                particular style or None on a cache miss.
+        """
+        entry = self._read_entry(fpath)
+        if entry is None:
+            return None
+        data = entry['examples'].get(style, None)
+        if not isinstance(data, bytes):
+            return None
+        # Examples are kept pickled, because running them changes their state
+        examples = pickle.loads(data)
+        from xdoctest import doctest_example
+        for example in examples:
+            # Runtime configuration is not part of the cache
+            example.config = doctest_example.Config()
+        return examples
+
+    def save_examples(self, fpath, style, examples):
+        """
+        Stores the examples parsed from a file in a particular style.
+        """
+        entry = self._read_entry(fpath)
+        if entry is None:
+            entry = self._new_entry(fpath)
+        entry['examples'][style] = pickle.dumps(
+            examples, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write_entry(fpath, entry)
+
+
+class ChangedState(object):
+    """
+    Records a content hash and the last outcome of every example that was run,
+    so later runs can select only the examples that changed or did not pass.
+
+    An example is considered changed if its docstring source or anything else
+    in its module was modified since it last passed.
+
+    Args:
+        dpath (str): directory to store the state file in.
+            Defaults to `DEFAULT_CACHE_DPATH`.
+
+    Example:
+        >>> from xdoctest.cache import *
+        >>> from xdoctest import core
+        >>> from xdoctest import utils
+        >>> temp = utils.TempDoctest('>>> x = 1')
+        >>> self = ChangedState(join(temp.dpath, 'cache'))
+        >>> example = list(core.parse_doctestables(temp.modpath))[0]
+        >>> assert self.is_changed(example)
+        >>> self.record(example, passed=True)
+        >>> self.save()
+        >>> self = ChangedState(join(temp.dpath, 'cache'))
+        >>> assert not self.is_changed(example)
+        >>> self.record(example, passed=False)
+        >>> assert self.is_changed(example)
+    """
+    def __init__(self, dpath=None):
+        if dpath is None:
+            dpath = DEFAULT_CACHE_DPATH
+        self.dpath = dpath
+        self.fpath = join(dpath, 'changed.json')
+        self.records = self._load()
+        # module hashes are only computed once per session
+        self._module_hashes = {}
+
+    def _load(self):
+        if not exists(self.fpath):
+            return {}
+        try:
+            with open(self.fpath, 'r') as file:
+                data = json.load(file)
+        except Exception:
+            # A corrupted state file means everything is run again
+            return {}
+        import xdoctest
+        if data.get('version', None) != xdoctest.__version__:
+            return {}
+        return data.get('records', {})
+
+    def _module_hash(self, modpath):
+        if modpath not in self._module_hashes:
+            if exists(modpath):
+                self._module_hashes[modpath] = _hash_file(modpath)
+            else:
+                self._module_hashes[modpath] = None
+        return self._module_hashes[modpath]
+
+    def _example_hash(self, example):
+        return _hash_text(example.docsrc or '')
+
+    def is_changed(self, example):
+        """
+        Returns:
+            bool: False only if the example passed on its last run and neither
+                it nor its module changed since then.
+        """
+        record = self.records.get(example.node, None)
+        if record is None or not record['passed']:
+            return True
+        module_hash = self._module_hash(example.modpath)
+        if module_hash is None or record['module_hash'] != module_hash:
+            return True
+        return record['hash'] != self._example_hash(example)
+
+    def record(self, example, passed):
+        """
+        Remembers the outcome of running an example
+        """
+        self.records[example.node] = {
+            'hash': self._example_hash(example),
+            'module_hash': self._module_hash(example.modpath),
+            'passed': bool(passed),
+        }
+
+    def save(self):
+        import xdoctest
+        data = {
+            'version': xdoctest.__version__,
+            'records': self.records,
+        }
+        utils.ensuredir(self.dpath)
+        try:
+            with open(self.fpath, 'w') as file:
+                json.dump(data, file, indent=0, sort_keys=True)
+        except Exception:  # nocover
+            # failing to write the state is never fatal
+            if exists(self.fpath):
+                os.remove(self.fpath)
+
+
+class LastFailedState(object):
+    """
+    Remembers the examples that failed when they were last run, so later runs
+    can run only them or run them first.
+
+    Each failure is stored with its node id and command line. Examples are
+    matched to stored failures with :attr:`DocTest.valid_testnames`, the same
+    way the native runner matches a test name given on the command line.
+
+    Args:
+        dpath (str): directory to store the state file in.
+            Defaults to `DEFAULT_CACHE_DPATH`.
+
+    Example:
+        >>> from xdoctest.cache import *
+        >>> from xdoctest import core
+        >>> from xdoctest import utils
+        >>> temp = utils.TempDoctest('>>> x = 1')
+        >>> self = LastFailedState(join(temp.dpath, 'cache'))
+        >>> example = list(core.parse_doctestables(temp.modpath))[0]
+        >>> assert not self.is_failed(example)
+        >>> self.record(example, passed=False)
+        >>> self.save()
+        >>> self = LastFailedState(join(temp.dpath, 'cache'))
+        >>> assert self.is_failed(example)
+        >>> assert list(self.records) == [example.node]
+        >>> self.record(example, passed=True)
+        >>> assert not self.is_failed(example)
+    """
+    def __init__(self, dpath=None):
+        if dpath is None:
+            dpath = DEFAULT_CACHE_DPATH
+        self.dpath = dpath
+        self.fpath = join(dpath, 'lastfailed.json')
+        self.records = self._load()
+        self._dirty = False
+        # the failed test names of each module, built when first needed
+        self._testnames = None
+
+    def _load(self):
+        if not exists(self.fpath):
+            return {}
+        try:
+            with open(self.fpath, 'r') as file:
+                data = json.load(file)
+        except Exception:
+            # A corrupted state file forgets the previous failures
+            return {}
+        import xdoctest
+        if data.get('version', None) != xdoctest.__version__:
+            return {}
+        return data.get('records', {})
+
+    def __len__(self):
+        return len(self.records)
+
+    def is_failed(self, example):
+        """
+        Returns:
+            bool: True if the example failed when it was last run
+        """
+        if self._testnames is None:
+            self._testnames = {}
+            for record in self.records.values():
+                self._testnames.setdefault(record['modpath'], set()).add(
+                    record['testname'])
+        testnames = self._testnames.get(example.modpath, None)
+        return bool(testnames) and not testnames.isdisjoint(
+            example.valid_testnames)
+
+    def record(self, example, passed):
+        """
+        Remembers the outcome of running an example
+        """
+        self._testnames = None
+        if passed:
+            if self.records.pop(example.node, None) is not None:
+                self._dirty = True
+        elif example.node not in self.records:
+            self.records[example.node] = {
+                'modpath': example.modpath,
+                'testname': example.unique_callname,
+                'cmdline': example.cmdline,
+            }
+            self._dirty = True
+
+    def save(self):
+        """
+        Writes the state file if any failure was added or removed
+        """
+        if not self._dirty:
+            return
+        import xdoctest
+        data = {
+            'version': xdoctest.__version__,
+            'records': self.records,
+        }
+        utils.ensuredir(self.dpath)
+        try:
+            with open(self.fpath, 'w') as file:
+                json.dump(data, file, indent=0, sort_keys=True)
+        except Exception:  # nocover
+            # failing to write the state is never fatal
+            if exists(self.fpath):
+                os.remove(self.fpath)
+        self._dirty = False
+
+
+class DurationState(object):
+    """
+    Records how many seconds each example took when it was last run. These
+    are used to balance the shards of a run (see :mod:`xdoctest.sharding`).
+
+    Durations are stored by a key that is the same on every machine, and are
+    kept across xdoctest versions so every machine splits the examples the
+    same way after an upgrade.
+
+    Args:
+        dpath (str): directory to store the state file in.
+            Defaults to `DEFAULT_CACHE_DPATH`.
+
+    Example:
+        >>> from xdoctest.cache import *
+        >>> from xdoctest import utils
+        >>> temp = utils.TempDir()
+        >>> self = DurationState(join(temp.ensure(), 'cache'))
+        >>> assert self.durations == {}
+        >>> self.record('mod::func:0', 0.25)
+        >>> self.save()
+        >>> self = DurationState(join(temp.dpath, 'cache'))
+        >>> assert self.durations == {'mod::func:0': 0.25}
+    """
+    def __init__(self, dpath=None):
+        if dpath is None:
+            dpath = DEFAULT_CACHE_DPATH
+        self.dpath = dpath
+        self.fpath = join(dpath, 'durations.json')
+        self.durations = self._load()
+        self._dirty = False
+
+    def _load(self):
+        if not exists(self.fpath):
+            return {}
+        try:
+            with open(self.fpath, 'r') as file:
+                data = json.load(file)
+            return dict(data['durations'])
+        except Exception:
+            # A corrupted state file means examples are balanced by count
+            return {}
+
+    def record(self, key, seconds):
+        """
+        Remembers the time it took to run an example
+        """
+        self.durations[key] = seconds
+        self._dirty = True
+
+    def save(self):
+        """
+        Writes the state file if any duration was recorded
+        """
+        if not self._dirty:
+            return
+        utils.ensuredir(self.dpath)
+        try:
+            with open(self.fpath, 'w') as file:
+                json.dump({'durations': self.durations}, file, indent=0,
+                          sort_keys=True)
+        except Exception:  # nocover
+            # failing to write the state is never fatal
+            if exists(self.fpath):
+                os.remove(self.fpath)
+        self._dirty = False
+
+
+def _python_magic():
+    """ Identifies the bytecode format of this interpreter """
+    if six.PY2:  # nocover
+        import imp
+        return imp.get_magic()
+    else:
+        import importlib.util
+        return importlib.util.MAGIC_NUMBER
+
+
+# Number of compiled code objects kept in memory by a CodeCache
+DEFAULT_MAX_CODES = 8192
+
+
+class CodeCache(object):
+    """
+    Caches code objects compiled from doctest sources, so examples that are
+    run more than once in a session are only compiled once.
+
+    Code objects are keyed on their source, compile mode, filename, and
+    compiler flags. If ``dpath`` is specified, they are also persisted as
+    marshal blobs and reused by later sessions of the same interpreter.
+    Only the most recently used code objects are kept in memory.
+
+    Args:
+        dpath (str): directory to persist compiled code in. Defaults to None,
+            which only caches in memory.
+        max_codes (int): number of code objects kept in memory.
+
+    Example:
+        >>> from xdoctest.cache import *
+        >>> from xdoctest import utils
+        >>> self = CodeCache()
+        >>> code1 = self.compile('x = 1', 'exec', '<doctest:example>')
+        >>> code2 = self.compile('x = 1', 'exec', '<doctest:example>')
+        >>> assert code1 is code2
+        >>> assert self.compile('x = 1', 'single', '<doctest:example>') is not code1
+        >>> # Persisted code is reused by new caches
+        >>> temp = utils.TempDir()
+        >>> dpath = temp.ensure()
+        >>> code3 = CodeCache(dpath).compile('y = 2', 'exec', '<doctest:example>')
+        >>> code4 = CodeCache(dpath).compile('y = 2', 'exec', '<doctest:example>')
+        >>> assert code3 == code4
+        >>> # The least recently used code is dropped first
+        >>> self = CodeCache(max_codes=2)
+        >>> code1 = self.compile('x = 1', 'exec', '<doctest:example>')
+        >>> code2 = self.compile('x = 2', 'exec', '<doctest:example>')
+        >>> assert self.compile('x = 1', 'exec', '<doctest:example>') is code1
+        >>> code3 = self.compile('x = 3', 'exec', '<doctest:example>')
+        >>> assert len(self._codes) == 2
+        >>> assert self.compile('x = 1', 'exec', '<doctest:example>') is code1
+        >>> assert self.compile('x = 2', 'exec', '<doctest:example>') is not code2
+    """
+    def __init__(self, dpath=None, max_codes=DEFAULT_MAX_CODES):
+        self.dpath = dpath
+        self.max_codes = max_codes
+        self._codes = collections.OrderedDict()
+
+    def _entry_fpath(self, key):
+        hasher = hashlib.sha1(_python_magic())
+        hasher.update(repr(key).encode('utf8'))
+        return join(self.dpath, 'code', hasher.hexdigest() + '.marshal')
+
+    def _load(self, key):
+        entry_fpath = self._entry_fpath(key)
+        if not exists(entry_fpath):
+            return None
+        try:
+            with open(entry_fpath, 'rb') as file:
+                return marshal.load(file)
+        except Exception:
+            # corrupted entries are treated as a miss
+            return None
+
+    def _save(self, key, code):
+        entry_fpath = self._entry_fpath(key)
+        utils.ensuredir(join(self.dpath, 'code'))
+        try:
+            with open(entry_fpath, 'wb') as file:
+                marshal.dump(code, file)
+        except Exception:  # nocover
+            # failing to write a cache is never fatal
+            if exists(entry_fpath):
+                os.remove(entry_fpath)
+
+    def compile(self, source, mode, filename, flags=0):
+        """
+        Equivalent to the builtin ``compile`` with ``dont_inherit=True``, but
+        returns a cached code object if the same source was already compiled.
+        """
+        key = (source, mode, filename, flags)
+        # Reinserting the code marks it as the most recently used
+        code = self._codes.pop(key, None)
+        if code is None:
+            if self.dpath is not None:
+                code = self._load(key)
+            if code is None:
+                code = compile(source, mode=mode, filename=filename,
+                               flags=flags, dont_inherit=True)
+                if self.dpath is not None:
+                    self._save(key, code)
+            while len(self._codes) >= self.max_codes:
+                self._codes.popitem(last=False)
+        self._codes[key] = code
+        return code
+
+
+# The code cache shared by all examples in this session
+CODE_CACHE = CodeCache()
+
+
+class ModuleCache(object):
+    """
+    Remembers the module imported for each module path, so the examples of a
+    module only resolve and import it once per session.
+
+    An entry is only reused while it is still the module registered in
+    ``sys.modules`` under its name. Modules that were removed or replaced
+    (e.g. by a reload that failed) are imported again.
+
+    Example:
+        >>> from xdoctest.cache import *
+        >>> from xdoctest import utils
+        >>> from os.path import join
+        >>> import sys
+        >>> temp = utils.TempDir()
+        >>> modpath = join(temp.ensure(), 'module_cache_demo.py')
+        >>> _ = open(modpath, 'w').write('x = 1')
+        >>> self = ModuleCache()
+        >>> module = self.import_module(modpath)
+        >>> assert self.import_module(modpath) is module
+        >>> # Modules removed from sys.modules are imported again
+        >>> del sys.modules['module_cache_demo']
+        >>> assert self.import_module(modpath) is not module
+        >>> del sys.modules['module_cache_demo']
+    """
+    def __init__(self):
+        self._modules = {}
+
+    def import_module(self, modpath):
+        module = self._modules.get(modpath, None)
+        if module is None or sys.modules.get(module.__name__) is not module:
+            module = utils.import_module_from_path(modpath, index=-1)
+            self._modules[modpath] = module
+        return module
+
+
+# The modules imported by examples in this session
+MODULE_CACHE = ModuleCache()
+
+
+# Number of module namespaces kept in memory by a NamespaceCache
+DEFAULT_MAX_NAMESPACES = 1024
+
+
+class NamespaceCache(object):
+    """
+    Keeps a snapshot of the namespace of each module whose examples are run,
+    so every example of a module starts from a copy of the same base dict.
+
+    Copying a private snapshot is faster than inserting every name of the
+    live module namespace into a new dict, especially for modules that
+    deleted names and for large namespaces on older interpreters (see
+    ``dev/benchmarks/bench_namespace.py``). Each example still gets its own
+    dict, so examples never see each other's names.
+
+    A snapshot is taken again when its module is replaced or the number of
+    names in the module changes. Module level names that are rebound after a
+    snapshot was taken are not seen by later examples until the snapshot is
+    cleared, which runners do at the start of every run.
+
+    Args:
+        max_namespaces (int): number of module snapshots kept in memory.
+
+    Example:
+        >>> from xdoctest.cache import *
+        >>> import types
+        >>> module = types.ModuleType('namespace_cache_demo')
+        >>> module.x = 1
+        >>> self = NamespaceCache()
+        >>> base = self.snapshot(module)
+        >>> assert base == module.__dict__ and base is not module.__dict__
+        >>> assert self.snapshot(module) is base
+        >>> # Adding or removing module names takes a new snapshot
+        >>> module.y = 2
+        >>> assert self.snapshot(module)['y'] == 2
+        >>> self.clear()
+        >>> assert not self._snapshots
+    """
+    def __init__(self, max_namespaces=DEFAULT_MAX_NAMESPACES):
+        self.max_namespaces = max_namespaces
+        self._snapshots = collections.OrderedDict()
+
+    def snapshot(self, module):
+        """
+        Returns the snapshot of the namespace of ``module``. Callers must copy
+        it before modifying it.
+        """
+        namespace = module.__dict__
+        key = id(module)
+        entry = self._snapshots.pop(key, None)
+        if entry is None or entry[0] is not module or len(entry[1]) != len(namespace):
+            # Copying into a new dict also drops the deleted slots of the
+            # module namespace, so copies of the snapshot are fast.
+            entry = (module, dict(namespace))
+            if len(self._snapshots) >= self.max_namespaces:
+                self._snapshots.popitem(last=False)
+        self._snapshots[key] = entry
+        return entry[1]
+
+    def clear(self):
+        self._snapshots.clear()
+
+
+# The module namespaces that the examples of this session start from
+NAMESPACE_CACHE = NamespaceCache()
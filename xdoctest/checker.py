@@ -17,6 +17,16 @@ ELLIPSIS_MARKER = '...'  # nocover
 
 TRAILING_WS = re.compile(r"[ \t]*$", re.UNICODE | re.MULTILINE)  # nocover
 
+# Parts that write more characters than this are checked while they write
+DEFAULT_STREAM_THRESHOLD = 2 ** 20  # nocover
+
+# Number of characters kept before and after the first mismatch of a
+# StreamingChecker to report the failure with.
+STREAM_CONTEXT = 4096  # nocover
+
+# Minimum number of characters a StreamingChecker buffers before comparing
+_STREAM_BLOCK = 1024  # nocover
+
 
 _EXCEPTION_RE = re.compile(r"""
     # Grab the traceback header.  Different versions of Python have
@@ -259,69 +269,28 @@ def normalize(got, want, runstate=None):
 
     Further extended to also support byte literals.
 
+    The normalized want only depends on the want text and the runtime state,
+    so it is cached and reused when the same part is checked again.
+
     Example:
         >>> want = "...\n(0, 2, {'weight': 1})\n(0, 3, {'weight': 2})"
         >>> got = "(0, 2, {'weight': 1})\n(0, 3, {'weight': 2})"
+        >>> got, want = normalize(got, want)
+        >>> print(got)
+        (0, 2, {'weight': 1}) (0, 3, {'weight': 2})
+        >>> assert want == "... (0, 2, {'weight': 1}) (0, 3, {'weight': 2})"
+
+    Example:
+        >>> # Text overwritten by a carriage return is invisible
+        >>> got, want = normalize("u'a'  \n10%\r100%\n", "'a'\n100%")
+        >>> assert got == want == "'a' 100%"
     """
     if runstate is None:
         runstate = directive.RuntimeState()
 
-    def remove_prefixes(regex, text):
-        return re.sub(regex, r'\1\2', text)
-
-    def visible_text(lines):
-        # TODO: backspaces
-        # Any lines that end with only a carrage return are erased
-        return [line for line in lines if not line.endswith('\r')]
-
-    # Remove terminal colors
-    if True:
-        got = utils.strip_ansi(got)
-        want = utils.strip_ansi(want)
-
-    if True:
-        # normalize python 2/3 byte/unicode prefixes
-        got = remove_prefixes(unicode_literal_re, got)
-        want = remove_prefixes(unicode_literal_re, want)
-
-        # Note: normalizing away prefixes can cause weird "got"
-        # results to print when there is a got-want mismatch.
-        # For instance, if you get {'b': 22} but you want {'b': 2}
-        # this will cause xdoctest to report that you wanted {'': 2}
-        # because it reports the normalized version of the want message
-        got = remove_prefixes(bytes_literal_re, got)
-        want = remove_prefixes(bytes_literal_re, want)
-
-    # Replace <BLANKLINE>s if it is being used.
-    if not runstate['DONT_ACCEPT_BLANKLINE']:
-        want = remove_blankline_marker(want)
-
-    # always remove trailing whitepsace
-    got = re.sub(TRAILING_WS, '', got)
-    want = re.sub(TRAILING_WS, '', want)
-    # normalize endling newlines
-    want = want.rstrip()
-    got = got.rstrip()
-
-    # Always remove invisible text
-    got_lines = got.splitlines(True)
-    want_lines = want.splitlines(True)
-    got_lines = visible_text(got_lines)
-    want_lines = visible_text(want_lines)
-    want = ''.join(want_lines)
-    got = ''.join(got_lines)
-
-    if runstate['NORMALIZE_WHITESPACE'] or runstate['IGNORE_WHITESPACE']:
-
-        # all whitespace normalization
-        # treat newlines and all whitespace as a single space
-        got = ' '.join(got.split())
-        want = ' '.join(want.split())
-
-    if runstate['IGNORE_WHITESPACE']:
-        # Completely remove whitespace
-        got = re.sub(r'\s', '', got, flags=re.MULTILINE)
-        want = re.sub(r'\s', '', want, flags=re.MULTILINE)
+    options = _normalize_options(runstate)
+    got = _normalize_text(got, False, options[1], options[2])
+    want = _normalized_want(want, options)
 
     if runstate['NORMALIZE_REPR']:
         def norm_repr(a, b):
@@ -338,6 +307,80 @@ def normalize(got, want, runstate=None):
     return got, want
 
 
+# Normalized wants keyed by the want text and the normalization options
+_NORMALIZED_WANT_CACHE = {}
+_MAX_NORMALIZED_WANTS = 10000
+
+
+def _normalize_options(runstate):
+    return (
+        not runstate['DONT_ACCEPT_BLANKLINE'],
+        bool(runstate['NORMALIZE_WHITESPACE'] or runstate['IGNORE_WHITESPACE']),
+        bool(runstate['IGNORE_WHITESPACE']),
+    )
+
+
+def _normalized_want(want, options):
+    key = (want, options)
+    normalized_want = _NORMALIZED_WANT_CACHE.get(key, None)
+    if normalized_want is None:
+        normalized_want = _normalize_text(want, *options)
+        if len(_NORMALIZED_WANT_CACHE) > _MAX_NORMALIZED_WANTS:
+            _NORMALIZED_WANT_CACHE.clear()
+        _NORMALIZED_WANT_CACHE[key] = normalized_want
+    return normalized_want
+
+
+def _normalize_text(text, remove_blanklines, normalize_ws, ignore_ws):
+    """
+    Applies all normalizations that only depend on one side of the check.
+
+    Passes that cannot change the text are skipped, and when whitespace is
+    normalized it is done in a single split and join.
+    """
+    # Remove terminal colors
+    if '\x1b' in text or '\x9b' in text:
+        text = utils.strip_ansi(text)
+
+    if "'" in text or '"' in text:
+        # normalize python 2/3 byte/unicode prefixes
+        text = unicode_literal_re.sub(r'\1\2', text)
+        # Note: normalizing away prefixes can cause weird "got"
+        # results to print when there is a got-want mismatch.
+        # For instance, if you get {'b': 22} but you want {'b': 2}
+        # this will cause xdoctest to report that you wanted {'': 2}
+        # because it reports the normalized version of the want message
+        text = bytes_literal_re.sub(r'\1\2', text)
+
+    # Replace <BLANKLINE>s if it is being used.
+    if remove_blanklines and BLANKLINE_MARKER in text:
+        text = remove_blankline_marker(text)
+
+    if '\r' in text:
+        # always remove trailing whitepsace
+        text = TRAILING_WS.sub('', text)
+        # normalize endling newlines
+        text = text.rstrip()
+        # Always remove invisible text
+        # TODO: backspaces
+        # Any lines that end with only a carrage return are erased
+        text = ''.join([line for line in text.splitlines(True)
+                        if not line.endswith('\r')])
+        if normalize_ws:
+            # treat newlines and all whitespace as a single space
+            text = ' '.join(text.split())
+    elif normalize_ws:
+        # Trailing whitespace is removed by the split as well
+        text = ' '.join(text.split())
+    else:
+        text = TRAILING_WS.sub('', text).rstrip()
+
+    if ignore_ws:
+        # Completely remove whitespace
+        text = ''.join(text.split())
+    return text
+
+
 class ExtractGotReprException(AssertionError):
     """
     Exception used when we are unable to extract a string "got"
@@ -486,6 +529,360 @@ class GotWantException(AssertionError):
         return '\n'.join(lines)
 
 
+class StreamingChecker(object):
+    r"""
+    Compares the output of a doctest part against its want while the output is
+    being written.
+
+    This gives the same result as :func:`check_got_vs_want`, but the output
+    is never stored as a whole. Complete lines are normalized and compared as
+    they arrive, with ellipsis segments matched as early as possible. Once the
+    output can no longer match, the comparison stops and only a window of
+    :data:`STREAM_CONTEXT` characters before and after that point is kept.
+    The beginning of the output is always kept as well.
+
+    Args:
+        want (str): target to match against
+        runstate (directive.RuntimeState): runner options
+        context (int): number of characters to keep for the report
+
+    Example:
+        >>> from xdoctest.checker import *
+        >>> want = 'line 0\n...\nline 999'
+        >>> self = StreamingChecker(want, context=20)
+        >>> for i in range(1000):
+        ...     self.feed('line {}\n'.format(i))
+        >>> assert self.finish()
+        >>> self = StreamingChecker('line 0\nline 1\n...', context=20)
+        >>> for i in range(1000):
+        ...     self.feed('line {}\n'.format(i * 2))
+        >>> assert self.failed
+        >>> import pytest
+        >>> with pytest.raises(GotWantException) as exc_info:
+        ...     self.finish()
+        >>> print(exc_info.value.got.splitlines()[0:3])
+        ['line 0', 'line 2', 'line 4']
+        >>> assert len(exc_info.value.got) < 200
+    """
+
+    def __init__(self, want, runstate=None, context=STREAM_CONTEXT):
+        if runstate is None:
+            runstate = directive.RuntimeState()
+        self.want = want
+        self.runstate = runstate
+        self.context = context
+        self.options = _normalize_options(runstate)
+        self.started = False
+        self.failed = False
+        self.n_chars = 0
+
+        self._ellipsis = bool(runstate['ELLIPSIS'])
+        self._norm_want = _normalized_want(want, self.options)
+        # got == want is checked before any normalization
+        self._raw = _StreamMatch(want, ellipsis=False)
+        self._match = _StreamMatch(self._norm_want, self._ellipsis)
+        # NORMALIZE_REPR may remove the quotes around the output
+        self._unquoted = None
+        self._quote = None
+        self._held = ''
+        self._n_emitted = 0
+
+        self._chunks = []
+        self._n_chunks = 0
+        self._pending = []
+        self._n_pending = 0
+        self._next_process = _STREAM_BLOCK
+
+        self._head = ''
+        self._before = []
+        self._n_before = 0
+        self._after = None
+        self._n_fail = None
+
+    @staticmethod
+    def supports(want, runstate):
+        """
+        Returns False if checking ``want`` needs the complete output.
+
+        When NORMALIZE_REPR is on, a want quoted at both ends may be compared
+        without its quotes depending on the output, which is not known
+        until the end.
+        """
+        norm_want = _normalized_want(want, _normalize_options(runstate))
+        if runstate['NORMALIZE_REPR'] and norm_want[:1] in ('"', "'"):
+            if norm_want.endswith(norm_want[0]):
+                return False
+        return True
+
+    def feed(self, text):
+        """
+        Compares the next chunk of output
+        """
+        self.started = True
+        self._chunks.append(text)
+        self._n_chunks += len(text)
+        if self._n_chunks >= _STREAM_BLOCK:
+            self._flush()
+
+    def _flush(self):
+        # Writes are batched to keep the cost of each small write low
+        text = ''.join(self._chunks)
+        self._chunks = []
+        self._n_chunks = 0
+        # Stop at the first mismatch and keep the context around it
+        for i in range(0, len(text), _STREAM_BLOCK):
+            self._feed(text[i:i + _STREAM_BLOCK])
+
+    def _feed(self, text):
+        self.n_chars += len(text)
+        if len(self._head) < self.context:
+            self._head += text[:self.context - len(self._head)]
+        if self._after is not None:
+            # Keep the context after the mismatch and ignore the rest
+            if len(self._after) < self.context:
+                self._after += text[:self.context - len(self._after)]
+            return
+
+        self._before.append(text)
+        self._n_before += len(text)
+        if self._n_before > 2 * self.context:
+            before = ''.join(self._before)[-self.context:]
+            self._before = [before]
+            self._n_before = len(before)
+
+        self._raw.feed(text)
+        self._pending.append(text)
+        self._n_pending += len(text)
+        if self._n_pending >= self._next_process:
+            self._process(final=False)
+
+    @property
+    def text(self):
+        """
+        The output kept to report a failure with
+        """
+        self._flush()
+        head = self._head
+        n = self.n_chars if self._after is None else self._n_fail
+        before = ''.join(self._before)
+        n_rest = n - len(head)
+        tail = before[len(before) - n_rest:] if n_rest < len(before) else before
+        parts = [head]
+        if n_rest > len(tail):
+            parts.append(_omitted(n_rest - len(tail)))
+        parts.append(tail)
+        if self._after is not None:
+            parts.append(self._after)
+            n_after = self.n_chars - n - len(self._after)
+            if n_after > 0:
+                parts.append(_omitted(n_after))
+        return ''.join(parts)
+
+    def finish(self, got_eval=constants.NOT_EVALED):
+        """
+        Finishes the comparison after the part has been executed.
+
+        Args:
+            got_eval (str): output from an eval statement. The want may
+                match its repr instead of the written output.
+
+        Raises:
+            GotWantException - If the output differs from the want.
+        """
+        if self._matches():
+            return True
+        if got_eval is not constants.NOT_EVALED:
+            # allow eval to fallback and save us
+            if check_output(repr(got_eval), self.want, self.runstate):
+                return True
+        msg = 'got differs with doctest want'
+        raise GotWantException(msg, self.text, self.want)
+
+    def _matches(self):
+        self._flush()
+        if self._after is not None:
+            return False
+        self._process(final=True)
+        if self._raw.finish() or self._match.finish():
+            return True
+        if self._unquoted is not None:
+            if self._n_emitted == 1:
+                return _check_match('', self._norm_want, self.runstate)
+            if self._held == self._quote:
+                return self._unquoted.finish()
+        return False
+
+    def _process(self, final):
+        """
+        Normalizes the pending output up to the last line whose content
+        cannot be removed by the final rstrip and compares it.
+        """
+        text = ''.join(self._pending)
+        if final:
+            cut = len(text)
+        else:
+            cut = _last_content_line(text)
+            if not cut:
+                # Wait for more lines, the backoff keeps this linear
+                self._pending = [text]
+                self._next_process = 2 * len(text)
+                return
+        block, rest = text[:cut], text[cut:]
+        self._pending = [rest] if rest else []
+        self._n_pending = len(rest)
+        self._next_process = len(rest) + _STREAM_BLOCK
+
+        _, normalize_ws, ignore_ws = self.options
+        # The same normalization as _normalize_text, which can be applied to
+        # complete lines one block at a time.
+        if '\x1b' in block or '\x9b' in block:
+            block = utils.strip_ansi(block)
+        if "'" in block or '"' in block:
+            block = unicode_literal_re.sub(r'\1\2', block)
+            block = bytes_literal_re.sub(r'\1\2', block)
+        block = TRAILING_WS.sub('', block)
+        if final:
+            block = block.rstrip()
+        if '\r' in block:
+            block = ''.join([line for line in block.splitlines(True)
+                             if not line.endswith('\r')])
+        if normalize_ws:
+            sep = '' if ignore_ws else ' '
+            block = sep.join(block.split())
+            if block and sep and self._n_emitted:
+                self._emit(sep)
+        self._emit(block)
+
+        if (self._raw.failed and self._match.failed and
+                (self._unquoted is None or self._unquoted.failed)):
+            self.failed = True
+            self._n_fail = self.n_chars
+            self._after = ''
+            self._pending = []
+
+    def _emit(self, piece):
+        if not piece:
+            return
+        if not self._n_emitted and self.runstate['NORMALIZE_REPR']:
+            if piece[0] in ('"', "'"):
+                self._quote = piece[0]
+                self._unquoted = _StreamMatch(self._norm_want, self._ellipsis)
+        self._n_emitted += len(piece)
+        self._match.feed(piece)
+        if self._unquoted is not None:
+            # The first character and the last character are not fed
+            text = self._held + piece
+            if self._n_emitted == len(piece):
+                text = piece[1:]
+            self._unquoted.feed(text[:-1])
+            self._held = text[-1:]
+
+
+class _StreamMatch(object):
+    """
+    Incremental version of :func:`_check_match` for a normalized want.
+
+    Without ellipses the output must equal the want. Otherwise, like
+    :func:`_ellipsis_match`, the first segment must be a prefix and the last
+    segment a suffix of the output, and the leftmost match of each segment
+    in between is found while the output arrives.
+
+    Example:
+        >>> from xdoctest.checker import _StreamMatch
+        >>> self = _StreamMatch('a ... c ... e', ellipsis=True)
+        >>> for chunk in ['a b', ' c', ' d', ' e']:
+        ...     self.feed(chunk)
+        >>> assert self.finish()
+        >>> self = _StreamMatch('abc', ellipsis=True)
+        >>> self.feed('abd')
+        >>> assert self.failed
+    """
+    def __init__(self, want, ellipsis):
+        self.failed = False
+        self.n_chars = 0
+        if ellipsis and ELLIPSIS_MARKER in want:
+            segments = re.split(r'\s*{}\s*'.format(re.escape(ELLIPSIS_MARKER)),
+                                want, flags=re.MULTILINE)
+            self.prefix = segments[0]
+            # Empty segments between consecutive ellipses match anywhere
+            self.middles = [seg for seg in segments[1:-1] if seg]
+            self.suffix = segments[-1]
+        else:
+            self.prefix = want
+            self.middles = None
+            self.suffix = ''
+        self._ppos = 0
+        self._mx = 0
+        self._buf = ''
+        self._end = len(self.prefix)
+        self._tail = ''
+
+    def feed(self, text):
+        self.n_chars += len(text)
+        if self.suffix:
+            self._tail = (self._tail + text)[-len(self.suffix):]
+        if self.failed:
+            return
+        if self._ppos < len(self.prefix):
+            k = min(len(self.prefix) - self._ppos, len(text))
+            if text[:k] != self.prefix[self._ppos:self._ppos + k]:
+                self.failed = True
+                return
+            self._ppos += k
+            text = text[k:]
+        if not text:
+            return
+        if self.middles is None:
+            # Without an ellipsis the output is longer than the want
+            self.failed = True
+            return
+        if self._mx < len(self.middles):
+            buf = self._buf + text
+            offset = self.n_chars - len(buf)
+            while self._mx < len(self.middles):
+                seg = self.middles[self._mx]
+                index = buf.find(seg)
+                if index < 0:
+                    # Only a partial match at the end can continue later
+                    buf = buf[max(0, len(buf) - len(seg) + 1):] if seg else ''
+                    break
+                self._end = offset + index + len(seg)
+                offset = self._end
+                buf = buf[index + len(seg):]
+                self._mx += 1
+            self._buf = buf if self._mx < len(self.middles) else ''
+
+    def finish(self):
+        if self.failed or self._ppos < len(self.prefix):
+            return False
+        if self.middles is None:
+            return True
+        if self._mx < len(self.middles) or self._tail != self.suffix:
+            return False
+        return self._end <= self.n_chars - len(self.suffix)
+
+
+def _last_content_line(text):
+    """
+    Returns the start of the last complete line of text that has content
+    after removing terminal colors, or 0 if there is none.
+    """
+    end = text.rfind('\n')
+    while end >= 0:
+        start = text.rfind('\n', 0, end) + 1
+        line = text[start:end]
+        if '\x1b' in line or '\x9b' in line:
+            line = utils.strip_ansi(line)
+        if line.strip():
+            return start
+        end = start - 1
+    return 0
+
+
+def _omitted(n):
+    return '\n<{} characters omitted>\n'.format(n)
+
+
 def remove_blankline_marker(text):
     r"""
     Example:
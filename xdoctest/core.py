@@ -6,6 +6,7 @@ doctests from a module or package.
 from __future__ import print_function, division, absolute_import, unicode_literals
 import sys
 import textwrap
+import time
 import warnings
 import six
 import itertools as it
@@ -32,7 +33,8 @@ DOCTEST_STYLES = [
 
 
 def parse_freeform_docstr_examples(docstr, callname=None, modpath=None,
-                                   lineno=1, fpath=None, asone=True):
+                                   lineno=1, fpath=None, asone=True,
+                                   eager_parse=True):
     r"""
     Finds free-form doctests in a docstring. This is similar to the original
     doctests because these tests do not requires a google/numpy style header.
@@ -48,6 +50,10 @@ def parse_freeform_docstr_examples(docstr, callname=None, modpath=None,
             i.e. if you were to go to this line number in the source file
             the starting quotes of the docstr would be on this line.
 
+        eager_parse (bool): unused. Freeform examples can only be found by
+            parsing the docstring, so they are always parsed. Accepted so
+            both parsers take the same arguments.
+
     Raises:
         xdoctest.exceptions.DoctestParseError: if an error occurs in parsing
 
@@ -105,6 +111,9 @@ def parse_freeform_docstr_examples(docstr, callname=None, modpath=None,
             p.line_offset -= unoffset
         # We've already parsed the parts, so we dont need to do it again
         example._parts = parts
+        # Attribute the time spent parsing the docstring proportionally
+        example._add_phase_time('parse', parse_seconds * len(parts) /
+                                max(n_doctest_parts, 1))
         return example
 
     if DEBUG:
@@ -138,7 +147,11 @@ def parse_freeform_docstr_examples(docstr, callname=None, modpath=None,
 
     # parse into doctest and plaintext parts
     info = dict(callname=callname, modpath=modpath, lineno=lineno, fpath=fpath)
+    tic = time.time()
     all_parts = list(parser.DoctestParser().parse(docstr, info))
+    parse_seconds = time.time() - tic
+    n_doctest_parts = sum(not isinstance(part, six.string_types)
+                          for part in all_parts)
 
     curr_parts = []
     curr_offset = 0
@@ -196,6 +209,9 @@ def parse_google_docstr_examples(docstr, callname=None, modpath=None, lineno=1,
             i.e. if you were to go to this line number in the source file
             the starting quotes of the docstr would be on this line.
 
+        eager_parse (bool): if False, the parts of each example are not
+            parsed until it is run.
+
     Raises:
         xdoctest.exceptions.MalformedDocstr: if an error occurs in finding google blocks
         xdoctest.exceptions.DoctestParseError: if an error occurs in parsing
@@ -368,7 +384,8 @@ def _rectify_to_modpath(modpath_or_name):
     return modpath
 
 
-def package_calldefs(modpath_or_name, exclude=[], ignore_syntax_errors=True):
+def package_calldefs(modpath_or_name, exclude=[], ignore_syntax_errors=True,
+                     cache=None, prefilter=False, stats=None):
     """
     Statically generates all callable definitions in a module or package
 
@@ -377,6 +394,18 @@ def package_calldefs(modpath_or_name, exclude=[], ignore_syntax_errors=True):
         exclude (List[str]): glob-patterns of file names to exclude
         ignore_syntax_errors (bool, default=True):
             if False raise an error when syntax errors occur in a doctest
+        cache (xdoctest.cache.ParseCache, default=None):
+            if specified, statically parsed calldefs are read from and written
+            to this cache.
+        prefilter (bool, default=False):
+            if True, python files whose raw bytes do not contain a doctest
+            prompt are skipped without being parsed. This must be False when
+            the calldefs themselves are needed (e.g. to find zero-arg
+            functions).
+        stats (dict, default=None):
+            if specified, the number of files that were considered is
+            accumulated in ``n_files`` and the number of those skipped by the
+            prefilter in ``n_prefiltered``.
 
     Example:
         >>> modpath_or_name = 'xdoctest.core'
@@ -385,35 +414,31 @@ def package_calldefs(modpath_or_name, exclude=[], ignore_syntax_errors=True):
         >>> calldefs, modpath = testables[0]
         >>> assert static.modpath_to_modname(modpath) == modpath_or_name
         >>> assert 'package_calldefs' in calldefs
-    """
-    pkgpath = _rectify_to_modpath(modpath_or_name)
 
-    modpaths = static.package_modpaths(pkgpath, with_pkg=True, with_libs=True)
-    modpaths = list(modpaths)
-    for modpath in modpaths:
-        modname = static.modpath_to_modname(modpath)
-        if any(fnmatch(modname, pat) for pat in exclude):
-            continue
-        if not exists(modpath):
-            warnings.warn(
-                'Module {} does not exist. '
-                'Is it an old pyc file?'.format(modname))
-            continue
+    Example:
+        >>> from xdoctest import utils
+        >>> from os.path import join
+        >>> temp = utils.TempDir()
+        >>> modpath = join(temp.ensure(), 'no_doctests.py')
+        >>> with open(modpath, 'w') as file:
+        ...     _ = file.write('def func():\\n    "no examples here"')
+        >>> stats = {}
+        >>> assert list(package_calldefs(modpath, prefilter=True, stats=stats)) == []
+        >>> print(sorted(stats.items()))
+        [('n_files', 1), ('n_prefiltered', 1)]
+        >>> assert len(list(package_calldefs(modpath))) == 1
+    """
+    if stats is not None:
+        stats.setdefault('n_files', 0)
+        stats.setdefault('n_prefiltered', 0)
 
-        FORCE_DYNAMIC = '--xdoc-force-dynamic' in sys.argv
-        # if false just skip extension modules
-        # ALLOW_DYNAMIC = '--no-xdoc-dynamic' not in sys.argv
-        ALLOW_DYNAMIC = '--allow-xdoc-dynamic' in sys.argv
+    pkgpath = _rectify_to_modpath(modpath_or_name)
 
-        needs_dynamic = False
+    for modpath, modname in _package_modpaths(pkgpath, exclude):
+        if stats is not None:
+            stats['n_files'] += 1
 
-        if FORCE_DYNAMIC:
-            # Force dynamic parsing for everything
-            do_dynamic = True
-        else:
-            # Some modules can only be parsed dynamically
-            needs_dynamic = modpath.endswith(static._platform_pylib_exts())
-            do_dynamic = needs_dynamic and ALLOW_DYNAMIC
+        do_dynamic, needs_dynamic = _parse_mode(modpath)
 
         if do_dynamic:
             try:
@@ -434,23 +459,92 @@ def package_calldefs(modpath_or_name, exclude=[], ignore_syntax_errors=True):
             if needs_dynamic:
                 continue
 
-            try:
-                calldefs = static.parse_calldefs(fpath=modpath)
-            except SyntaxError as ex:
-                # Handle error due to the actual code containing errors
-                msg = 'Cannot parse module={} at path={}.\nCaused by: {}'
-                msg = msg.format(modname, modpath, ex)
-                if ignore_syntax_errors:
-                    warnings.warn(msg)  # real code or docstr contained errors
+            if prefilter and not static.contains_doctest_prompt(modpath):
+                if stats is not None:
+                    stats['n_prefiltered'] += 1
+                continue
+
+            if cache is not None:
+                calldefs = cache.load_calldefs(modpath)
+                if calldefs is not None:
+                    yield calldefs, modpath
                     continue
-                else:
-                    raise SyntaxError(msg)
-            else:
+
+            calldefs = _static_calldefs(modpath, modname,
+                                        ignore_syntax_errors)
+            if calldefs is not None:
+                if cache is not None:
+                    cache.save_calldefs(modpath, calldefs)
                 yield calldefs, modpath
 
 
+def _package_modpaths(pkgpath, exclude):
+    """
+    Generates the path and name of each existing module in a package that is
+    not excluded.
+    """
+    modpaths = static.package_modpaths(pkgpath, with_pkg=True, with_libs=True)
+    modpaths = list(modpaths)
+    for modpath in modpaths:
+        modname = static.modpath_to_modname(modpath)
+        if any(fnmatch(modname, pat) for pat in exclude):
+            continue
+        if not exists(modpath):
+            warnings.warn(
+                'Module {} does not exist. '
+                'Is it an old pyc file?'.format(modname))
+            continue
+        yield modpath, modname
+
+
+def _parse_mode(modpath):
+    """
+    Returns:
+        Tuple[bool, bool]: if the module should be parsed dynamically and if
+            it can only be parsed dynamically.
+    """
+    FORCE_DYNAMIC = '--xdoc-force-dynamic' in sys.argv
+    # if false just skip extension modules
+    # ALLOW_DYNAMIC = '--no-xdoc-dynamic' not in sys.argv
+    ALLOW_DYNAMIC = '--allow-xdoc-dynamic' in sys.argv
+
+    needs_dynamic = False
+
+    if FORCE_DYNAMIC:
+        # Force dynamic parsing for everything
+        do_dynamic = True
+    else:
+        # Some modules can only be parsed dynamically
+        needs_dynamic = modpath.endswith(static._platform_pylib_exts())
+        do_dynamic = needs_dynamic and ALLOW_DYNAMIC
+    return do_dynamic, needs_dynamic
+
+
+def _static_calldefs(modpath, modname, ignore_syntax_errors, source=None):
+    """
+    Statically parses the calldefs in a module.
+
+    Returns:
+        OrderedDict | None: the calldefs or None if the module has a syntax
+            error that is ignored.
+    """
+    try:
+        calldefs = static.parse_calldefs(source=source, fpath=modpath)
+    except SyntaxError as ex:
+        # Handle error due to the actual code containing errors
+        msg = 'Cannot parse module={} at path={}.\nCaused by: {}'
+        msg = msg.format(modname, modpath, ex)
+        if ignore_syntax_errors:
+            warnings.warn(msg)  # real code or docstr contained errors
+            return None
+        else:
+            raise SyntaxError(msg)
+    return calldefs
+
+
 def parse_doctestables(modpath_or_name, exclude=[], style='auto',
-                       ignore_syntax_errors=True, parser_kw={}):
+                       ignore_syntax_errors=True, parser_kw={},
+                       cache_dpath=None, stats=None, workers=None):
     """
     Parses all doctests within top-level callables of a module and generates
     example objects.  The style influences which tests are found.
@@ -462,6 +556,16 @@ def parse_doctestables(modpath_or_name, exclude=[], style='auto',
         ignore_syntax_errors (bool, default=True):
             if False raise an error when syntax errors
         parser_kw: extra args passed to the parser
+        cache_dpath (str, default=None): if specified, parsed calldefs and
+            examples are cached in this directory and reused by later calls
+            as long as the module file does not change.
+        stats (dict, default=None): if specified, counts of the files that
+            were considered and skipped are accumulated here (see
+            :func:`package_calldefs`).
+        workers (int, default=None): if specified, files are read in a pool
+            of this many threads and parsed in a pool of this many processes.
+            A value of 0 uses one worker per cpu. The examples are generated
+            in the same order as a serial parse.
 
     Yields:
         xdoctest.doctest_example.DocTest : parsed doctest example objects
@@ -494,25 +598,221 @@ def parse_doctestables(modpath_or_name, exclude=[], style='auto',
         >>> examples = list(parse_doctestables(modpath, style='freeform'))
         >>> print(len(examples))
         1
+
+    Example:
+        >>> # Parsed examples can be cached between calls
+        >>> from xdoctest import utils
+        >>> from os.path import join
+        >>> temp = utils.TempDoctest('>>> x = 1')
+        >>> cache_dpath = join(temp.dpath, 'cache')
+        >>> cold = list(parse_doctestables(temp.modpath, cache_dpath=cache_dpath))
+        >>> warm = list(parse_doctestables(temp.modpath, cache_dpath=cache_dpath))
+        >>> assert [e.node for e in cold] == [e.node for e in warm]
+
+    Example:
+        >>> # Packages can be parsed in parallel
+        >>> serial = list(parse_doctestables('xdoctest'))
+        >>> parallel = list(parse_doctestables('xdoctest', workers=2))
+        >>> assert [e.node for e in serial] == [e.node for e in parallel]
     """
 
     if style not in DOCTEST_STYLES:
         raise KeyError('Unknown style={}. Valid styles are {}'.format(
             style, DOCTEST_STYLES))
 
+    cache = None
+    if cache_dpath is not None:
+        from xdoctest import cache as cache_mod
+        cache = cache_mod.ParseCache.shared(cache_dpath)
+    # Examples depend on the parser options as well as the style
+    example_key = '{}-{}'.format(style, sorted(parser_kw.items()))
+
+    if workers is not None and workers != 1:
+        pkgpath = _rectify_to_modpath(modpath_or_name)
+        modpaths = [modpath for modpath, _ in _package_modpaths(pkgpath,
+                                                                exclude)]
+        # Starting pools is not worth it for a single module
+        if len(modpaths) > 1:
+            for examples in _parallel_module_examples(
+                    modpaths, style, ignore_syntax_errors, parser_kw, cache,
+                    example_key, stats, workers):
+                for example in examples:
+                    yield example
+            return
+
     # Statically parse modules and their doctestable callables in a package
     for calldefs, modpath in package_calldefs(modpath_or_name, exclude,
-                                              ignore_syntax_errors):
-        for callname, calldef in calldefs.items():
-            docstr = calldef.docstr
-            if calldef.docstr is not None:
-                lineno = calldef.doclineno
-                for example in parse_docstr_examples(docstr, callname=callname,
-                                                     modpath=modpath,
-                                                     lineno=lineno,
-                                                     style=style,
-                                                     parser_kw=parser_kw):
-                    yield example
+                                              ignore_syntax_errors,
+                                              cache=cache, prefilter=True,
+                                              stats=stats):
+        if cache is None or not modpath.endswith('.py'):
+            for example in _parse_calldef_examples(calldefs, modpath, style,
+                                                   parser_kw):
+                yield example
+            continue
+
+        examples = cache.load_examples(modpath, example_key)
+        if examples is None:
+            # Warnings (e.g. from malformed doctests) must be shown on every
+            # run, so only cache modules that parsed cleanly.
+            with warnings.catch_warnings(record=True) as recorded:
+                warnings.simplefilter('always')
+                examples = list(_parse_calldef_examples(calldefs, modpath,
+                                                        style, parser_kw))
+            for warn in recorded:
+                warnings.warn_explicit(warn.message, warn.category,
+                                       warn.filename, warn.lineno)
+            if not recorded:
+                cache.save_examples(modpath, example_key, examples)
+        for example in examples:
+            yield example
+
+
+def _parallel_module_examples(modpaths, style, ignore_syntax_errors,
+                              parser_kw, cache, example_key, stats, workers):
+    """
+    Parses the examples in each module of a package in parallel. Reading
+    files is I/O bound, so it is done in a pool of threads, while parsing is
+    done in a pool of processes. Output and warnings from the workers are
+    replayed in module order.
+
+    The process pool is started first, because forking a process that
+    already runs other threads can deadlock the child.
+
+    Yields:
+        List[DocTest]: the examples in each module in the same order as
+            :func:`package_calldefs`.
+    """
+    import multiprocessing
+    from multiprocessing.pool import ThreadPool
+    if workers <= 0:
+        workers = multiprocessing.cpu_count()
+    if stats is not None:
+        stats.setdefault('n_files', 0)
+        stats.setdefault('n_prefiltered', 0)
+
+    process_pool = multiprocessing.Pool(workers)
+    thread_pool = ThreadPool(workers)
+    try:
+        # Submit every module before waiting on any, so the readers and
+        # parsers are kept busy.
+        pending = []
+        sources = thread_pool.imap(_read_static_module, modpaths)
+        for modpath, source in zip(modpaths, sources):
+            if source is None:
+                # Modules that are not parsed statically take the serial path
+                pending.append((modpath, None))
+                continue
+            if stats is not None:
+                stats['n_files'] += 1
+            if b'>>>' not in source:
+                if stats is not None:
+                    stats['n_prefiltered'] += 1
+                continue
+            if cache is not None and modpath.endswith('.py'):
+                examples = cache.load_examples(modpath, example_key)
+                if examples is not None:
+                    pending.append((modpath, examples))
+                    continue
+            task = (modpath, source, style, parser_kw, ignore_syntax_errors)
+            result = process_pool.apply_async(_parse_module_source, (task,))
+            pending.append((modpath, result))
+
+        for modpath, result in pending:
+            if result is None:
+                for calldefs, _ in package_calldefs(modpath, [],
+                                                    ignore_syntax_errors,
+                                                    stats=stats):
+                    yield list(_parse_calldef_examples(calldefs, modpath,
+                                                       style, parser_kw))
+            elif isinstance(result, list):
+                yield result
+            else:
+                calldefs, examples, stdout, recorded = result.get()
+                if stdout:
+                    sys.stdout.write(stdout)
+                for message, category, filename, lineno in recorded:
+                    warnings.warn_explicit(message, category, filename,
+                                           lineno)
+                if cache is not None and calldefs is not None:
+                    if modpath.endswith('.py'):
+                        cache.save_calldefs(modpath, calldefs)
+                        if not recorded:
+                            cache.save_examples(modpath, example_key,
+                                                examples)
+                yield examples
+    except BaseException:
+        process_pool.terminate()
+        raise
+    else:
+        process_pool.close()
+    finally:
+        thread_pool.close()
+        process_pool.join()
+        thread_pool.join()
+
+
+def _read_static_module(modpath):
+    """
+    Thread pool entry point. Reads the bytes of a module that can be parsed
+    statically or returns None.
+    """
+    do_dynamic, needs_dynamic = _parse_mode(modpath)
+    if do_dynamic or needs_dynamic:
+        return None
+    with open(modpath, 'rb') as file:
+        return file.read()
+
+
+def _parse_module_source(task):
+    """
+    Process pool entry point. Parses the calldefs and examples in the source
+    of a module.
+
+    Args:
+        task (Tuple[str, bytes, str, dict, bool]): the path of the module,
+            its source, the doctest style, the parser options, and if syntax
+            errors are ignored.
+
+    Returns:
+        Tuple[OrderedDict, List[DocTest], str, List[Tuple]]: the calldefs or
+            None if they could not be parsed, the examples, the captured
+            stdout, and the warnings that were issued.
+    """
+    modpath, source, style, parser_kw, ignore_syntax_errors = task
+    modname = static.modpath_to_modname(modpath)
+    try:
+        source = source.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    with utils.CaptureStdout(supress=True) as cap:
+        with warnings.catch_warnings(record=True) as recorded:
+            warnings.simplefilter('always')
+            calldefs = _static_calldefs(modpath, modname,
+                                        ignore_syntax_errors, source=source)
+            examples = []
+            if calldefs is not None:
+                examples = list(_parse_calldef_examples(calldefs, modpath,
+                                                        style, parser_kw))
+    recorded = [(warn.message, warn.category, warn.filename, warn.lineno)
+                for warn in recorded]
+    return calldefs, examples, cap.text, recorded
+
+
+def _parse_calldef_examples(calldefs, modpath, style, parser_kw):
+    """
+    Generates the examples in the docstrings of statically parsed calldefs
+    """
+    for callname, calldef in calldefs.items():
+        docstr = calldef.docstr
+        if calldef.docstr is not None:
+            lineno = calldef.doclineno
+            for example in parse_docstr_examples(docstr, callname=callname,
+                                                 modpath=modpath,
+                                                 lineno=lineno,
+                                                 style=style,
+                                                 parser_kw=parser_kw):
+                yield example
 
 
 if __name__ == '__main__':
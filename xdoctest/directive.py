@@ -22,7 +22,9 @@ Advanced directives may take arguments, be conditional, or modify the runtime
 state in complex ways.  For instance, whereas most directives modify a boolean
 value in the runtime state, the advanced `REQUIRES` directive either adds or
 removes a value from a `set` of unmet requirements. Doctests will only run if
-there are no unmet requirements.
+there are no unmet requirements. Similarly, the `TIMEOUT` directive takes a
+number of seconds and fails the doctest once the parts run after it exceed
+that limit (e.g. ``# xdoctest: +TIMEOUT(10)``). `-TIMEOUT` removes the limit.
 
 
 CommandLine:
@@ -119,6 +121,10 @@ DEFAULT_RUNTIME_STATE = {
 
     'NORMALIZE_REPR': True,
 
+    # Parts run while this is True are profiled with cProfile. The results
+    # are written to the profile directory (see xdoctest.profiler).
+    'PROFILE': False,
+
     'REPORT_CDIFF': False,
     'REPORT_NDIFF': False,
     'REPORT_UDIFF': True,
@@ -131,6 +137,10 @@ DEFAULT_RUNTIME_STATE = {
     # Doctests will be skipped while REQUIRES is non-empty and SKIP is False.
     'REQUIRES': set(),
 
+    # Doctests fail once they have been running for more than this many
+    # seconds. None means there is no limit.
+    'TIMEOUT': None,
+
     # Original directives we are currently not supporting:
     # DONT_ACCEPT_TRUE_FOR_1
     # REPORT_ONLY_FIRST_FAILURE
@@ -177,11 +187,13 @@ class RuntimeState(utils.NiceRepr):
             IGNORE_WHITESPACE: False,
             NORMALIZE_REPR: True,
             NORMALIZE_WHITESPACE: True,
+            PROFILE: False,
             REPORT_CDIFF: False,
             REPORT_NDIFF: False,
             REPORT_UDIFF: True,
             REQUIRES: set(...),
-            SKIP: False
+            SKIP: False,
+            TIMEOUT: None
         })>
     """
     def __init__(self, default_state=None):
@@ -330,21 +342,16 @@ class Directive(utils.NiceRepr):
             >>> any(Directive.extract(' # badprefix: not-a-directive'))
             False
         """
-        # Flag extracted directives as inline iff the text is only comments
-        inline = not all(line.strip().startswith('#')
-                         for line in text.splitlines())
-        #
-        for comment in static.extract_comments(text):
-            # remove the first comment character and see if the comment matches
-            # the directive pattern
-            m = DIRECTIVE_RE.match(comment[1:].strip())
-            if m:
-                for key, optstr in m.groupdict().items():
-                    if optstr:
-                        for optpart in optstr.split(','):
-                            directive = parse_directive_optstr(optpart, inline)
-                            if directive:
-                                yield directive
+        optparts = _OPTPARTS_CACHE.get(text, None)
+        if optparts is None:
+            optparts = _extract_optparts(text)
+            if len(_OPTPARTS_CACHE) > _MAX_CACHE_SIZE:
+                _OPTPARTS_CACHE.clear()
+            _OPTPARTS_CACHE[text] = optparts
+        for optpart, inline in optparts:
+            directive = parse_directive_optstr(optpart, inline)
+            if directive:
+                yield directive
 
     def __nice__(self):
         prefix = ['-', '+'][int(self.positive)]
@@ -388,6 +395,10 @@ class Directive(utils.NiceRepr):
             Effect(action='set.add', key='REQUIRES', value='-s')
             >>> Directive('ELLIPSIS', args=['-s']).effect(argv=[])
             Effect(action='assign', key='ELLIPSIS', value=True)
+            >>> Directive('TIMEOUT', args=['2.5']).effect()
+            Effect(action='assign', key='TIMEOUT', value=2.5)
+            >>> Directive('TIMEOUT', positive=False).effect()
+            Effect(action='assign', key='TIMEOUT', value=None)
 
         Doctest:
             >>> # requirement directive with module
@@ -422,6 +433,12 @@ class Directive(utils.NiceRepr):
                     action = 'set.add'
                 else:
                     action = 'set.remove'
+        elif self.name == 'TIMEOUT':
+            # Special handling of TIMEOUT, which takes a number of seconds
+            action = 'assign'
+            if self.positive:
+                arg, = self._unpack_args(1)
+                value = float(arg)
         elif key.startswith('REPORT_'):
             # Special handling of report style
             if self.positive:
@@ -499,6 +516,43 @@ DIRECTIVE_PATTERNS = [
 DIRECTIVE_RE = re.compile('|'.join(DIRECTIVE_PATTERNS), flags=re.IGNORECASE)
 
 
+# Identical text is extracted and parsed once. Directives are never modified
+# after they are created, so the same instances can be shared.
+_MAX_CACHE_SIZE = 10000
+_OPTPARTS_CACHE = {}
+_DIRECTIVE_CACHE = {}
+
+
+def _extract_optparts(text):
+    """
+    Finds the option strings of all directives in the comments of some text
+
+    Returns:
+        Tuple[Tuple[str, bool], ...]: each option string and if it is inline
+
+    Example:
+        >>> from xdoctest.directive import _extract_optparts
+        >>> _extract_optparts('x = 1  # xdoctest: +SKIP, -ELLIPSIS')
+        (('+SKIP', True), (' -ELLIPSIS', True))
+    """
+    if '#' not in text:
+        return ()
+    # Flag extracted directives as inline iff the text is only comments
+    inline = not all(line.strip().startswith('#')
+                     for line in text.splitlines())
+    optparts = []
+    for comment in static.extract_comments(text):
+        # remove the first comment character and see if the comment matches
+        # the directive pattern
+        m = DIRECTIVE_RE.match(comment[1:].strip())
+        if m:
+            for key, optstr in m.groupdict().items():
+                if optstr:
+                    for optpart in optstr.split(','):
+                        optparts.append((optpart, inline))
+    return tuple(optparts)
+
+
 def parse_directive_optstr(optpart, inline=None):
     """
     Parses the information in the directive from the "optpart"
@@ -515,7 +569,21 @@ def parse_directive_optstr(optpart, inline=None):
     Example:
         >>> print(str(parse_directive_optstr('+IGNORE_WHITESPACE')))
         <Directive(+IGNORE_WHITESPACE)>
+        >>> # Identical option strings give the same directive instance
+        >>> assert parse_directive_optstr('+SKIP') is parse_directive_optstr('+SKIP')
     """
+    key = (optpart, inline)
+    directive = _DIRECTIVE_CACHE.get(key, None)
+    if directive is None:
+        directive = _parse_directive_optstr(optpart, inline)
+        if directive is not None:
+            if len(_DIRECTIVE_CACHE) > _MAX_CACHE_SIZE:
+                _DIRECTIVE_CACHE.clear()
+            _DIRECTIVE_CACHE[key] = directive
+    return directive
+
+
+def _parse_directive_optstr(optpart, inline=None):
     optpart = optpart.strip()
     # all spaces are ignored
     optpart = optpart.replace(' ', '')
@@ -11,13 +11,26 @@ import warnings
 import math
 import sys
 import re
+import signal
+import threading
+import time
 from xdoctest import utils
+from xdoctest import cache
 from xdoctest import directive
 from xdoctest import constants
 from xdoctest import static_analysis as static
 from xdoctest import parser
 from xdoctest import checker
 from xdoctest import exceptions
+from xdoctest import profiler
+
+
+#: The phases of parsing, running, and reporting a doctest that are timed in
+#: :attr:`DocTest.phase_times`
+PHASES = ('parse', 'import', 'compile', 'exec', 'check', 'report')
+
+# Captured stdout beyond this many characters is moved to a temporary file
+DEFAULT_CAPTURE_MEMORY = 2 ** 24
 
 
 class Config(dict):
@@ -42,6 +55,15 @@ class Config(dict):
             'on_error': 'raise',
             'partnos': False,
             'verbose': 1,
+            # profiling of executed code
+            'profile_top': None,
+            'tracemalloc': False,
+            'profile_dpath': profiler.DEFAULT_PROFILE_DPATH,
+            # output larger than this is checked while it is written
+            'stream_threshold': checker.DEFAULT_STREAM_THRESHOLD,
+            'capture_memory': DEFAULT_CAPTURE_MEMORY,
+            # examples running longer than this many seconds fail
+            'timeout': None,
         })
 
     def _populate_from_cli(self, ns):
@@ -51,7 +73,11 @@ class Config(dict):
         if directive_optstr:
             for optpart in directive_optstr.split(','):
                 directive = parse_directive_optstr(optpart)
-                default_runtime_state[directive.name] = directive.positive
+                effect = directive.effect()
+                if effect.action == 'assign':
+                    default_runtime_state[effect.key] = effect.value
+                else:
+                    default_runtime_state[directive.name] = directive.positive
         _examp_conf = {
             'default_runtime_state': default_runtime_state,
             'offset_linenos': ns['offset_linenos'],
@@ -59,6 +85,12 @@ class Config(dict):
             'reportchoice': ns['reportchoice'],
             'global_exec': ns['global_exec'],
             'verbose': ns['verbose'],
+            'profile_top': ns['profile_top'],
+            'tracemalloc': ns['tracemalloc'],
+            'profile_dpath': ns['profile_dpath'],
+            'stream_threshold': ns['stream_threshold'],
+            'capture_memory': ns['capture_memory'],
+            'timeout': ns['timeout'],
         }
         return _examp_conf
 
@@ -91,6 +123,42 @@ class Config(dict):
                                      help='exec these lines before every test')),
             (['--verbose'], dict(type=int, default=defaults.get('verbose', 3), dest='verbose',
                                      help='verbosity level')),
+            (['--profile-top'], dict(type=int, default=self['profile_top'],
+                                     dest='profile_top',
+                                     help=('profile every example with cProfile and '
+                                           'report its top N functions. Otherwise only '
+                                           'parts following a +PROFILE directive are '
+                                           'profiled'))),
+            (['--tracemalloc'], dict(action='store_true',
+                                     default=self['tracemalloc'],
+                                     dest='tracemalloc',
+                                     help=('record the top allocation sites of every '
+                                           'example with tracemalloc'))),
+            (['--profile-dir'], dict(type=str, default=self['profile_dpath'],
+                                     dest='profile_dpath',
+                                     help=('directory to write the profiles of '
+                                           'examples to'))),
+            (['--stream-threshold'], dict(type=int,
+                                          default=self['stream_threshold'],
+                                          dest='stream_threshold',
+                                          help=('once a part writes more than '
+                                                'this many characters, compare '
+                                                'them to its want as they are '
+                                                'written and only keep a window '
+                                                'of them. 0 disables this'))),
+            (['--capture-memory'], dict(type=int,
+                                        default=self['capture_memory'],
+                                        dest='capture_memory',
+                                        help=('number of characters of '
+                                              'captured stdout kept in memory '
+                                              'by an example. The rest is '
+                                              'written to a temporary file'))),
+            (['--timeout'], dict(type=float, default=self['timeout'],
+                                 dest='timeout',
+                                 help=('fail examples that run for longer '
+                                       'than this many seconds. The '
+                                       '+TIMEOUT(n) directive overrides '
+                                       'this within an example'))),
         ]
 
         if prefix is None:
@@ -193,6 +261,7 @@ class DocTest(object):
         self.exc_info = None
         self.failed_part = None
         self.warn_list = None
+        self.timed_out = False
 
         self.logged_evals = OrderedDict()
         self.logged_stdout = OrderedDict()
@@ -201,6 +270,13 @@ class DocTest(object):
 
         self._runstate = None
 
+        # Seconds spent in each of the PHASES
+        self.phase_times = OrderedDict()
+        self._reporting = False
+
+        # Files written by profiled runs
+        self.profile_fpaths = []
+
         self.module = None
         # Maintain global variables that this test will have access to
         self.global_namespace = {}
@@ -384,15 +460,26 @@ class DocTest(object):
             >>> self.run()
         """
         if not self._parts:
+            tic = time.time()
             info = dict(callname=self.callname, modpath=self.modpath,
                         lineno=self.lineno, fpath=self.fpath)
             self._parts = parser.DoctestParser().parse(self.docsrc, info)
             self._parts = [p for p in self._parts
                            if not isinstance(p, six.string_types)]
+            self._add_phase_time('parse', time.time() - tic)
         # Ensure part numbers are given
         for partno, part in enumerate(self._parts):
             part.partno = partno
 
+    def _add_phase_time(self, phase, seconds):
+        self.phase_times[phase] = self.phase_times.get(phase, 0) + seconds
+
+    def _reset_phase_times(self):
+        # Parsing usually happens before the run, so its time is kept
+        parse_time = self.phase_times.get('parse', 0)
+        self.phase_times = OrderedDict((phase, 0) for phase in PHASES)
+        self.phase_times['parse'] = parse_time
+
     def _import_module(self):
         """
         After this point we are in dynamic analysis mode, in most cases
@@ -401,7 +488,7 @@ class DocTest(object):
         if self.module is None:
             if not self.modname.startswith('<'):
                 # self.module = utils.import_module_from_path(self.modpath, index=0)
-                self.module = utils.import_module_from_path(self.modpath, index=-1)
+                self.module = cache.MODULE_CACHE.import_module(self.modpath)
 
     @staticmethod
     def _extract_future_flags(namespace):
@@ -421,7 +508,12 @@ class DocTest(object):
         if self.module is None:
             compileflags = 0
         else:
-            test_globals.update(self.module.__dict__)
+            # Each example copies a shared snapshot of its module namespace.
+            # Names in the module take precedence.
+            test_globals = cache.NAMESPACE_CACHE.snapshot(self.module).copy()
+            for key, value in self.global_namespace.items():
+                test_globals.setdefault(key, value)
+            self.global_namespace = test_globals
             compileflags = self._extract_future_flags(test_globals)
         # force print function and division futures
         compileflags |= __future__.print_function.compiler_flag
@@ -432,6 +524,28 @@ class DocTest(object):
         # If everything was skipped, then there will be no stdout
         return len(self.logged_stdout) > 0
 
+    def clear_logged_output(self):
+        """
+        Releases the stdout and evaluated values logged by the last run.
+
+        Runners call this once the outcome of a passing example is reported,
+        so the output of all examples is not kept until the end of a run.
+        The parts that ran are still known to :func:`anything_ran`.
+
+        Example:
+            >>> from xdoctest import doctest_example
+            >>> self = doctest_example.DocTest('>>> print(1)\\n>>> x = 2')
+            >>> summary = self.run(verbose=0)
+            >>> self.clear_logged_output()
+            >>> assert self.anything_ran()
+            >>> assert not any(self.logged_stdout.values())
+        """
+        for partx in self.logged_stdout:
+            self.logged_stdout[partx] = None
+        for partx in self.logged_evals:
+            self.logged_evals[partx] = None
+        self._unmatched_stdout = []
+
     def run(self, verbose=None, on_error=None):
         """
         Executes the doctest, checks the results, reports the outcome.
@@ -445,8 +559,11 @@ class DocTest(object):
             raise KeyError(on_error)
 
         self._parse()  # parse out parts if we have not already done so
+        self._reset_phase_times()
         self._pre_run(verbose)
+        tic = time.time()
         self._import_module()
+        self._add_phase_time('import', time.time() - tic)
 
         # Prepare for actual test run
         test_globals, compileflags = self._test_globals()
@@ -457,6 +574,7 @@ class DocTest(object):
 
         self._skipped_parts = []
         self.exc_info = None
+        self.timed_out = False
         self._suppressed_stdout = verbose <= 1
 
         # Initialize a new runtime state
@@ -464,179 +582,277 @@ class DocTest(object):
         runstate = self._runstate = directive.RuntimeState(default_state)
         # setup reporting choice
         runstate.set_report_style(self.config['reportchoice'].lower())
+        timeout = self.config.getvalue('timeout')
+        if timeout:
+            runstate['TIMEOUT'] = timeout
+        # The time limit counts from the start of the example
+        alarm = _ExampleAlarm(time.time())
 
         global_exec = self.config.getvalue('global_exec')
         if global_exec:
             # Hack to make it easier to specify multi-line input on the CLI
             global_source = utils.codeblock(global_exec.replace('\\n', '\n'))
-            global_code = compile(
+            tic = time.time()
+            global_code = cache.CODE_CACHE.compile(
                 global_source, mode='exec',
                 filename='<doctest:' + self.node + ':' + 'global_exec>',
-                flags=compileflags, dont_inherit=True
+                flags=compileflags
             )
+            toc = time.time()
+            self._add_phase_time('compile', toc - tic)
             exec(global_code, test_globals)
+            self._add_phase_time('exec', time.time() - toc)
 
         # Can't do this because we can't force execution of SCRIPTS
         # if self.is_disabled():
         #     runstate['SKIP'] = True
 
+        stream_threshold = self.config.getvalue('stream_threshold')
+        profile_top = self.config.getvalue('profile_top')
+        trace_memory = self.config.getvalue('tracemalloc')
+        example_profiler = None
+        self.profile_fpaths = []
+
         # Use the same capture object for all parts in the test
-        cap = utils.CaptureStdout(supress=self._suppressed_stdout)
-        with warnings.catch_warnings(record=True) as self.warn_list:
-            for partx, part in enumerate(self._parts):
-                # Extract directives and and update runtime state
-                runstate.update(part.directives)
-
-                # Handle runtime actions
-                if runstate['SKIP'] or len(runstate['REQUIRES']) > 0:
-                    self._skipped_parts.append(part)
-                    continue
-
-                # Prepare to capture stdout and evaluated values
-                self.failed_part = part
-                got_eval = constants.NOT_EVALED
-                try:
-                    # Compile code, handle syntax errors
-                    #   part.compile_mode can be single, exec, or eval.
-                    #   Typically single is used instead of eval
-                    self._partfilename = '<doctest:' + self.node + '>'
-                    code = compile(
-                        part.source, mode=part.compile_mode,
-                        filename=self._partfilename,
-                        flags=compileflags, dont_inherit=True
-                    )
-                except KeyboardInterrupt:  # nocover
-                    raise
-                except Exception:
-                    raise
-                    # self.exc_info = sys.exc_info()
-                    # ex_type, ex_value, tb = self.exc_info
-                    # self.failed_tb_lineno = tb.tb_lineno
-                    # if on_error == 'raise':
-                    #     raise
-                try:
-                    # Execute the doctest code
+        cap = utils.CaptureStdout(supress=self._suppressed_stdout,
+                                  max_memory=self.config['capture_memory'])
+        try:
+            with warnings.catch_warnings(record=True) as self.warn_list:
+                for partx, part in enumerate(self._parts):
+                    # Extract directives and and update runtime state
+                    runstate.update(part.directives)
+
+                    # Handle runtime actions
+                    if runstate['SKIP'] or len(runstate['REQUIRES']) > 0:
+                        self._skipped_parts.append(part)
+                        continue
+
+                    # Prepare to capture stdout and evaluated values
+                    self.failed_part = part
+                    got_eval = constants.NOT_EVALED
+
+                    # Large output is compared while it is written, which is only
+                    # possible if the want cannot match earlier unmatched output
+                    stream_checker = None
+                    if (stream_threshold and part.want and
+                            not runstate['IGNORE_WANT'] and
+                            not any(self._unmatched_stdout) and
+                            checker.StreamingChecker.supports(part.want, runstate)):
+                        stream_checker = checker.StreamingChecker(part.want,
+                                                                  runstate)
+                        cap.stream_to(stream_checker, stream_threshold)
+                    try:
+                        # Compile code, handle syntax errors
+                        #   part.compile_mode can be single, exec, or eval.
+                        #   Typically single is used instead of eval
+                        self._partfilename = '<doctest:' + self.node + '>'
+                        tic = time.time()
+                        code = part.compile(self._partfilename, compileflags)
+                        self._add_phase_time('compile', time.time() - tic)
+
+                        profile_part = bool(profile_top) or runstate['PROFILE']
+                        if (profile_part or trace_memory) and example_profiler is None:
+                            example_profiler = profiler.ExampleProfiler(
+                                self._partfilename, self.lineno,
+                                trace_memory=trace_memory, top=profile_top)
+                            # Functions defined by earlier parts may be called
+                            for prev in self._parts[:partx]:
+                                example_profiler.register(prev, prev.compile(
+                                    self._partfilename, compileflags))
+                        if example_profiler is not None:
+                            example_profiler.register(part, code)
+                    except KeyboardInterrupt:  # nocover
+                        raise
+                    except Exception:
+                        raise
+                        # self.exc_info = sys.exc_info()
+                        # ex_type, ex_value, tb = self.exc_info
+                        # self.failed_tb_lineno = tb.tb_lineno
+                        # if on_error == 'raise':
+                        #     raise
                     try:
-                        # NOTE: For code passed to eval or exec, there is no
-                        # difference between locals and globals. Only pass in
-                        # one dict, otherwise there is weird behavior
-                        with cap:
-                            # We can execute each part using exec or eval.  If
-                            # a doctest part has `compile_mode=eval` we
-                            # exepect it to return an object with a repr that
-                            # can compared to a "want" statement.
-                            if part.compile_mode == 'eval':
-                                got_eval = eval(code, test_globals)
+                        # Execute the doctest code
+                        try:
+                            # NOTE: For code passed to eval or exec, there is no
+                            # difference between locals and globals. Only pass in
+                            # one dict, otherwise there is weird behavior
+                            tic = time.time()
+                            try:
+                                with cap:
+                                    # The alarm is armed outside of the
+                                    # profiled code, so it is not measured
+                                    alarm.arm(runstate['TIMEOUT'])
+                                    try:
+                                        if example_profiler is not None:
+                                            example_profiler.start(part, profile_part)
+                                        try:
+                                            # We can execute each part using exec or
+                                            # eval. If a doctest part has
+                                            # `compile_mode=eval` we exepect it to
+                                            # return an object with a repr that can
+                                            # compared to a "want" statement.
+                                            if part.compile_mode == 'eval':
+                                                got_eval = eval(code, test_globals)
+                                            else:
+                                                exec(code, test_globals)
+                                        finally:
+                                            if example_profiler is not None:
+                                                example_profiler.stop()
+                                    finally:
+                                        alarm.disarm()
+                            finally:
+                                self._add_phase_time('exec', time.time() - tic)
+
+                            # Record any standard output and "got_eval" produced by
+                            # this doctest_part.
+                            self.logged_evals[partx] = got_eval
+                            self.logged_stdout[partx] = cap.text
+                        except Exception as ex:
+                            if part.want:
+                                # A failure may be expected if the traceback
+                                # matches the part's want statement.
+                                exception = sys.exc_info()
+                                traceback.format_exception_only(*exception[:2])
+                                exc_got = traceback.format_exception_only(*exception[:2])[-1]
+                                want = part.want
+                                tic = time.time()
+                                try:
+                                    checker.check_exception(exc_got, want, runstate)
+                                finally:
+                                    self._add_phase_time('check', time.time() - tic)
                             else:
-                                exec(code, test_globals)
-
-                        # Record any standard output and "got_eval" produced by
-                        # this doctest_part.
-                        self.logged_evals[partx] = got_eval
-                        self.logged_stdout[partx] = cap.text
-                    except Exception as ex:
-                        if part.want:
-                            # A failure may be expected if the traceback
-                            # matches the part's want statement.
-                            exception = sys.exc_info()
-                            traceback.format_exception_only(*exception[:2])
-                            exc_got = traceback.format_exception_only(*exception[:2])[-1]
-                            want = part.want
-                            checker.check_exception(exc_got, want, runstate)
+                                raise
                         else:
-                            raise
-                    else:
-                        """
-                        TODO:
-                            [ ] - Delay got-want failure until the end of the
-                            doctest. Allow the rest of the code to run.  If
-                            multiple errors occur, show them both.
-                        """
-                        if part.want:
-                            got_stdout = cap.text
-                            if not runstate['IGNORE_WANT']:
-                                part.check(got_stdout, got_eval, runstate,
-                                           unmatched=self._unmatched_stdout)
-                            # Clear unmatched output when a check passes
-                            self._unmatched_stdout = []
-                        else:
-                            # If a part doesnt have a want allow its output to
-                            # be matched by the next part.
-                            self._unmatched_stdout.append(cap.text)
-
-                # Handle anything that could go wrong
-                except KeyboardInterrupt:  # nocover
-                    raise
-                except (exceptions.ExitTestException,
-                        exceptions._pytest.outcomes.Skipped):
-                    if verbose > 0:
-                        print('Test gracefully exists')
-                    break
-                except checker.GotWantException:
-                    # When the "got", does't match the "want"
-                    self.exc_info = sys.exc_info()
-                    if on_error == 'raise':
+                            """
+                            TODO:
+                                [ ] - Delay got-want failure until the end of the
+                                doctest. Allow the rest of the code to run.  If
+                                multiple errors occur, show them both.
+                            """
+                            if part.want:
+                                # Output moved to a file is read to check it
+                                got_stdout = six.text_type(cap.text)
+                                if not runstate['IGNORE_WANT']:
+                                    tic = time.time()
+                                    try:
+                                        if (stream_checker is not None and
+                                                stream_checker.started):
+                                            stream_checker.finish(got_eval)
+                                        else:
+                                            unmatched = [
+                                                six.text_type(text) for text
+                                                in self._unmatched_stdout]
+                                            part.check(got_stdout, got_eval,
+                                                       runstate,
+                                                       unmatched=unmatched)
+                                    finally:
+                                        self._add_phase_time('check',
+                                                             time.time() - tic)
+                                # Clear unmatched output when a check passes
+                                self._unmatched_stdout = []
+                            else:
+                                # If a part doesnt have a want allow its output to
+                                # be matched by the next part.
+                                self._unmatched_stdout.append(cap.text)
+
+                    # Handle anything that could go wrong
+                    except KeyboardInterrupt:  # nocover
                         raise
-                    break
-                except checker.ExtractGotReprException as ex:
-                    # When we fail to extract the "got"
-                    self.exc_info = sys.exc_info()
-                    if on_error == 'raise':
-                        raise ex.orig_ex
-                    break
-                except Exception as _ex_dbg:
-                    ex_type, ex_value, tb = sys.exc_info()
-
-                    DEBUG = 1
-                    if DEBUG:
-                        print('_ex_dbg = {!r}'.format(_ex_dbg))
-                        print('<DEBUG: doctest encountered exception>', file=sys.stderr)
-                        print(''.join(traceback.format_tb(tb)), file=sys.stderr)
-                        print('</DEBUG>', file=sys.stderr)
-
-                    # Search for the traceback that corresponds with the
-                    # doctest, and remove the parts that point to
-                    # boilerplate lines in this file.
-                    found_lineno = None
-                    for sub_tb in _traverse_traceback(tb):
-                        tb_filename = sub_tb.tb_frame.f_code.co_filename
-                        if tb_filename == self._partfilename:
-                            # Walk up the traceback until we find the one that has
-                            # the doctest as the base filename
-                            found_lineno = sub_tb.tb_lineno
-                            break
-                    if DEBUG:
-                        # The only traceback remaining should be
-                        # the part that is relevant to the user
-                        print('<DEBUG: best sub_tb>', file=sys.stderr)
-                        print('found_lineno = {!r}'.format(found_lineno), file=sys.stderr)
-                        print(''.join(traceback.format_tb(sub_tb)), file=sys.stderr)
-                        print('</DEBUG>', file=sys.stderr)
-
-                    if found_lineno is None:
+                    except (exceptions.ExitTestException,
+                            exceptions._pytest.outcomes.Skipped):
+                        if verbose > 0:
+                            print('Test gracefully exists')
+                        break
+                    except checker.GotWantException:
+                        # When the "got", does't match the "want"
+                        self.exc_info = sys.exc_info()
+                        if on_error == 'raise':
+                            raise
+                        break
+                    except checker.ExtractGotReprException as ex:
+                        # When we fail to extract the "got"
+                        self.exc_info = sys.exc_info()
+                        if on_error == 'raise':
+                            raise ex.orig_ex
+                        break
+                    except exceptions.DoctestTimeout:
+                        # When the example runs longer than its time limit
+                        self.exc_info = sys.exc_info()
+                        self.timed_out = True
+                        # Report the line that was running when time ran out
+                        self.failed_tb_lineno = 1
+                        for sub_tb in _traverse_traceback(self.exc_info[2]):
+                            tb_filename = sub_tb.tb_frame.f_code.co_filename
+                            if tb_filename == self._partfilename:
+                                self.failed_tb_lineno = sub_tb.tb_lineno
+                                break
+                        if on_error == 'raise':
+                            raise
+                        break
+                    except Exception as _ex_dbg:
+                        ex_type, ex_value, tb = sys.exc_info()
+
+                        DEBUG = 1
                         if DEBUG:
-                            print('UNABLE TO CLEAN TRACEBACK. EXIT DUE TO DEBUG')
-                            sys.exit(1)
-                        raise ValueError('Could not clean traceback: ex = {!r}'.format(_ex_dbg))
-                    else:
-                        self.failed_tb_lineno = found_lineno
-
-                    self.exc_info = (ex_type, ex_value, tb)
-
-                    # The idea of CLEAN_TRACEBACK is to make it so the
-                    # traceback from this function doesn't clutter the error
-                    # message the user sees.
-                    if on_error == 'raise':
-                        raise
-                    break
-                finally:
-                    assert cap.text is not None
-                    # Ensure that we logged the output even in failure cases
-                    self.logged_evals[partx] = got_eval
-                    self.logged_stdout[partx] = cap.text
+                            print('_ex_dbg = {!r}'.format(_ex_dbg))
+                            print('<DEBUG: doctest encountered exception>', file=sys.stderr)
+                            print(''.join(traceback.format_tb(tb)), file=sys.stderr)
+                            print('</DEBUG>', file=sys.stderr)
+
+                        # Search for the traceback that corresponds with the
+                        # doctest, and remove the parts that point to
+                        # boilerplate lines in this file.
+                        found_lineno = None
+                        for sub_tb in _traverse_traceback(tb):
+                            tb_filename = sub_tb.tb_frame.f_code.co_filename
+                            if tb_filename == self._partfilename:
+                                # Walk up the traceback until we find the one that has
+                                # the doctest as the base filename
+                                found_lineno = sub_tb.tb_lineno
+                                break
+                        if DEBUG:
+                            # The only traceback remaining should be
+                            # the part that is relevant to the user
+                            print('<DEBUG: best sub_tb>', file=sys.stderr)
+                            print('found_lineno = {!r}'.format(found_lineno), file=sys.stderr)
+                            print(''.join(traceback.format_tb(sub_tb)), file=sys.stderr)
+                            print('</DEBUG>', file=sys.stderr)
+
+                        if found_lineno is None:
+                            if DEBUG:
+                                print('UNABLE TO CLEAN TRACEBACK. EXIT DUE TO DEBUG')
+                                sys.exit(1)
+                            raise ValueError('Could not clean traceback: ex = {!r}'.format(_ex_dbg))
+                        else:
+                            self.failed_tb_lineno = found_lineno
+
+                        self.exc_info = (ex_type, ex_value, tb)
+
+                        # The idea of CLEAN_TRACEBACK is to make it so the
+                        # traceback from this function doesn't clutter the error
+                        # message the user sees.
+                        if on_error == 'raise':
+                            raise
+                        break
+                    finally:
+                        assert cap.text is not None
+                        # Ensure that we logged the output even in failure cases
+                        self.logged_evals[partx] = got_eval
+                        self.logged_stdout[partx] = cap.text
+        finally:
+            # Also clean up if an error is raised to the caller
+            alarm.close()
+            cap.close()
+            if example_profiler is not None:
+                example_profiler.close()
+                self.profile_fpaths = example_profiler.dump(
+                    self.config.getvalue('profile_dpath'),
+                    profiler.example_fname(self))
 
         if self.exc_info is None:
             self.failed_part = None
+        # Output that no part wanted is still in logged_stdout
+        self._unmatched_stdout = []
 
         if len(self._skipped_parts) == len(self._parts):
             # we skipped everything
@@ -644,7 +860,13 @@ class DocTest(object):
                 import pytest
                 pytest.skip()
 
-        summary = self._post_run(verbose)
+        tic = time.time()
+        self._reporting = True
+        try:
+            summary = self._post_run(verbose)
+        finally:
+            self._reporting = False
+            self._add_phase_time('report', time.time() - tic)
         return summary
 
     @property
@@ -822,6 +1044,7 @@ class DocTest(object):
 
         if self.exc_info is None:
             return []
+        tic = time.time()
         ex_type, ex_value, tb = self.exc_info
         # Failure line offset wrt the doctest (starts from 0)
         fail_offset = self.failed_line_offset()
@@ -875,7 +1098,8 @@ class DocTest(object):
                 # temp[tindex] += [utils.indent(part_text, ' ' * 4)]
                 # temp[tindex] += [utils.indent(' >>> # skipped', indent_text)]
                 continue
-            part_out = r1_strip_nl(self.logged_stdout.get(partx, ''))
+            part_out = r1_strip_nl(six.text_type(
+                self.logged_stdout.get(partx, None) or ''))
             if part is self.failed_part:
                 tindex += 1
             # Append the part source code
@@ -977,10 +1201,14 @@ class DocTest(object):
         lines += [self._color(self._block_prefix + ' REPRODUCTION', 'white')]
         lines += ['CommandLine:']
         lines += ['    ' + self.cmdline]
+        if not self._reporting:
+            # Failures are also formatted by runners after the doctest ran
+            self._add_phase_time('report', time.time() - tic)
         return lines
 
     def _print_captured(self):
-        out_text = ''.join([v for v in self.logged_stdout.values() if v])
+        out_text = ''.join([six.text_type(v)
+                            for v in self.logged_stdout.values() if v])
         if out_text is not None:
             assert isinstance(out_text, six.text_type), 'do not use ascii'
         try:
@@ -1013,6 +1241,7 @@ class DocTest(object):
             'passed': passed,
             'skipped': skipped,
             'failed': failed,
+            'timed_out': self.timed_out,
         }
 
         if verbose >= 2:
@@ -1029,7 +1258,10 @@ class DocTest(object):
                 print('* {}: {}'.format(success, self.node))
         else:
             if verbose >= 1:
-                failure = self._color('FAILURE', 'red')
+                if self.timed_out:
+                    failure = self._color('TIMEOUT', 'red')
+                else:
+                    failure = self._color('FAILURE', 'red')
                 print('* {}: {}'.format(failure, self.node))
 
                 if verbose >= 2:
@@ -1053,6 +1285,91 @@ def _traverse_traceback(tb):
         yield sub_tb
 
 
+def _in_main_thread():
+    """ True if called from the main thread, even if it was renamed """
+    main_thread = getattr(threading, 'main_thread', None)
+    if main_thread is None:  # nocover
+        # Python 2 does not have threading.main_thread
+        return isinstance(threading.current_thread(), threading._MainThread)
+    return threading.current_thread() is main_thread()
+
+
+class _ExampleAlarm(object):
+    """
+    Interrupts an example with :class:`DoctestTimeout` once it has been
+    running for longer than its time limit.
+
+    The limit is enforced with SIGALRM, so it only works on platforms with
+    :func:`signal.setitimer` and when examples run in the main thread.
+    Otherwise a warning is issued and the example runs without a limit.
+
+    Example:
+        >>> from xdoctest.doctest_example import _ExampleAlarm
+        >>> import time
+        >>> alarm = _ExampleAlarm(time.time())
+        >>> # xdoctest: +REQUIRES(POSIX)
+        >>> alarm.arm(0.05)
+        >>> try:
+        ...     while True:
+        ...         pass
+        ... except exceptions.DoctestTimeout as ex:
+        ...     print(ex)
+        ... finally:
+        ...     alarm.disarm()
+        example timed out after 0.05 seconds
+        >>> alarm.close()
+    """
+    def __init__(self, start):
+        self.start = start
+        self.limit = None
+        self._installed = False
+        self._prev_handler = None
+        self._warned = False
+
+    @staticmethod
+    def available():
+        return hasattr(signal, 'setitimer') and _in_main_thread()
+
+    def arm(self, limit):
+        """
+        Raises DoctestTimeout in the running code once ``limit`` seconds have
+        passed since the start of the example.
+        """
+        if limit is None:
+            return
+        if not self._installed:
+            if not self.available():
+                if not self._warned:
+                    self._warned = True
+                    warnings.warn('The time limit of this example is not '
+                                  'enforced, because SIGALRM can not be used '
+                                  'here')
+                return
+            self._prev_handler = signal.signal(signal.SIGALRM, self._handler)
+            self._installed = True
+        self.limit = limit
+        remaining = self.start + limit - time.time()
+        # A zero delay would disable the timer instead of firing it
+        signal.setitimer(signal.ITIMER_REAL, max(remaining, 1e-6))
+
+    def disarm(self):
+        if self.limit is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            self.limit = None
+
+    def close(self):
+        """ Restores the SIGALRM handler that was active before """
+        self.disarm()
+        if self._installed:
+            signal.signal(signal.SIGALRM, self._prev_handler)
+            self._installed = False
+
+    def _handler(self, signum, frame):
+        raise exceptions.DoctestTimeout(
+            'example timed out after {} seconds'.format(self.limit),
+            self.limit)
+
+
 if __name__ == '__main__':
     r"""
     CommandLine:
@@ -59,6 +59,24 @@ class DoctestPart(object):
     def source(self):
         return '\n'.join(self.exec_lines)
 
+    def compile(self, filename, flags=0):
+        """
+        Compiles the source of this part, reusing the code object if this part
+        was already compiled with the same filename and flags.
+
+        Args:
+            filename (str): filename reported in tracebacks
+            flags (int): compiler flags (e.g. for future features)
+
+        Example:
+            >>> self = DoctestPart(['x = 1'], None, 0)
+            >>> code = self.compile('<doctest:example>')
+            >>> assert self.compile('<doctest:example>') is code
+        """
+        from xdoctest import cache
+        return cache.CODE_CACHE.compile(self.source, self.compile_mode,
+                                        filename, flags)
+
     @property
     def directives(self):
         """
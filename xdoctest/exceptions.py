@@ -32,6 +32,29 @@ class IncompleteParseError(SyntaxError):
     """
     pass
 
+
+class DoctestTimeout(BaseException):
+    """
+    Raised inside an example that runs longer than its time limit.
+
+    This derives from BaseException so a broad ``except Exception`` in the
+    code of the example cannot swallow it.
+    """
+    def __init__(self, msg, seconds=None):
+        super(DoctestTimeout, self).__init__(msg, seconds)
+        self.msg = msg
+        self.seconds = seconds
+
+    def __str__(self):
+        return self.msg
+
+
+class ServerUnavailable(Exception):
+    """
+    Raised when no xdoctest server is listening on the requested socket.
+    """
+    pass
+
 try:
     import _pytest
     import _pytest.outcomes
@@ -33,9 +33,11 @@ there is room for improvement here.
 from __future__ import print_function, division, absolute_import, unicode_literals
 import six
 import ast
+import bisect
 import sys
 import re
 import itertools as it
+import tokenize
 from xdoctest import utils
 from xdoctest import checker
 from xdoctest import directive
@@ -276,7 +278,8 @@ class DoctestParser(object):
         def slice_example(s1, s2, want_lines=None):
             exec_lines = exec_source_lines[s1:s2]
             orig_lines = source_lines[s1:s2]
-            directives = ps1_to_directive.get(s1, None)
+            # Directives always start a new part, so this is all of them
+            directives = ps1_to_directive.get(s1, [])
             example = doctest_part.DoctestPart(exec_lines,
                                                want_lines=want_lines,
                                                orig_lines=orig_lines,
@@ -452,6 +455,14 @@ class DoctestParser(object):
         # Strip indentation (and PS1 / PS2 from source)
         exec_source_lines = [p[4:] for p in source_lines]
 
+        # Find where each logical line starts with a single tokenize pass.
+        # If the source cannot be tokenized as a whole, fallback to searching
+        # for balanced intervals, which is quadratic in the number of lines.
+        try:
+            logical_starts = static.logical_line_starts(exec_source_lines)
+        except (tokenize.TokenError, SyntaxError):
+            logical_starts = None
+
         def _hack_comment_statements(lines):
             # Hack to make comments appear like executable statements
             # note, this hack never leaves this function because we only are
@@ -491,12 +502,29 @@ class DoctestParser(object):
                 else:
                     yield line
 
-        exec_source_lines = list(_hack_comment_statements(exec_source_lines))
+        raw_source_lines = exec_source_lines
+        if logical_starts is None:
+            exec_source_lines = list(_hack_comment_statements(exec_source_lines))
+        else:
+            start_set = set(logical_starts)
+            exec_source_lines = [
+                '_._ = None' if i in start_set and line.startswith('#') else line
+                for i, line in enumerate(exec_source_lines)
+            ]
 
         source_block = '\n'.join(exec_source_lines)
         try:
             pt = static.six_axt_parse(source_block)
         except SyntaxError as syn_ex:
+            if logical_starts is not None:
+                # Report invalid code exactly as the balanced interval search
+                # would, which may raise an IncompleteParseError instead.
+                exec_source_lines = list(_hack_comment_statements(raw_source_lines))
+                source_block = '\n'.join(exec_source_lines)
+                try:
+                    static.six_axt_parse(source_block)
+                except SyntaxError as ex:
+                    syn_ex = ex
             # Assign missing information to the syntax error.
             if syn_ex.text is None:
                 if syn_ex.lineno is not None:
@@ -511,8 +539,15 @@ class DoctestParser(object):
         ps1_linenos = [node.lineno - 1 for node in statement_nodes]
         NEED_16806_WORKAROUND = True
         if NEED_16806_WORKAROUND:  # pragma: nobranch
-            ps1_linenos = self._workaround_16806(
-                ps1_linenos, exec_source_lines)
+            if logical_starts is None:
+                ps1_linenos = self._workaround_16806(
+                    ps1_linenos, exec_source_lines)
+            else:
+                # Move each statement to the start of its logical line
+                ps1_linenos = [
+                    logical_starts[bisect.bisect_right(logical_starts, a) - 1]
+                    for a in ps1_linenos
+                ]
 
         # Respect any line explicitly defined as PS2 (via its prefix)
         ps2_linenos = {
@@ -651,7 +686,8 @@ class DoctestParser(object):
         #     want -> [want, text, dsrc]
         prev_state = TEXT
         curr_state = None
-        line_iter = enumerate(string.splitlines())
+        all_lines = string.splitlines()
+        line_iter = enumerate(all_lines)
 
         for line_idx, line in line_iter:
             match = INDENT_RE.search(line)
@@ -721,7 +757,8 @@ class DoctestParser(object):
                 try:
                     if DEBUG:  # nocover
                         print('completing source')
-                    for part, norm_line in _complete_source(line, state_indent, line_iter):
+                    for part, norm_line in _complete_source(line, state_indent, line_iter,
+                                                            all_lines, line_idx):
                         if DEBUG> 4:  # nocover
                             print('part = {!r}'.format(part))
                             print('norm_line = {!r}'.format(norm_line))
@@ -771,10 +808,76 @@ def _min_indentation(s):
         return 0
 
 
-def _complete_source(line, state_indent, line_iter):
+class _ExtentUnknown(Exception):
+    pass
+
+
+def _find_balanced_extent(lines, line_idx, state_indent):
+    """
+    Finds how many lines, starting with ``lines[line_idx]``, complete the
+    doctest source that begins on that line using a single tokenize pass.
+
+    Args:
+        lines (List[str]): all lines of the docstring
+        line_idx (int): index of the line that begins the source
+        state_indent (int): indentation of the doctest
+
+    Returns:
+        int | None: the number of lines in the completed source, or None if
+            the source cannot be completed by simply consuming prefixed lines,
+            in which case each prefix must be checked individually.
+
+    Example:
+        >>> lines = ['>>> x = [1,', '... 2]', '>>> y = 3']
+        >>> _find_balanced_extent(lines, 0, 0)
+        2
+        >>> _find_balanced_extent(lines, 2, 0)
+        1
+        >>> print(_find_balanced_extent(['>>> x = ['], 0, 0))
+        None
+    """
+    state = {'row': 0}
+
+    def _readline():
+        idx = line_idx + state['row']
+        if idx >= len(lines):
+            raise _ExtentUnknown
+        norm_line = lines[idx][state_indent:]
+        if state['row'] > 0 and norm_line[:4].strip() not in {'>>>', '...', ''}:
+            raise _ExtentUnknown
+        suffix = norm_line[4:]
+        if suffix.endswith('\\'):
+            # backslash continuations are handled differently when each
+            # prefix is checked on its own.
+            raise _ExtentUnknown
+        state['row'] += 1
+        return suffix + '\n'
+
+    depth = 0
+    try:
+        for tok in tokenize.generate_tokens(_readline):
+            tok_type, tok_str = tok[0], tok[1]
+            if tok_type == tokenize.OP:
+                if tok_str in '([{':
+                    depth += 1
+                elif tok_str in ')]}':
+                    depth -= 1
+                    if depth < 0:
+                        return None
+            elif tok_type == tokenize.NEWLINE or (tok_type == tokenize.NL and depth == 0):
+                return tok[2][0]
+    except (_ExtentUnknown, tokenize.TokenError, SyntaxError):
+        pass
+    return None
+
+
+def _complete_source(line, state_indent, line_iter, lines=None, line_idx=None):
     """
     helper
     remove lines from the iterator if they are needed to complete source
+
+    If ``lines`` and ``line_idx`` are given, the number of lines to consume is
+    determined with a single tokenize pass when possible.
     """
     norm_line = line[state_indent:]  # Normalize line indentation
     prefix = norm_line[:4]
@@ -782,6 +885,14 @@ def _complete_source(line, state_indent, line_iter):
     assert prefix.strip() in {'>>>', '...'}, '{}'.format(prefix)
     yield line, norm_line
 
+    if lines is not None:
+        n_lines = _find_balanced_extent(lines, line_idx, state_indent)
+        if n_lines is not None:
+            for _ in range(n_lines - 1):
+                _, next_line = next(line_iter)
+                yield next_line, next_line[state_indent:]
+            return
+
     source_parts = [suffix]
 
     # These hacks actually modify the input doctest slighly
@@ -16,6 +16,7 @@ this code is heavilly based on `pytest/_pytest/doctest.py` plugin file:
 
 """
 from __future__ import print_function, division, absolute_import
+from os.path import join
 import pytest
 from _pytest._code import code
 from _pytest import fixtures
@@ -86,6 +87,39 @@ def pytest_addoption(parser):
                     choices=core.DOCTEST_STYLES,
                     dest='xdoctest_style')
 
+    group.addoption('--xdoctest-changed', '--xdoc-changed',
+                    action='store_true', default=False,
+                    help=('only run xdoctests that changed or did not pass '
+                          'since the last run with this option'),
+                    dest='xdoctest_changed')
+
+    group.addoption('--xdoctest-phase-times', '--xdoc-phase-times',
+                    action='store_true', default=False,
+                    help=('report the time xdoctests spent parsing, importing, '
+                          'compiling, executing, checking, and reporting'),
+                    dest='xdoctest_phase_times')
+
+    group.addoption('--xdoctest-num-shards', '--xdoc-num-shards',
+                    type=int, default=None,
+                    help=('split the xdoctests into N shards with about the '
+                          'same total runtime, based on the durations '
+                          'recorded by earlier runs with '
+                          '--xdoctest-cache-dir and without shards'),
+                    dest='xdoctest_num_shards')
+
+    group.addoption('--xdoctest-shard-id', '--xdoc-shard-id',
+                    type=int, default=None,
+                    help='only run the xdoctests of shard K of --xdoctest-num-shards',
+                    dest='xdoctest_shard_id')
+
+    group.addoption('--xdoctest-cache-dir', '--xdoc-cache-dir',
+                    type=str, nargs='?', const='.xdoctest_cache', default=None,
+                    help=('store the state of xdoctest runs in this directory '
+                          '(relative to the rootdir), and record the duration '
+                          'of each xdoctest. Defaults to .xdoctest_cache if no '
+                          'value is given'),
+                    dest='xdoctest_cache_dpath')
+
     from xdoctest import doctest_example
     doctest_example.Config()._update_argparse_cli(
         group.addoption, prefix=['xdoctest', 'xdoc'],
@@ -102,6 +136,111 @@ def pytest_collect_file(path, parent):
         return XDoctestTextfile(path, parent)
 
 
+def _cache_dpath(config):
+    """
+    The directory given with ``--xdoctest-cache-dir``, or the default cache
+    directory in the rootdir.
+    """
+    from xdoctest import cache
+    dpath = config.getvalue('xdoctest_cache_dpath') or cache.DEFAULT_CACHE_DPATH
+    return join(str(config.rootdir), dpath)
+
+
+def _changed_state(config):
+    """
+    Returns the state used by ``--xdoctest-changed`` or None if the option is
+    not enabled. The state is shared by the entire session.
+    """
+    if not config.getvalue('xdoctest_changed'):
+        return None
+    state = getattr(config, '_xdoctest_changed_state', None)
+    if state is None:
+        from xdoctest import cache
+        state = config._xdoctest_changed_state = cache.ChangedState(
+            _cache_dpath(config))
+    return state
+
+
+def _duration_state(config):
+    """
+    Returns the durations of earlier runs, which are used to balance the
+    shards of ``--xdoctest-num-shards``. The state is shared by the entire
+    session.
+    """
+    state = getattr(config, '_xdoctest_duration_state', None)
+    if state is None:
+        from xdoctest import cache
+        state = config._xdoctest_duration_state = cache.DurationState(
+            _cache_dpath(config))
+    return state
+
+
+def pytest_collection_modifyitems(session, config, items):
+    num_shards = config.getvalue('xdoctest_num_shards')
+    shard_id = config.getvalue('xdoctest_shard_id')
+    if num_shards is None and shard_id is None:
+        return
+    if num_shards is None or shard_id is None:
+        raise pytest.UsageError('--xdoctest-shard-id and '
+                                '--xdoctest-num-shards must be given together')
+    # Only xdoctests are split, other tests run in every shard
+    from xdoctest import sharding
+    xdoc_items = [item for item in items if isinstance(item, XDoctestItem)]
+    keys = [item.nodeid for item in xdoc_items]
+    try:
+        selected = sharding.select_shard(
+            xdoc_items, shard_id, num_shards, keys,
+            _duration_state(config).durations)
+    except ValueError as ex:
+        raise pytest.UsageError(str(ex))
+    selected = set(selected)
+    deselected = [item for item in xdoc_items if item not in selected]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = [item for item in items
+                    if not isinstance(item, XDoctestItem) or item in selected]
+
+
+def pytest_sessionfinish(session):
+    for attr in ['_xdoctest_changed_state', '_xdoctest_duration_state']:
+        state = getattr(session.config, attr, None)
+        if state is not None:
+            state.save()
+
+
+def _record_phase_times(item):
+    """
+    Adds the phase times of an item's example to the session totals used by
+    ``--xdoctest-phase-times`` and attaches them to the item's report.
+    """
+    from collections import OrderedDict
+    from xdoctest import doctest_example
+    config = item.config
+    totals = getattr(config, '_xdoctest_phase_times', None)
+    if totals is None:
+        totals = config._xdoctest_phase_times = OrderedDict(
+            (phase, 0) for phase in doctest_example.PHASES)
+    for phase, seconds in item.example.phase_times.items():
+        totals[phase] += seconds
+    item.user_properties.append(('xdoctest_phase_times',
+                                 dict(item.example.phase_times)))
+
+
+def pytest_terminal_summary(terminalreporter):
+    totals = getattr(terminalreporter.config, '_xdoctest_phase_times', None)
+    if totals is not None:
+        from xdoctest import runner
+        terminalreporter.write_sep('=', 'xdoctest phase times')
+        for line in runner.format_phase_times(totals).split('\n'):
+            terminalreporter.write_line(line)
+    profiled = getattr(terminalreporter.config, '_xdoctest_profiled', None)
+    if profiled:
+        from os.path import dirname
+        terminalreporter.write_line('wrote xdoctest profiles of {} example(s) '
+                                    'to {}'.format(len(profiled),
+                                                   dirname(profiled[0][0])))
+
+
 def _is_xdoctest(config, path, parent):
     if path.ext in ('.txt', '.rst') and parent.session.isinitpath(path):
         return True
@@ -124,14 +263,94 @@ class ReprFailXDoctest(code.TerminalRepr):
         self.reprlocation.toterminal(tw)
 
 
+class _LazyExample(object):
+    """
+    The minimal description of a doctest example that is needed to parse it
+    when it is about to run.
+
+    Google-style examples keep only the source of their block. Freeform
+    examples are assembled from the parts of an entire docstring, so they
+    keep the docstring and are rebuilt by parsing it again.
+
+    Example:
+        >>> from xdoctest.plugin import _LazyExample
+        >>> from xdoctest import core
+        >>> docstr = 'Example:\\n    >>> x = 1\\n    >>> print(x)\\n    1'
+        >>> example = next(core.parse_docstr_examples(
+        ...     docstr, 'func', lineno=10, parser_kw={'eager_parse': False}))
+        >>> assert example._parts is None
+        >>> lazy = _LazyExample(example, docstr, doclineno=10)
+        >>> built = lazy.build()
+        >>> assert built.lineno == example.lineno == lazy.lineno
+        >>> assert built.run(on_error='raise')['passed']
+    """
+    __slots__ = ('docsrc', 'modpath', 'callname', 'num', 'lineno',
+                 'block_type', 'doclineno')
+
+    def __init__(self, example, docstr, doclineno):
+        if example.block_type is None:
+            self.docsrc = docstr
+        else:
+            self.docsrc = example.docsrc
+        self.modpath = None if example.modpath == '<modpath?>' else example.modpath
+        self.callname = example.callname
+        self.num = example.num
+        self.lineno = example.lineno
+        self.block_type = example.block_type
+        self.doclineno = doclineno
+
+    def build(self):
+        """
+        Returns:
+            xdoctest.doctest_example.DocTest: the parsed example
+
+        Raises:
+            xdoctest.exceptions.DoctestParseError: if the example is malformed
+        """
+        from xdoctest import core
+        from xdoctest import doctest_example
+        if self.block_type is None:
+            for example in core.parse_freeform_docstr_examples(
+                    self.docsrc, callname=self.callname, modpath=self.modpath,
+                    lineno=self.doclineno):
+                if example.num == self.num:
+                    return example
+            raise KeyError('Unable to find {}:{} in its docstring'.format(
+                self.callname, self.num))
+        else:
+            example = doctest_example.DocTest(self.docsrc, self.modpath,
+                                              self.callname, self.num,
+                                              lineno=self.lineno,
+                                              block_type=self.block_type)
+            example._parse()
+            return example
+
+
 class XDoctestItem(pytest.Item):
-    def __init__(self, name, parent, example=None):
+    """
+    Runs a single doctest example.
+
+    Items collected from modules only hold a lightweight description of their
+    example. It is parsed when the item is set up and discarded again when
+    the item is torn down.
+    """
+    def __init__(self, name, parent, example=None, lazy_example=None):
         super(XDoctestItem, self).__init__(name, parent)
         self.example = example
+        self.lazy_example = lazy_example
         self.obj = None
         self.fixture_request = None
 
     def setup(self):
+        if self.example is None and self.lazy_example is not None:
+            from xdoctest import exceptions
+            try:
+                self.example = self.lazy_example.build()
+            except exceptions.DoctestParseError as ex:
+                # A malformed example is an error, not something to ignore
+                pytest.fail('unable to parse doctest: {!r}'.format(ex),
+                            pytrace=False)
+            self.example.config.update(self.parent._examp_conf)
         if self.example is not None:
             self.fixture_request = _setup_fixtures(self)
             global_namespace = dict(getfixture=self.fixture_request.getfixturevalue)
@@ -143,13 +362,42 @@ class XDoctestItem(pytest.Item):
         if self.example.is_disabled(pytest=True):
             pytest.skip('doctest encountered global skip directive')
         # verbose = self.example.config['verbose']
-        self.example.run(on_error='raise')
+        state = _changed_state(self.config)
+        if state is None:
+            self.example.run(on_error='raise')
+        else:
+            passed = False
+            try:
+                self.example.run(on_error='raise')
+                passed = True
+            finally:
+                state.record(self.example, passed)
         if not self.example.anything_ran():
             pytest.skip('doctest is empty or all parts were skipped')
 
+    def teardown(self):
+        if self.example is not None:
+            if self.config.getvalue('xdoctest_phase_times'):
+                _record_phase_times(self)
+            if (self.config.getvalue('xdoctest_num_shards') is None and
+                    self.config.getvalue('xdoctest_cache_dpath') is not None):
+                # Every shard must see the same durations to agree on the
+                # split, so they are only recorded by runs without shards.
+                # Runs without a cache directory do not write any files.
+                _duration_state(self.config).record(
+                    self.nodeid, sum(self.example.phase_times.values()))
+            if self.example.profile_fpaths:
+                profiled = getattr(self.config, '_xdoctest_profiled', [])
+                profiled.append(self.example.profile_fpaths)
+                self.config._xdoctest_profiled = profiled
+        if self.lazy_example is not None:
+            # Free the parsed parts, namespace, and outputs of the example
+            self.example = None
+            self.fixture_request = None
+
     def repr_failure(self, excinfo):
         example = self.example
-        if example.exc_info is not None:
+        if example is not None and example.exc_info is not None:
             lineno = example.failed_lineno()
             type = example.exc_info[0]
             message = type.__name__
@@ -161,7 +409,11 @@ class XDoctestItem(pytest.Item):
             return super(XDoctestItem, self).repr_failure(excinfo)
 
     def reportinfo(self):
-        return self.fspath, self.example.lineno, "[xdoctest] %s" % self.name
+        if self.example is None:
+            lineno = self.lazy_example.lineno
+        else:
+            lineno = self.example.lineno
+        return self.fspath, lineno, "[xdoctest] %s" % self.name
 
 
 class _XDoctestBase(pytest.Module):
@@ -211,19 +463,36 @@ class XDoctestModule(_XDoctestBase):
         style = self.config.getvalue('xdoctest_style')
         self._prepare_internal_config()
 
+        state = _changed_state(self.config)
+
+        # Only locate the examples here. Their parts are parsed when each
+        # item is set up, so unselected items never pay for it.
+        parser_kw = {'eager_parse': False}
         try:
-            examples = list(core.parse_doctestables(modpath, style=style))
+            for calldefs, modpath in core.package_calldefs(modpath,
+                                                           prefilter=True):
+                for callname, calldef in calldefs.items():
+                    docstr = calldef.docstr
+                    if docstr is None:
+                        continue
+                    examples = core.parse_docstr_examples(
+                        docstr, callname=callname, modpath=modpath,
+                        lineno=calldef.doclineno, style=style,
+                        parser_kw=parser_kw)
+                    for example in examples:
+                        if state is not None and not state.is_changed(example):
+                            continue
+                        lazy_example = _LazyExample(example, docstr,
+                                                    calldef.doclineno)
+                        name = example.unique_callname
+                        yield XDoctestItem(name, self,
+                                           lazy_example=lazy_example)
         except SyntaxError:
             if self.config.getvalue('xdoctest_ignore_syntax_errors'):
                 pytest.skip('unable to import module %r' % self.fspath)
             else:
                 raise
 
-        for example in examples:
-            example.config.update(self._examp_conf)
-            name = example.unique_callname
-            yield XDoctestItem(name, self, example)
-
 
 def _setup_fixtures(xdoctest_item):
     """
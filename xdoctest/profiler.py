@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling of the code executed by individual doctests.
+
+Profiling is enabled for the parts of a doctest that follow a
+``# xdoctest: +PROFILE`` directive, or for every example when the
+``--profile-top`` or ``--tracemalloc`` options are given. Each profiled
+example writes its results into the profile directory (``xdoctest-profile``
+by default):
+
+    * ``<name>.pstats`` - the raw :mod:`cProfile` statistics, which can be
+        loaded with :class:`pstats.Stats` or tools like ``snakeviz``.
+
+    * ``<name>.prof.txt`` - the top functions sorted by cumulative time.
+
+    * ``<name>.alloc.txt`` - the top allocation sites and the doctest lines
+        that caused them (requires :mod:`tracemalloc`).
+
+The code of a doctest is compiled with the filename ``<doctest:node>`` and the
+line numbers of each part start at 1. Entries that belong to the doctest are
+renumbered so they refer to the line in the source file, which is the same
+line number used when reporting failures.
+
+CommandLine:
+    python -m xdoctest xdoctest all --profile-top=10
+    python -m xdoctest xdoctest all --tracemalloc --profile-dir=profiles
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+from os.path import join
+import dis
+import io
+import os
+import re
+import sys
+import types
+import cProfile
+import pstats
+try:
+    import tracemalloc
+except ImportError:  # nocover
+    # Python 2 does not have tracemalloc
+    tracemalloc = None
+
+
+DEFAULT_PROFILE_DPATH = 'xdoctest-profile'
+
+DEFAULT_TOP = 10
+
+# Number of frames stored with each traced allocation. Enough frames are
+# needed to walk from the allocation back to the doctest line causing it.
+_TRACEMALLOC_NFRAMES = 25
+
+
+class ExampleProfiler(object):
+    """
+    Collects cProfile and tracemalloc statistics for the parts of an example.
+
+    Args:
+        filename (str): the filename the parts of the example are compiled with
+        lineno (int): the line in the source file the example begins on
+        trace_memory (bool): if True, collect tracemalloc statistics
+        top (int): number of entries to include in the text reports
+
+    Example:
+        >>> from xdoctest.profiler import *
+        >>> from xdoctest import doctest_example
+        >>> from xdoctest import utils
+        >>> example = doctest_example.DocTest(utils.codeblock(
+        ...     '''
+        ...     >>> def func():
+        ...     ...     return sum(range(100))
+        ...     >>> x = func()
+        ...     '''), callname='func', lineno=10)
+        >>> example._parse()
+        >>> filename = '<doctest:' + example.node + '>'
+        >>> self = ExampleProfiler(filename, example.lineno)
+        >>> namespace = {}
+        >>> for part in example._parts:
+        ...     code = part.compile(filename)
+        ...     self.register(part, code)
+        ...     self.start(part)
+        ...     exec(code, namespace)
+        ...     self.stop()
+        >>> temp = utils.TempDir()
+        >>> fpaths = self.dump(temp.ensure(), 'func')
+        >>> assert [os.path.basename(p) for p in fpaths] == [
+        ...     'func.pstats', 'func.prof.txt']
+        >>> text = open(fpaths[1]).read()
+        >>> # The function is attributed to its line in the source file
+        >>> assert filename + ':10(func)' in text
+    """
+
+    def __init__(self, filename, lineno=1, trace_memory=False, top=None):
+        if trace_memory and tracemalloc is None:  # nocover
+            import warnings
+            warnings.warn('tracemalloc is not available in this version of '
+                          'Python. Allocations will not be traced')
+            trace_memory = False
+        self.filename = filename
+        self.lineno = lineno
+        self.trace_memory = trace_memory
+        self.top = DEFAULT_TOP if top is None else top
+
+        self.stats = {}
+        self.n_parts = 0
+        self.alloc_sites = {}
+        self.alloc_lines = {}
+
+        self._func_offsets = {}
+        self._line_offsets = {}
+
+        self._part = None
+        self._profiler = None
+        self._snapshot = None
+        self._started_tracing = False
+
+    def start(self, part, profile=True):
+        """
+        Starts collecting statistics for a part of the example
+
+        Args:
+            part (DoctestPart): the part about to be executed
+            profile (bool): if False, only allocations are traced
+        """
+        self._part = part
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(_TRACEMALLOC_NFRAMES)
+                self._started_tracing = True
+            self._snapshot = tracemalloc.take_snapshot()
+        if profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self):
+        """
+        Stops collecting statistics and merges them into the example totals
+        """
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.create_stats()
+            self._merge_stats(self._profiler.stats)
+            self._profiler = None
+        if self._snapshot is not None:
+            after = tracemalloc.take_snapshot()
+            self._merge_allocations(self._snapshot, after)
+            self._snapshot = None
+        self.n_parts += 1
+        self._part = None
+
+    def close(self):
+        """
+        Stops tracemalloc if it was started by this profiler
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def register(self, part, code):
+        """
+        Records the functions defined by a part of the example.
+
+        All parts share the same filename and their line numbers start at 1,
+        so functions defined in one part and called from another can only be
+        attributed to the right lines if every executed part is registered.
+
+        Args:
+            part (DoctestPart): a part of the example
+            code (CodeType): the compiled code of the part
+        """
+        stack = [c for c in code.co_consts if isinstance(c, types.CodeType)]
+        while stack:
+            sub = stack.pop()
+            self._func_offsets[(sub.co_firstlineno, sub.co_name)] = part.line_offset
+            for _, lineno in dis.findlinestarts(sub):
+                self._line_offsets[lineno] = part.line_offset
+            stack.extend(c for c in sub.co_consts
+                         if isinstance(c, types.CodeType))
+
+    def _source_lineno(self, lineno, offset=None):
+        # Line numbers of compiled parts are relative to the part
+        if offset is None:
+            offset = self._part.line_offset
+        return self.lineno + offset + lineno - 1
+
+    def _rename(self, func):
+        filename, lineno, funcname = func
+        if filename == self.filename:
+            offset = self._func_offsets.get((lineno, funcname), None)
+            if funcname == '<module>':
+                # Module level code always belongs to the running part. Its
+                # first line depends on the Python version (it is always 1
+                # since 3.8), so use the first line of code in the part.
+                lineno = _first_code_lineno(self._part)
+                offset = None
+            return (filename, self._source_lineno(lineno, offset), funcname)
+        return func
+
+    def _merge_stats(self, stats):
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            if _is_overhead(func):
+                continue
+            func = self._rename(func)
+            callers = {self._rename(k): v for k, v in callers.items()
+                       if not _is_overhead(k)}
+            if func in self.stats:
+                # Combine with the same function called from another part
+                old_cc, old_nc, old_tt, old_ct, old_callers = self.stats[func]
+                for k, v in callers.items():
+                    if k in old_callers:
+                        v = pstats.add_callers({k: old_callers[k]}, {k: v})[k]
+                    old_callers[k] = v
+                self.stats[func] = (old_cc + cc, old_nc + nc, old_tt + tt,
+                                    old_ct + ct, old_callers)
+            else:
+                self.stats[func] = (cc, nc, tt, ct, callers)
+
+    def _merge_allocations(self, before, after):
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, _module_fpath(__file__)),
+            tracemalloc.Filter(False, _module_fpath(cProfile.__file__)),
+            # the frame of DocTest.run that executes the part
+            tracemalloc.Filter(False, os.path.join(os.path.dirname(
+                _module_fpath(__file__)), 'doctest_example.py')),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ]
+        before = before.filter_traces(filters)
+        after = after.filter_traces(filters)
+        for stat in after.compare_to(before, 'traceback'):
+            if stat.size_diff <= 0:
+                continue
+            frames = _oldest_first(stat.traceback)
+            # The oldest doctest frame runs the module level code of the part,
+            # newer doctest frames run functions defined in the example.
+            labels = []
+            module_level = True
+            for frame in frames:
+                if frame.filename == self.filename:
+                    offset = None
+                    if not module_level:
+                        offset = self._line_offsets.get(frame.lineno, None)
+                    module_level = False
+                    labels.append('{}:{}'.format(
+                        frame.filename,
+                        self._source_lineno(frame.lineno, offset)))
+                else:
+                    labels.append(None)
+            # The allocation site is the most recent frame
+            site = labels[-1]
+            if site is None:
+                site = '{}:{}'.format(frames[-1].filename, frames[-1].lineno)
+            _accumulate(self.alloc_sites, site, stat)
+            # The doctest line is the most recent frame in the doctest code
+            doctest_labels = [label for label in labels if label is not None]
+            if doctest_labels:
+                _accumulate(self.alloc_lines, doctest_labels[-1], stat)
+
+    def dump(self, dpath, name):
+        """
+        Writes the collected statistics into a directory
+
+        Args:
+            dpath (str): directory to write to. Created if it does not exist.
+            name (str): prefix of the written files
+
+        Returns:
+            List[str]: the paths of the written files
+        """
+        if not os.path.exists(dpath):
+            os.makedirs(dpath)
+        fpaths = []
+        if self.stats:
+            stats = pstats.Stats(_StatsHolder(self.stats),
+                                 stream=_TextStream())
+            fpath = join(dpath, name + '.pstats')
+            stats.dump_stats(fpath)
+            fpaths.append(fpath)
+
+            fpath = join(dpath, name + '.prof.txt')
+            with io.open(fpath, 'w', encoding='utf8') as file:
+                stats.stream = _TextStream(file)
+                file.write('Profile of {}\n'.format(self.filename))
+                stats.sort_stats('cumulative').print_stats(self.top)
+            fpaths.append(fpath)
+
+        if self.trace_memory:
+            fpath = join(dpath, name + '.alloc.txt')
+            with io.open(fpath, 'w', encoding='utf8') as file:
+                file.write('Allocations of {}\n'.format(self.filename))
+                file.write('\nTop {} allocation sites\n'.format(self.top))
+                file.write(_format_allocations(self.alloc_sites, self.top))
+                file.write('\nTop {} doctest lines\n'.format(self.top))
+                file.write(_format_allocations(self.alloc_lines, self.top))
+            fpaths.append(fpath)
+        return fpaths
+
+
+class _StatsHolder(object):
+    """ Presents merged statistics with the interface pstats expects """
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class _TextStream(object):
+    """ pstats writes native strings, which io files do not accept on py2 """
+    def __init__(self, file=None):
+        self.file = file
+
+    def write(self, text):
+        if self.file is not None:
+            if isinstance(text, bytes):  # nocover
+                text = text.decode('utf8')
+            self.file.write(text)
+
+
+def _module_fpath(fpath):
+    if fpath.endswith(('.pyc', '.pyo')):  # nocover
+        fpath = fpath[:-1]
+    return fpath
+
+
+def _is_overhead(func):
+    """ True for the calls that stop the profiler itself """
+    filename, _, funcname = func
+    return (filename == _module_fpath(__file__) or
+            funcname == "<method 'disable' of '_lsprof.Profiler' objects>")
+
+
+def _first_code_lineno(part):
+    """
+    The line of a part that its code begins on, after the leading comments
+    (e.g. directives) and blank lines.
+
+    Example:
+        >>> from xdoctest.profiler import _first_code_lineno
+        >>> from xdoctest.doctest_part import DoctestPart
+        >>> part = DoctestPart(['# xdoctest: +PROFILE', 'y = 1'])
+        >>> _first_code_lineno(part)
+        2
+    """
+    for index, line in enumerate(part.exec_lines, start=1):
+        stripped = line.strip()
+        if stripped and not stripped.startswith('#'):
+            return index
+    return 1
+
+
+def _oldest_first(traceback):
+    # Python 3.7 orders frames from the oldest to the most recent, before that
+    # the most recent frame was first.
+    frames = list(traceback)
+    if sys.version_info[0:2] < (3, 7):  # nocover
+        frames = frames[::-1]
+    return frames
+
+
+def _accumulate(totals, label, stat):
+    size, count = totals.get(label, (0, 0))
+    totals[label] = (size + stat.size_diff, count + stat.count_diff)
+
+
+def _format_allocations(totals, top):
+    """
+    Example:
+        >>> from xdoctest.profiler import _format_allocations
+        >>> print(_format_allocations({'a.py:1': (2048, 3), 'b.py:2': (10, 1)}, 1))
+             2.0 KiB       3  a.py:1
+        <BLANKLINE>
+    """
+    ranked = sorted(totals.items(), key=lambda item: -item[1][0])[0:top]
+    lines = ['{:>8} KiB {:>7}  {}'.format('{:.1f}'.format(size / 1024),
+                                          count, label)
+             for label, (size, count) in ranked]
+    return ''.join(line + '\n' for line in lines)
+
+
+def example_fname(example):
+    """
+    Builds a filesystem safe name for the profile output of an example
+
+    Example:
+        >>> from xdoctest.profiler import *
+        >>> from xdoctest import doctest_example
+        >>> example = doctest_example.DocTest('>>> x = 1', callname='Foo.bar')
+        >>> print(example_fname(example))
+        _modname_.Foo.bar_0
+    """
+    name = '{}.{}'.format(example.modname, example.unique_callname)
+    return re.sub(r'[^\w.-]+', '_', name)
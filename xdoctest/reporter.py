@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Machine readable reports of the examples run by the native runner.
+
+A reporter is given one record per example as soon as the example finishes,
+and each record is immediately written to the report file. Nothing is
+buffered, so the report of a large run can be followed while it is still in
+progress and reports of interrupted runs contain everything that finished.
+
+Two formats are supported:
+
+    * ``jsonl`` - one JSON object per line. Each example is a record of type
+        ``example`` and the run ends with a record of type ``summary``.
+
+    * ``junit`` - a JUnit XML ``<testsuite>`` that can be ingested by most CI
+        systems. Each example is written as a ``<testcase>``.
+
+CommandLine:
+    python -m xdoctest xdoctest all --report-format=jsonl --report-file=report.jsonl
+    python -m xdoctest xdoctest all --report-format=junit --report-file=junit.xml
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+import io
+import json
+import re
+import six
+from xdoctest import utils
+
+
+REPORT_FORMATS = ['jsonl', 'junit']
+
+# Characters that are not allowed anywhere in an XML 1.0 document
+_INVALID_XML_CHARS = re.compile(
+    '[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def example_record(example, summary, n_seconds, failure_lines=None):
+    """
+    Builds the machine readable record of a finished example.
+
+    Args:
+        example (DocTest): the example that was run
+        summary (Dict): the summary returned by the run
+        n_seconds (float): the time it took to run the example
+        failure_lines (List[str]): formatted failure information. If
+            unspecified and the example failed, this is taken from the
+            example itself.
+
+    Returns:
+        Dict: containing the node id, the outcome (``passed``, ``failed``,
+            ``timeout``, or ``skipped``), duration, the line number of
+            the failure, the captured stdout, the failure message, and the
+            time spent in each phase.
+
+    Example:
+        >>> from xdoctest.reporter import *
+        >>> from xdoctest import doctest_example
+        >>> example = doctest_example.DocTest('>>> print("hi")\\n>>> 1 / 0',
+        ...                                   callname='func')
+        >>> summary = example.run(verbose=0, on_error='return')
+        >>> record = example_record(example, summary, 0.5)
+        >>> print(record['node'])
+        <modpath?>::func:0
+        >>> print(record['outcome'])
+        failed
+        >>> assert record['stdout'] == 'hi\\n'
+        >>> assert record['failed_lineno'] == 2
+        >>> assert 'ZeroDivisionError' in record['failure']
+    """
+    if summary.get('skipped', False):
+        outcome = 'skipped'
+    elif summary.get('passed', False):
+        outcome = 'passed'
+    elif summary.get('timed_out', False):
+        outcome = 'timeout'
+    else:
+        outcome = 'failed'
+    failed = outcome in {'failed', 'timeout'}
+
+    if 'stdout' in summary:
+        # Examples run in worker processes send their output back as text
+        stdout = summary['stdout']
+        failed_lineno = summary.get('failed_lineno', None)
+    else:
+        stdout = ''.join([six.text_type(v)
+                          for v in example.logged_stdout.values() if v])
+        failed_lineno = None
+        if failed:
+            failed_lineno = example.failed_lineno()
+
+    failure = None
+    if failed:
+        if failure_lines is None:
+            failure_lines = example.repr_failure()
+        failure = utils.strip_ansi('\n'.join(failure_lines))
+
+    record = {
+        'type': 'example',
+        'node': example.node,
+        'modpath': example.modpath,
+        'modname': example.modname,
+        'callname': example.unique_callname,
+        'lineno': example.lineno,
+        'outcome': outcome,
+        'duration': n_seconds,
+        'failed_lineno': failed_lineno,
+        'stdout': stdout,
+        'failure': failure,
+        'phase_times': dict(example.phase_times),
+    }
+    return record
+
+
+class JSONLinesReporter(object):
+    """
+    Writes each record as a single line of JSON.
+
+    Example:
+        >>> from xdoctest.reporter import *
+        >>> file = io.StringIO()
+        >>> self = JSONLinesReporter(file)
+        >>> self.start()
+        >>> self.add({'type': 'example', 'node': 'a::b:0', 'outcome': 'passed'})
+        >>> self.finish({'n_total': 1, 'n_passed': 1})
+        >>> lines = file.getvalue().splitlines()
+        >>> assert json.loads(lines[0])['node'] == 'a::b:0'
+        >>> assert json.loads(lines[1])['type'] == 'summary'
+    """
+    def __init__(self, file):
+        self.file = file
+
+    def start(self):
+        pass
+
+    def add(self, record):
+        self._write(record)
+
+    def finish(self, run_summary):
+        record = {'type': 'summary'}
+        for key in ['n_total', 'n_passed', 'n_failed', 'n_timed_out',
+                    'n_skipped', 'n_warned']:
+            record[key] = run_summary.get(key, 0)
+        self._write(record)
+
+    def _write(self, record):
+        text = json.dumps(record, sort_keys=True)
+        if not isinstance(text, type('')):  # nocover
+            text = text.decode('utf8')
+        self.file.write(text + '\n')
+        self.file.flush()
+
+
+class JUnitReporter(object):
+    """
+    Writes each record as a JUnit XML ``<testcase>``.
+
+    The counts of the ``<testsuite>`` are only known when the run finishes.
+    Room for them is reserved in the opening tag and they are filled in by
+    :func:`finish` when the file supports seeking.
+
+    Example:
+        >>> from xdoctest.reporter import *
+        >>> import xml.etree.ElementTree as ET
+        >>> file = io.StringIO()
+        >>> self = JUnitReporter(file)
+        >>> self.start()
+        >>> self.add({'node': 'a.py::b:0', 'modpath': 'a.py', 'callname': 'b:0',
+        ...           'lineno': 3, 'outcome': 'passed', 'duration': 0.1,
+        ...           'stdout': 'hi', 'failed_lineno': None, 'failure': None})
+        >>> self.add({'node': 'a.py::c:0', 'modpath': 'a.py', 'callname': 'c:0',
+        ...           'lineno': 9, 'outcome': 'failed', 'duration': 0.2,
+        ...           'stdout': '', 'failed_lineno': 10, 'failure': 'oops'})
+        >>> self.finish({'n_total': 2, 'n_failed': 1, 'n_skipped': 0})
+        >>> suite = ET.fromstring(file.getvalue().encode('utf8'))
+        >>> assert suite.get('tests') == '2'
+        >>> assert suite.get('failures') == '1'
+        >>> cases = suite.findall('testcase')
+        >>> assert cases[0].find('system-out').text == 'hi'
+        >>> assert cases[1].find('failure').text == 'oops'
+    """
+    _HEADER_WIDTH = 160
+
+    def __init__(self, file, name='xdoctest'):
+        self.file = file
+        self.name = name
+        self.total_seconds = 0.0
+        self._header_pos = None
+
+    def _opening_tag(self, run_summary=None):
+        attrs = 'name={}'.format(quoteattr(self.name))
+        if run_summary is not None:
+            attrs += (' tests="{}" failures="{}" errors="0" skipped="{}"'
+                      ' time="{:.6f}"').format(
+                          run_summary.get('n_total', 0),
+                          run_summary.get('n_failed', 0),
+                          run_summary.get('n_skipped', 0),
+                          self.total_seconds)
+        # Whitespace before the closing bracket is valid XML, so the tag can
+        # be rewritten in place with the same length.
+        return '<testsuite {}'.format(attrs).ljust(self._HEADER_WIDTH) + '>\n'
+
+    def start(self):
+        self.file.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        try:
+            self._header_pos = self.file.tell()
+        except (IOError, OSError, ValueError):
+            self._header_pos = None
+        self.file.write(self._opening_tag())
+        self.file.flush()
+
+    def add(self, record):
+        self.total_seconds += record.get('duration', 0) or 0
+        modpath = record.get('modpath', '')
+        attrs = 'classname={} name={} file={} line="{}" time="{:.6f}"'.format(
+            quoteattr(_clean_xml(record.get('modname', modpath))),
+            quoteattr(_clean_xml(record.get('callname', record['node']))),
+            quoteattr(_clean_xml(modpath)),
+            record.get('lineno', 0),
+            record.get('duration', 0) or 0)
+        parts = ['  <testcase {}>'.format(attrs)]
+        if record['outcome'] in {'failed', 'timeout'}:
+            if record['outcome'] == 'timeout':
+                message = 'timed out on line {}'
+            else:
+                message = 'failed on line {}'
+            message = message.format(record.get('failed_lineno'))
+            parts.append('    <failure message={}>{}</failure>'.format(
+                quoteattr(message),
+                escape(_clean_xml(record.get('failure') or ''))))
+        elif record['outcome'] == 'skipped':
+            parts.append('    <skipped/>')
+        if record.get('stdout'):
+            parts.append('    <system-out>{}</system-out>'.format(
+                escape(_clean_xml(record['stdout']))))
+        parts.append('  </testcase>')
+        self.file.write('\n'.join(parts) + '\n')
+        self.file.flush()
+
+    def finish(self, run_summary):
+        self.file.write('</testsuite>\n')
+        self.file.flush()
+        if self._header_pos is not None:
+            header = self._opening_tag(run_summary)
+            if len(header) == self._HEADER_WIDTH + 2:
+                end = self.file.tell()
+                self.file.seek(self._header_pos)
+                self.file.write(header)
+                self.file.seek(end)
+                self.file.flush()
+
+
+def _clean_xml(text):
+    return _INVALID_XML_CHARS.sub('', utils.strip_ansi(text))
+
+
+def open_reporter(report_format=None, report_file=None):
+    """
+    Opens a reporter that streams records to a file.
+
+    Args:
+        report_format (str): either ``jsonl`` or ``junit``. If unspecified it
+            is inferred from the extension of ``report_file``.
+        report_file (str): the path to write the report to. If unspecified a
+            default name based on the format is used.
+
+    Returns:
+        JSONLinesReporter | JUnitReporter | None: the reporter or None if
+            neither argument is specified. Its ``file`` must be closed by the
+            caller.
+
+    Example:
+        >>> from xdoctest.reporter import *
+        >>> from os.path import join
+        >>> temp = utils.TempDir()
+        >>> fpath = join(temp.ensure(), 'junit.xml')
+        >>> self = open_reporter(report_file=fpath)
+        >>> assert isinstance(self, JUnitReporter)
+        >>> self.file.close()
+        >>> assert open_reporter() is None
+    """
+    if report_format is None and report_file is None:
+        return None
+    if report_format is None:
+        if report_file.lower().endswith('.xml'):
+            report_format = 'junit'
+        else:
+            report_format = 'jsonl'
+    if report_format not in REPORT_FORMATS:
+        raise KeyError('Unknown report format {!r}. Choose from {}'.format(
+            report_format, REPORT_FORMATS))
+    if report_file is None:
+        report_file = {
+            'jsonl': 'xdoctest-report.jsonl',
+            'junit': 'xdoctest-junit.xml',
+        }[report_format]
+    file = io.open(report_file, 'w', encoding='utf8')
+    if report_format == 'junit':
+        return JUnitReporter(file)
+    else:
+        return JSONLinesReporter(file)
@@ -48,16 +48,31 @@ run the doctests as such:
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 from xdoctest import dynamic_analysis as dynamic
+from xdoctest import cache
 from xdoctest import core
 from xdoctest import doctest_example
+from xdoctest import exceptions
+from xdoctest import reporter
+from xdoctest import sharding
+from xdoctest import static_analysis as static
 from xdoctest import utils
+from collections import OrderedDict
+from fnmatch import fnmatch
+import os
+import select
+import signal
+import six
 import time
 import warnings
 import sys
 
 
 def doctest_module(modpath_or_name=None, command=None, argv=None, exclude=[],
-                   style='auto', verbose=None, config=None, durations=None):
+                   style='auto', verbose=None, config=None, durations=None,
+                   jobs=None, cache_dpath=None, changed=False, watch=False,
+                   report_format=None, report_file=None, phase_times=False,
+                   isolate=None, maxfail=None, last_failed=False,
+                   failed_first=False, shard_id=None, num_shards=None):
     """
     Executes requestsed google-style doctests in a package or module.
     Main entry point into the testing framework.
@@ -71,6 +86,54 @@ def doctest_module(modpath_or_name=None, command=None, argv=None, exclude=[],
         exclude (list): ignores any modname matching any of these
             glob-like patterns
         config (dict): modifies each examples configuration
+        durations (int): if specified, show the execution times for the
+            slowest N tests (N=0 shows all tests)
+        jobs (int): if specified, modules are parsed and their examples are
+            run in a pool of this many worker processes. A value of 0 uses
+            one process per cpu. Defaults to None, which runs everything
+            serially in the current process.
+        cache_dpath (str): if specified, statically parsed modules,
+            examples, and compiled code are cached in this directory and
+            reused on later runs until the module file changes.
+        changed (bool): if True, only run examples that changed or did not
+            pass since the last run with this option. The state is stored in
+            ``cache_dpath`` (or the default cache directory).
+        watch (bool): if True, keep running after the initial run and re-run
+            the examples in any module whose content changes until
+            interrupted with Ctrl+C. Each re-run rewrites ``report_file``.
+        report_format (str): if specified, a record of each example is
+            streamed to ``report_file`` as soon as it finishes. Can be
+            ``jsonl`` or ``junit`` (see :mod:`xdoctest.reporter`).
+        report_file (str): path of the machine readable report. If only this
+            is specified, the format is inferred from its extension.
+        phase_times (bool): if True, report the total time spent parsing,
+            importing, compiling, executing, checking, and reporting. If
+            durations is also specified, the slowest examples are broken
+            down by phase as well.
+        isolate (str): if ``fork``, the modules are imported once in this
+            process and the examples of each module are run in a forked
+            child process. If ``fork-example``, each example is run in its
+            own child. Changes to global state do not leak between the
+            isolated units. Takes precedence over ``jobs`` when running.
+            Defaults to None, which runs everything in this process.
+        maxfail (int): if specified, stop running examples after this many
+            of them failed. Worker and child processes stop as well. The
+            failures found so far are still reported.
+        last_failed (bool): if True, only run the examples that failed on
+            their last run. If none of them failed, everything is run. The
+            failures of runs that are given a ``cache_dpath`` or one of these
+            options are stored in ``cache_dpath`` (or the default cache
+            directory).
+        failed_first (bool): if True, run the examples that failed on their
+            last run before all others.
+        shard_id (int): if specified with ``num_shards``, only run the
+            examples of this shard, starting at 0.
+        num_shards (int): split the examples into this many shards with
+            about the same total runtime (see :mod:`xdoctest.sharding`).
+            Runs without shards that are given a ``cache_dpath`` record the
+            duration of each example there, which sharded runs use to
+            balance the shards. Sharded runs read the durations from
+            ``cache_dpath`` (or the default cache directory).
 
     Returns:
         Dict: run_summary
@@ -91,90 +154,374 @@ def doctest_module(modpath_or_name=None, command=None, argv=None, exclude=[],
     if config is None:
         config = doctest_example.Config()
 
-    command, style, verbose = _parse_commandline(command, style, verbose, argv)
-
-    if command == 'list':
-        print('Listing tests')
-
-    if command is None:
-        # Display help if command is not specified
-        print('Not testname given. Use `all` to run everything or'
-              ' pick from a list of valid choices:')
-        command = 'list'
-
-    # TODO: command should not be allowed to be the requested doctest name in
-    # case it conflicts with an existing command. This probably requires an API
-    # change to this function.
-    gather_all = (command == 'all' or command == 'dump')
-
-    tic = time.time()
-
-    # Parse all valid examples
-    with warnings.catch_warnings(record=True) as parse_warnlist:
-        examples = list(core.parse_doctestables(modpath, exclude=exclude,
-                                                style=style))
-        # Set each example mode to native to signal that we are using the
-        # native xdoctest runner instead of the pytest runner
-        for example in examples:
-            example.mode = 'native'
-
-    if command == 'list':
-        if len(examples) == 0:
-            print('... no docstrings with examples found')
+    orig_code_dpath = cache.CODE_CACHE.dpath
+    if cache_dpath is not None:
+        # Code compiled by this run is persisted in the cache directory
+        cache.CODE_CACHE.dpath = cache_dpath
+    # Examples start from the module namespaces as they are in this run
+    cache.NAMESPACE_CACHE.clear()
+    try:
+        if (shard_id is None) != (num_shards is None):
+            raise ValueError('shard_id and num_shards must be given together')
+
+        command, style, verbose = _parse_commandline(command, style, verbose, argv)
+
+        watcher = None
+        if watch and command not in {None, 'list', 'dump'}:
+            # Record the state of the files before they are parsed, so changes
+            # made during the first run are not missed.
+            watcher = _ModuleWatcher(modpath, exclude)
+
+        if command == 'list':
+            print('Listing tests')
+
+        if command is None:
+            # Display help if command is not specified
+            print('Not testname given. Use `all` to run everything or'
+                  ' pick from a list of valid choices:')
+            command = 'list'
+
+        # TODO: command should not be allowed to be the requested doctest name in
+        # case it conflicts with an existing command. This probably requires an API
+        # change to this function.
+        gather_all = (command == 'all' or command == 'dump')
+
+        # The states that remember the outcomes of runs
+        changed_state = failed_state = duration_state = None
+
+        tic = time.time()
+
+        # Parse all valid examples
+        parse_stats = {}
+        with warnings.catch_warnings(record=True) as parse_warnlist:
+            examples = list(core.parse_doctestables(modpath, exclude=exclude,
+                                                    style=style,
+                                                    cache_dpath=cache_dpath,
+                                                    stats=parse_stats,
+                                                    workers=jobs))
+            # Set each example mode to native to signal that we are using the
+            # native xdoctest runner instead of the pytest runner
+            for example in examples:
+                example.mode = 'native'
+
+        if parse_stats.get('n_prefiltered', 0):
+            print('skipped parsing {} / {} file(s) without doctests'.format(
+                parse_stats['n_prefiltered'], parse_stats['n_files']))
+
+        if command == 'list':
+            if len(examples) == 0:
+                print('... no docstrings with examples found')
+            else:
+                print('    ' + '\n    '.join([example.cmdline  # + ' @ ' + str(example.lineno)
+                                              for example in examples]))
+            run_summary = {'action': 'list'}
         else:
-            print('    ' + '\n    '.join([example.cmdline  # + ' @ ' + str(example.lineno)
-                                          for example in examples]))
-        run_summary = {'action': 'list'}
-    else:
-        print('gathering tests')
-        enabled_examples = []
-        for example in examples:
-            if gather_all or command in example.valid_testnames:
-                if gather_all and example.is_disabled():
-                    continue
-                enabled_examples.append(example)
-
-        if len(enabled_examples) == 0:
-            # Check for zero-arg funcs
-            for example in _gather_zero_arg_examples(modpath):
-                if command in example.valid_testnames:
+            print('gathering tests')
+            enabled_examples = []
+            for example in examples:
+                if gather_all or command in example.valid_testnames:
+                    if gather_all and example.is_disabled():
+                        continue
                     enabled_examples.append(example)
 
-                elif command in ['zero-all', 'zero', 'zero_all', 'zero-args']:
-                    enabled_examples.append(example)
+            if len(enabled_examples) == 0:
+                # Check for zero-arg funcs
+                for example in _gather_zero_arg_examples(modpath):
+                    if command in example.valid_testnames:
+                        enabled_examples.append(example)
+
+                    elif command in ['zero-all', 'zero', 'zero_all', 'zero-args']:
+                        enabled_examples.append(example)
+
+            if command != 'dump':
+                if num_shards is not None:
+                    n_before = len(enabled_examples)
+                    keys = [sharding.example_key(example)
+                            for example in enabled_examples]
+                    enabled_examples = sharding.select_shard(
+                        enabled_examples, shard_id, num_shards, keys,
+                        cache.DurationState(cache_dpath).durations)
+                    print('selected shard {} of {} with {} / {} example(s)'.format(
+                        shard_id, num_shards, len(enabled_examples), n_before))
+                elif cache_dpath is not None:
+                    # Every shard must see the same durations to agree on the
+                    # split, so they are only recorded by runs without shards.
+                    # Runs without a cache directory do not write any files.
+                    duration_state = cache.DurationState(cache_dpath)
+
+            if changed and command != 'dump':
+                changed_state = cache.ChangedState(cache_dpath)
+                n_before = len(enabled_examples)
+                enabled_examples = [example for example in enabled_examples
+                                    if changed_state.is_changed(example)]
+                print('deselected {} unchanged example(s)'.format(
+                    n_before - len(enabled_examples)))
+
+            if command != 'dump' and (cache_dpath is not None or last_failed or
+                                      failed_first):
+                # Runs that did not ask for any state do not write any files
+                failed_state = cache.LastFailedState(cache_dpath)
+                if last_failed or failed_first:
+                    prev_failed = []
+                    others = []
+                    for example in enabled_examples:
+                        if failed_state.is_failed(example):
+                            prev_failed.append(example)
+                        else:
+                            others.append(example)
+                    if not prev_failed:
+                        if last_failed:
+                            print('no previously failed examples, running all')
+                    elif last_failed:
+                        print('running {} example(s) that failed last time, '
+                              'deselected {}'.format(len(prev_failed),
+                                                     len(others)))
+                        enabled_examples = prev_failed
+                    else:
+                        print('running {} example(s) that failed last time '
+                              'first'.format(len(prev_failed)))
+                        enabled_examples = prev_failed + others
+
+            if config:
+                for example in enabled_examples:
+                    example.config.update(config)
+
+            if command == 'dump':
+                # format the doctests as normal unit tests
+                print('dumping tests to stdout')
+                _convert_to_test_module(enabled_examples)
+                run_summary = {'action': 'dump'}
+            else:
+                # Run the gathered doctest examples
 
-        if config:
-            for example in enabled_examples:
-                example.config.update(config)
+                RANDOMIZE_ORDER = False
+                if RANDOMIZE_ORDER:
+                    # randomize the order in which tests are run
+                    import random
+                    random.shuffle(enabled_examples)
 
-        if command == 'dump':
-            # format the doctests as normal unit tests
-            print('dumping tests to stdout')
-            _convert_to_test_module(enabled_examples)
-            run_summary = {'action': 'dump'}
-        else:
-            # Run the gathered doctest examples
+                run_summary = _run_reported(enabled_examples, verbose, config,
+                                            report_format, report_file,
+                                            jobs=jobs, isolate=isolate,
+                                            maxfail=maxfail)
 
-            RANDOMIZE_ORDER = False
-            if RANDOMIZE_ORDER:
-                # randomize the order in which tests are run
-                import random
-                random.shuffle(enabled_examples)
+                _record_outcomes(run_summary, changed_state, failed_state,
+                                 duration_state)
 
-            run_summary = _run_examples(enabled_examples, verbose, config)
+                toc = time.time()
+                n_seconds = toc - tic
 
-            toc = time.time()
-            n_seconds = toc - tic
+                # Print final summary info in a style similar to pytest
+                if verbose >= 0 and run_summary:
+                    _print_summary_report(run_summary, parse_warnlist, n_seconds,
+                                          enabled_examples, durations,
+                                          config=config, phase_times=phase_times)
+
+        if watcher is not None:
+            run_summary = _watch_and_rerun(watcher, command, style, verbose,
+                                           config, durations, jobs=jobs,
+                                           isolate=isolate, maxfail=maxfail,
+                                           cache_dpath=cache_dpath,
+                                           report_format=report_format,
+                                           report_file=report_file,
+                                           phase_times=phase_times,
+                                           changed_state=changed_state,
+                                           failed_state=failed_state,
+                                           duration_state=duration_state,
+                                           run_summary=run_summary)
+    finally:
+        # Later runs in this process must not write into this directory
+        cache.CODE_CACHE.dpath = orig_code_dpath
+
+    return run_summary
+
+
+class _ModuleWatcher(object):
+    """
+    Polls the modules in a package and reports those whose content changed.
 
-            # Print final summary info in a style similar to pytest
+    Example:
+        >>> from xdoctest.runner import *
+        >>> from xdoctest import utils
+        >>> from os.path import join
+        >>> temp = utils.TempDir()
+        >>> modpath = join(temp.ensure(), 'watched_module.py')
+        >>> with open(modpath, 'w') as file:
+        ...     _ = file.write('x = 1')
+        >>> self = _ModuleWatcher(modpath, exclude=[])
+        >>> assert self.poll() == []
+        >>> with open(modpath, 'w') as file:
+        ...     _ = file.write('x = 2')
+        >>> assert self.poll() == [modpath]
+        >>> assert self.poll() == []
+    """
+    def __init__(self, modpath, exclude):
+        self.modpath = modpath
+        self.exclude = exclude
+        self.stamps = self._stamps()
+        self.hashes = {fpath: cache._hash_file(fpath) for fpath in self.stamps}
+
+    def _stamps(self):
+        stamps = {}
+        for fpath in static.package_modpaths(self.modpath, with_pkg=True,
+                                             with_libs=False):
+            modname = static.modpath_to_modname(fpath)
+            if any(fnmatch(modname, pat) for pat in self.exclude):
+                continue
+            try:
+                stat = os.stat(fpath)
+            except OSError:  # nocover
+                continue
+            stamps[fpath] = (stat.st_mtime, stat.st_size)
+        return stamps
+
+    def poll(self):
+        """
+        Returns:
+            List[str]: paths of modules that were added or whose content
+                changed since the last poll.
+        """
+        stamps = self._stamps()
+        changed = []
+        for fpath, stamp in stamps.items():
+            if self.stamps.get(fpath, None) == stamp:
+                continue
+            # Only report files whose content actually changed
+            try:
+                hashid = cache._hash_file(fpath)
+            except IOError:  # nocover
+                continue
+            if self.hashes.get(fpath, None) != hashid:
+                self.hashes[fpath] = hashid
+                changed.append(fpath)
+        self.stamps = stamps
+        return sorted(changed)
+
+
+def _run_reported(enabled_examples, verbose, config, report_format=None,
+                  report_file=None, **kwargs):
+    """
+    Runs the examples like :func:`_run_examples` and streams their records to
+    a new report if one was requested. The report is closed afterwards.
+    """
+    result_reporter = reporter.open_reporter(report_format, report_file)
+    try:
+        return _run_examples(enabled_examples, verbose, config,
+                             result_reporter=result_reporter, **kwargs)
+    finally:
+        if result_reporter is not None:
+            result_reporter.file.close()
+
+
+def _record_outcomes(run_summary, changed_state=None, failed_state=None,
+                     duration_state=None):
+    """
+    Records the outcome and duration of each example that ran in the states
+    that were given and saves them.
+    """
+    failed = set(run_summary['failed'])
+    for state in [changed_state, failed_state]:
+        if state is not None:
+            for example in run_summary['times']:
+                state.record(example, example not in failed)
+            state.save()
+    if duration_state is not None:
+        for example, n_seconds in run_summary['times'].items():
+            duration_state.record(sharding.example_key(example), n_seconds)
+        duration_state.save()
+
+
+def _watch_and_rerun(watcher, command, style, verbose, config, durations,
+                     jobs=None, cache_dpath=None, run_summary=None,
+                     interval=1.0, max_polls=None, isolate=None,
+                     maxfail=None, report_format=None, report_file=None,
+                     phase_times=False, changed_state=None, failed_state=None,
+                     duration_state=None):
+    """
+    Polls for changed modules and re-runs the requested examples that they
+    contain. Unchanged modules are neither re-parsed nor re-run. If a report
+    was requested, every re-run writes a new report that replaces the report
+    of the previous run. The outcomes of re-runs are recorded in the given
+    states, like the outcomes of the initial run.
+
+    Args:
+        watcher (_ModuleWatcher): tracks the state of the package files
+        interval (float): seconds to wait between polls
+        max_polls (int): stop after this many polls. Defaults to None, which
+            polls until interrupted with Ctrl+C.
+        changed_state (xdoctest.cache.ChangedState): records the outcomes
+            for ``--changed``
+        failed_state (xdoctest.cache.LastFailedState): records the failures
+            for ``--lf`` and ``--ff``
+        duration_state (xdoctest.cache.DurationState): records the durations
+            used to split shards
+
+    Returns:
+        Dict: the summary of the most recent run
+    """
+    gather_all = (command == 'all')
+    print('Watching {} modules for changes. Press Ctrl+C to stop.'.format(
+        len(watcher.stamps)))
+    n_polls = 0
+    try:
+        while max_polls is None or n_polls < max_polls:
+            time.sleep(interval)
+            n_polls += 1
+            changed_modpaths = watcher.poll()
+            if not changed_modpaths:
+                continue
+            print('Detected changes in: {}'.format(
+                ', '.join(changed_modpaths)))
+            tic = time.time()
+
+            # Reloaded modules keep their identity, so forget their snapshots
+            cache.NAMESPACE_CACHE.clear()
+            enabled_examples = []
+            with warnings.catch_warnings(record=True) as parse_warnlist:
+                for changed_modpath in changed_modpaths:
+                    _reload_modpath(changed_modpath)
+                    for example in core.parse_doctestables(
+                            changed_modpath, style=style,
+                            cache_dpath=cache_dpath):
+                        example.mode = 'native'
+                        if gather_all or command in example.valid_testnames:
+                            if gather_all and example.is_disabled():
+                                continue
+                            enabled_examples.append(example)
+            if config:
+                for example in enabled_examples:
+                    example.config.update(config)
+
+            run_summary = _run_reported(enabled_examples, verbose, config,
+                                        report_format, report_file,
+                                        jobs=jobs, isolate=isolate,
+                                        maxfail=maxfail)
+            _record_outcomes(run_summary, changed_state, failed_state,
+                             duration_state)
+            n_seconds = time.time() - tic
             if verbose >= 0 and run_summary:
                 _print_summary_report(run_summary, parse_warnlist, n_seconds,
                                       enabled_examples, durations,
-                                      config=config)
-
+                                      config=config, phase_times=phase_times)
+    except KeyboardInterrupt:
+        print('Caught CTRL+c: Stopping watch')
     return run_summary
 
 
+def _reload_modpath(modpath):
+    """
+    Ensures the next import of a changed module executes its new content
+    """
+    modname = static.modpath_to_modname(modpath)
+    module = sys.modules.get(modname, None)
+    if module is not None:
+        try:
+            six.moves.reload_module(module)
+        except Exception:
+            # Let the examples report the error when they import the module
+            sys.modules.pop(modname, None)
+
+
 def _convert_to_test_module(enabled_examples):
     """
     Converts all doctests to unit tests that can exist in a standalone module
@@ -202,7 +549,8 @@ def _convert_to_test_module(enabled_examples):
 
 
 def _print_summary_report(run_summary, parse_warnlist, n_seconds,
-                          enabled_examples, durations, config=None):
+                          enabled_examples, durations, config=None,
+                          phase_times=False):
     """
     Summary report formatting and printing
     """
@@ -215,6 +563,8 @@ def _print_summary_report(run_summary, parse_warnlist, n_seconds,
     # report errors
     failed = run_summary.get('failed', [])
     warned = run_summary.get('warned', [])
+    # examples run in a worker process return pre-formatted failures
+    failure_reports = run_summary.get('failure_reports', {})
 
     # report parse-time warnings
     if parse_warnlist:
@@ -236,9 +586,7 @@ def _print_summary_report(run_summary, parse_warnlist, n_seconds,
                    'yellow')
             print('example = {!r}'.format(example))
             for warn in example.warn_list:
-                print(utils.indent(
-                    warnings.formatwarning(warn.message, warn.category,
-                                           warn.filename, warn.lineno)))
+                print(utils.indent(_format_warning(warn)))
 
     if failed and len(enabled_examples) > 1:
         # If there is more than one test being run, print out all the
@@ -246,7 +594,10 @@ def _print_summary_report(run_summary, parse_warnlist, n_seconds,
         cprint('\n=== Found {} errors ==='.format(len(failed)), 'red')
         for fail_idx, example in enumerate(failed, start=1):
             cprint('--- Error: {} / {} ---'.format(fail_idx, len(failed)), 'red')
-            print(utils.indent('\n'.join(example.repr_failure())))
+            lines = failure_reports.get(example, None)
+            if lines is None:
+                lines = example.repr_failure()
+            print(utils.indent('\n'.join(lines)))
 
     # Print command lines to re-run failed tests
     if failed:
@@ -258,10 +609,13 @@ def _print_summary_report(run_summary, parse_warnlist, n_seconds,
     n_passed = run_summary.get('n_passed', 0)
     n_failed = run_summary.get('n_failed', 0)
     n_skipped = run_summary.get('n_skipped', 0)
+    n_timed_out = run_summary.get('n_timed_out', 0)
     n_warnings = len(warned) + len(parse_warnlist)
     pairs = zip([n_failed, n_passed, n_skipped, n_warnings],
                 ['failed', 'passed', 'skipped', 'warnings'])
     parts = ['{n} {t}'.format(n=n, t=t) for n, t in pairs  if n > 0]
+    if n_timed_out > 0:
+        parts[0] += ' ({} timed out)'.format(n_timed_out)
     _fmtstr = '=== ' + ', '.join(parts) + ' in {n_seconds:.2f} seconds ==='
     # _fmtstr = '=== ' + ' '.join(parts) + ' in {n_seconds:.2f} seconds ==='
     summary_line = _fmtstr.format(n_seconds=n_seconds)
@@ -279,7 +633,60 @@ def _print_summary_report(run_summary, parse_warnlist, n_seconds,
         if durations > 0:
             test_time_tups = test_time_tups[-durations:]
         for example, n_secs in test_time_tups:
-            print('time: {:0.8f}, test: {}'.format(n_secs, example.cmdline))
+            line = 'time: {:0.8f}, test: {}'.format(n_secs, example.cmdline)
+            if phase_times:
+                line += ' ({})'.format(', '.join(
+                    '{}={:0.6f}'.format(phase, seconds)
+                    for phase, seconds in example.phase_times.items()))
+            print(line)
+
+    if phase_times:
+        cprint('\n=== Time spent in each phase ===', 'white')
+        print(format_phase_times(run_summary.get('phase_times', {})))
+
+    profiled = [example for example in enabled_examples
+                if getattr(example, 'profile_fpaths', None)]
+    if profiled:
+        dpath = os.path.dirname(profiled[0].profile_fpaths[0])
+        cprint('\nWrote profiles of {} example(s) to {}'.format(
+            len(profiled), dpath), 'white')
+
+
+def format_phase_times(phase_times):
+    """
+    Formats the total time spent in each phase as a table.
+
+    Args:
+        phase_times (Dict[str, float]): seconds spent in each phase
+
+    Returns:
+        str
+
+    Example:
+        >>> from xdoctest.runner import *
+        >>> print(format_phase_times(OrderedDict([('parse', 0.75), ('exec', 0.25)])))
+        phase        seconds  percent
+        parse       0.750000   75.00%
+        exec        0.250000   25.00%
+    """
+    total = sum(phase_times.values())
+    lines = ['{:<8} {:>11} {:>8}'.format('phase', 'seconds', 'percent')]
+    for phase, seconds in phase_times.items():
+        percent = 100 * seconds / total if total else 0
+        lines.append('{:<8} {:>11.6f} {:>7.2f}%'.format(phase, seconds,
+                                                        percent))
+    return '\n'.join(lines)
+
+
+def _format_warning(warn):
+    """
+    Formats a recorded warning. Warnings recorded in a worker process are
+    already formatted as text.
+    """
+    if isinstance(warn, six.string_types):
+        return warn
+    return warnings.formatwarning(warn.message, warn.category, warn.filename,
+                                  warn.lineno)
 
 
 def _gather_zero_arg_examples(modpath):
@@ -303,9 +710,20 @@ def _gather_zero_arg_examples(modpath):
                     yield example
 
 
-def _run_examples(enabled_examples, verbose, config=None):
+def _run_examples(enabled_examples, verbose, config=None, jobs=None,
+                  result_reporter=None, isolate=None, maxfail=None):
     """
     Internal helper, loops over each example, runs it, returns a summary
+
+    Args:
+        jobs (int): if specified, examples are run in a pool of this many
+            worker processes (see :func:`_iter_parallel_outcomes`).
+        result_reporter (JSONLinesReporter | JUnitReporter): if specified,
+            a record of each example is passed to it as soon as the example
+            finishes.
+        isolate (str): if ``fork`` or ``fork-example``, examples are run in
+            forked child processes (see :func:`_iter_forked_outcomes`).
+        maxfail (int): if specified, stop after this many examples failed.
     """
     n_total = len(enabled_examples)
     print('running %d test(s)' % n_total)
@@ -313,6 +731,8 @@ def _run_examples(enabled_examples, verbose, config=None):
     failed = []
     warned = []
     times = {}
+    phase_times = OrderedDict((phase, 0) for phase in doctest_example.PHASES)
+    failure_reports = {}
     # It is important to raise immediatly within the test to display errors
     # returned from multiprocessing. Especially in zero-arg mode
 
@@ -320,19 +740,34 @@ def _run_examples(enabled_examples, verbose, config=None):
     on_error = 'return'
 
     verbose = 3
-    for example in enabled_examples:
-        try:
-            try:
-                tic = time.time()
-                summary = example.run(verbose=verbose, on_error=on_error)
-                toc = time.time()
-                n_seconds = toc - tic
-                times[example] = n_seconds
-            except Exception as ex:
-                print('\n'.join(example.repr_failure(with_tb=False)))
-                raise
 
+    if jobs is not None and jobs <= 0:
+        import multiprocessing
+        jobs = multiprocessing.cpu_count()
+
+    n_modules = len(set(example.modpath for example in enabled_examples))
+    if isolate is not None and isolate != 'none':
+        outcomes = _iter_forked_outcomes(enabled_examples, verbose, isolate,
+                                         failure_reports, maxfail=maxfail)
+    elif jobs is not None and jobs > 1 and n_modules > 1:
+        outcomes = _iter_parallel_outcomes(enabled_examples, verbose, jobs,
+                                           failure_reports, maxfail=maxfail)
+    else:
+        outcomes = _iter_serial_outcomes(enabled_examples, verbose, on_error)
+
+    if result_reporter is not None:
+        result_reporter.start()
+
+    try:
+        for example, summary, n_seconds in outcomes:
+            times[example] = n_seconds
             summaries.append(summary)
+            for phase, seconds in example.phase_times.items():
+                phase_times[phase] += seconds
+            if result_reporter is not None:
+                result_reporter.add(reporter.example_record(
+                    example, summary, n_seconds,
+                    failure_reports.get(example, None)))
             if example.warn_list:
                 warned.append(example)
             if summary['skipped']:
@@ -356,19 +791,29 @@ def _run_examples(enabled_examples, verbose, config=None):
                     print('\n'.join(example.repr_failure()))
                     ex_value = example.exc_info[1]
                     raise ex_value
-        except KeyboardInterrupt:
-            print('Caught CTRL+c: Stopping tests')
-            break
-        # except Exception:
-        #     summary = {'passed': False}
-        #     if verbose == 0:
-        #         sys.stdout.write('F')
-        #         sys.stdout.flush()
+            if not summary['failed']:
+                # Only the output of failures is needed after this point
+                example.clear_logged_output()
+                summary.pop('stdout', None)
+            if maxfail and len(failed) >= maxfail:
+                print('Stopping after {} failure(s)'.format(len(failed)))
+                break
+    except KeyboardInterrupt:
+        print('Caught CTRL+c: Stopping tests')
+    finally:
+        # Stops any worker processes that are still running examples
+        outcomes.close()
+    # except Exception:
+    #     summary = {'passed': False}
+    #     if verbose == 0:
+    #         sys.stdout.write('F')
+    #         sys.stdout.flush()
     if verbose == 0:
         print('')
     n_passed = sum(s['passed'] for s in summaries)
     n_failed = sum(s['failed'] for s in summaries)
     n_skipped = sum(s['skipped'] for s in summaries)
+    n_timed_out = sum(s.get('timed_out', False) for s in summaries)
 
     if config is not None and config.get('colored', True):
         print(utils.color_text('============', 'white'))
@@ -388,12 +833,371 @@ def _run_examples(enabled_examples, verbose, config=None):
         'n_skipped': n_skipped,
         'n_passed': n_passed,
         'n_failed': n_failed,
+        'n_timed_out': n_timed_out,
         'n_total': n_total,
         'times': times,
+        'phase_times': phase_times,
+        'failure_reports': failure_reports,
     }
+    if result_reporter is not None:
+        result_reporter.finish(run_summary)
     return run_summary
 
 
+def _iter_serial_outcomes(enabled_examples, verbose, on_error):
+    """
+    Runs each example in this process.
+
+    Yields:
+        Tuple[DocTest, Dict, float]: the example, its summary, and the number
+            of seconds it took to run.
+    """
+    for example in enabled_examples:
+        try:
+            tic = time.time()
+            summary = example.run(verbose=verbose, on_error=on_error)
+            toc = time.time()
+            n_seconds = toc - tic
+        except Exception as ex:
+            print('\n'.join(example.repr_failure(with_tb=False)))
+            raise
+        yield example, summary, n_seconds
+
+
+def _iter_parallel_outcomes(enabled_examples, verbose, jobs, failure_reports,
+                            maxfail=None):
+    """
+    Runs examples in a pool of worker processes.
+
+    Examples are grouped by module, so each module is imported only once by
+    the worker that runs it. Results are yielded in the same order as a
+    serial run, and the stdout captured in each worker is replayed as the
+    results arrive.
+
+    Args:
+        enabled_examples (List[DocTest]): examples to run
+        verbose (int): verbosity passed to each example
+        jobs (int): number of worker processes
+        failure_reports (Dict): populated with formatted failure lines for
+            each example that failed, because the exception info itself
+            cannot be sent back from the worker.
+        maxfail (int): if specified, workers stop running examples once this
+            many examples failed in any of them.
+
+    Yields:
+        Tuple[DocTest, Dict, float]: the example, its summary, and the number
+            of seconds it took to run.
+    """
+    import multiprocessing
+    groups = OrderedDict()
+    for example in enabled_examples:
+        groups.setdefault(example.modpath, []).append(example)
+    tasks = [(modpath, examples, verbose)
+             for modpath, examples in groups.items()]
+
+    initializer, initargs = _maxfail_initializer(maxfail)
+    pool = multiprocessing.Pool(min(jobs, len(tasks)), initializer, initargs)
+    try:
+        task_results = pool.imap(_run_module_examples, tasks)
+        for (modpath, examples, _), results in zip(tasks, task_results):
+            for example, result in zip(examples, results):
+                summary = _replay_result(example, result, failure_reports)
+                yield example, summary, result['n_seconds']
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def _replay_result(example, result, failure_reports):
+    """
+    Applies the result of an example run in another process to the example
+    in this process and returns its summary.
+    """
+    sys.stdout.write(result['stdout'])
+    sys.stdout.flush()
+    example.warn_list = result['warnings']
+    example.phase_times = OrderedDict(result['phase_times'])
+    example.profile_fpaths = result['profile_fpaths']
+    if result['failure_lines'] is not None:
+        failure_reports[example] = result['failure_lines']
+    summary = {
+        'passed': result['passed'],
+        'skipped': result['skipped'],
+        'failed': result['failed'],
+        'timed_out': result['timed_out'],
+        'failed_lineno': result['failed_lineno'],
+        'stdout': result['example_stdout'],
+    }
+    return summary
+
+
+def _iter_forked_outcomes(enabled_examples, verbose, isolate,
+                          failure_reports, maxfail=None):
+    """
+    Runs examples in forked child processes.
+
+    Every module is imported once in this process before forking, so the
+    children start from the imported module instead of a new interpreter.
+    Any global state the examples change is discarded with their child.
+
+    When the examples have a ``timeout``, a child that does not report back
+    within the sum of their time limits (plus a grace period) is killed and
+    its examples fail as timed out. This catches examples that cannot be
+    interrupted by the alarm raised inside the child, e.g. because they are
+    stuck in a C extension.
+
+    Args:
+        enabled_examples (List[DocTest]): examples to run
+        verbose (int): verbosity passed to each example
+        isolate (str): ``fork`` runs the examples of each module in one
+            child, ``fork-example`` runs each example in its own child.
+        failure_reports (Dict): populated with formatted failure lines for
+            each example that failed.
+        maxfail (int): if specified, a child stops running examples once
+            this many examples failed in it or in an earlier child.
+
+    Yields:
+        Tuple[DocTest, Dict, float]: the example, its summary, and the number
+            of seconds it took to run.
+    """
+    if not hasattr(os, 'fork'):  # nocover
+        raise ValueError('isolate={!r} requires os.fork, which is not '
+                         'available on this platform'.format(isolate))
+    if isolate not in {'fork', 'fork-example'}:
+        raise KeyError('Unknown isolation mode {!r}'.format(isolate))
+
+    groups = OrderedDict()
+    for example in enabled_examples:
+        groups.setdefault(example.modpath, []).append(example)
+    units = []
+    for modpath, examples in groups.items():
+        if isolate == 'fork-example':
+            units.extend([(modpath, [example]) for example in examples])
+        else:
+            units.append((modpath, examples))
+
+    for modpath, examples in groups.items():
+        if not examples[0].modname.startswith('<'):
+            try:
+                cache.MODULE_CACHE.import_module(modpath)
+            except Exception:
+                # The examples will report the error when they import it
+                pass
+
+    initializer, initargs = _maxfail_initializer(maxfail)
+    for modpath, examples in units:
+        results = _run_in_fork(_run_module_examples,
+                               (modpath, examples, verbose),
+                               timeout=_watchdog_timeout(examples),
+                               initializer=initializer, initargs=initargs)
+        if isinstance(results, BaseException):
+            results = [_crashed_result(results) for example in examples]
+        for example, result in zip(examples, results):
+            summary = _replay_result(example, result, failure_reports)
+            yield example, summary, result['n_seconds']
+
+
+# Seconds a child is given beyond the time limits of its examples to report
+# their results before it is killed.
+_WATCHDOG_GRACE = 5.0
+
+
+def _watchdog_timeout(examples):
+    """
+    The number of seconds a child running these examples may take, or None
+    if any of them does not have a time limit.
+    """
+    limits = [example.config.getvalue('timeout') for example in examples]
+    if not all(limits):
+        return None
+    return sum(limits) + _WATCHDOG_GRACE
+
+
+def _run_in_fork(func, task, timeout=None, initializer=None, initargs=()):
+    """
+    Calls ``func(task)`` in a forked child process and returns its result.
+
+    Args:
+        func (callable): function to call in the child
+        task (object): the picklable argument to the function
+        timeout (float): if specified, the child is killed when it has not
+            returned a result after this many seconds.
+        initializer (callable): if specified, ``initializer(*initargs)`` is
+            called in the child before the function.
+        initargs (tuple): arguments to the initializer
+
+    Returns:
+        object: the pickled return value of the function, or an exception
+            describing why the child did not return one.
+    """
+    from six.moves import cPickle as pickle
+    # Output buffered in this process would be written twice
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # nocover
+        # This runs in the child, which must never return to the caller
+        os.close(read_fd)
+        status = 0
+        try:
+            try:
+                if initializer is not None:
+                    initializer(*initargs)
+                result = func(task)
+            except BaseException as ex:
+                result = RuntimeError('isolated process raised {!r}'.format(ex))
+                status = 1
+            with os.fdopen(write_fd, 'wb') as file:
+                pickle.dump(result, file, protocol=2)
+        finally:
+            os._exit(status)
+    os.close(write_fd)
+    chunks = []
+    killed = False
+    deadline = None if timeout is None else time.time() + timeout
+    try:
+        while True:
+            if deadline is not None:
+                remaining = max(deadline - time.time(), 0)
+                ready, _, _ = select.select([read_fd], [], [], remaining)
+                if not ready:
+                    os.kill(pid, signal.SIGKILL)
+                    killed = True
+                    break
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(read_fd)
+    data = b''.join(chunks)
+    _, status = os.waitpid(pid, 0)
+    if killed:
+        return exceptions.DoctestTimeout(
+            'isolated process was killed after {:.2f} seconds'.format(
+                timeout), timeout)
+    try:
+        return pickle.loads(data)
+    except Exception:
+        if os.WIFSIGNALED(status):
+            reason = 'was killed by signal {}'.format(os.WTERMSIG(status))
+        else:
+            reason = 'exited with status {}'.format(os.WEXITSTATUS(status))
+        return RuntimeError('isolated process {} before it reported its '
+                            'results'.format(reason))
+
+
+def _crashed_result(ex):
+    """ Builds the failed result of an example whose process crashed """
+    return {
+        'passed': False,
+        'skipped': False,
+        'failed': True,
+        'timed_out': isinstance(ex, exceptions.DoctestTimeout),
+        'n_seconds': 0,
+        'stdout': '',
+        'example_stdout': '',
+        'failed_lineno': None,
+        'failure_lines': [str(ex)],
+        'phase_times': [],
+        'profile_fpaths': [],
+        'warnings': [],
+    }
+
+
+# In worker processes that stop after a maximum number of failures, this is
+# the count of failures shared by all workers and that maximum.
+_WORKER_MAXFAIL = None
+
+
+def _init_worker(failures, maxfail):
+    """
+    Initializes a worker process to stop running examples once ``failures``
+    (a shared :class:`multiprocessing.Value`) reaches ``maxfail``.
+    """
+    global _WORKER_MAXFAIL
+    _WORKER_MAXFAIL = (failures, maxfail)
+
+
+def _maxfail_initializer(maxfail):
+    """
+    Returns the initializer of worker processes and its arguments, which
+    make all workers stop once ``maxfail`` examples failed.
+    """
+    if not maxfail:
+        return None, ()
+    import multiprocessing
+    return _init_worker, (multiprocessing.Value('i', 0), maxfail)
+
+
+def _run_module_examples(task):
+    """
+    Worker process entry point. Runs all examples belonging to one module.
+
+    Args:
+        task (Tuple[str, List[DocTest], int]): the path of the module, the
+            examples that belong to it, and the verbosity level.
+
+    Returns:
+        List[Dict]: a picklable result for each example containing the
+            pass / fail / skip flags, the run time, the captured stdout,
+            the stdout of the example itself, the failed line number,
+            formatted failure lines, the time spent in each phase, and
+            formatted warnings. Examples that were not run because the
+            maximum number of failures was reached have no result.
+    """
+    modpath, examples, verbose = task
+    module = None
+    results = []
+    for example in examples:
+        if _WORKER_MAXFAIL is not None:
+            failures, maxfail = _WORKER_MAXFAIL
+            if failures.value >= maxfail:
+                break
+        import_seconds = 0
+        if module is None and not example.modname.startswith('<'):
+            tic = time.time()
+            module = cache.MODULE_CACHE.import_module(modpath)
+            import_seconds = time.time() - tic
+        example.module = module
+        max_memory = example.config['capture_memory']
+        with utils.CaptureStdout(supress=True, max_memory=max_memory) as cap:
+            tic = time.time()
+            summary = example.run(verbose=verbose, on_error='return')
+            toc = time.time()
+        example._add_phase_time('import', import_seconds)
+        failure_lines = None
+        if summary['failed']:
+            failure_lines = example.repr_failure()
+            if _WORKER_MAXFAIL is not None:
+                with failures.get_lock():
+                    failures.value += 1
+        results.append({
+            'passed': summary['passed'],
+            'skipped': summary['skipped'],
+            'failed': summary['failed'],
+            'timed_out': summary['timed_out'],
+            'n_seconds': toc - tic,
+            # Output moved to a file is read to send it to the parent
+            'stdout': six.text_type(cap.text),
+            'example_stdout': ''.join(
+                [six.text_type(v) for v in example.logged_stdout.values()
+                 if v]),
+            'failed_lineno': example.failed_lineno(),
+            'failure_lines': failure_lines,
+            'phase_times': list(example.phase_times.items()),
+            'profile_fpaths': example.profile_fpaths,
+            'warnings': [_format_warning(warn)
+                         for warn in (example.warn_list or [])],
+        })
+    return results
+
+
 def _parse_commandline(command=None, style='auto', verbose=None, argv=None):
     # Determine command via sys.argv if not specified
     doctest_example.Config()
@@ -452,6 +1256,73 @@ def _update_argparse_cli(add_argument, prefix=None):
     add_argument(*('--time',), dest='time', action='store_true',
                  help=('Same as if durrations=0'))
 
+    add_argument(*('--jobs',), type=int, dest='jobs', default=None,
+                 help=('parse modules and run examples in a pool of N worker '
+                       'processes. N=0 uses one process per cpu'))
+
+    add_argument(*('--isolate',), type=str, dest='isolate',
+                 choices=['none', 'fork', 'fork-example'], default=None,
+                 help=('import modules once and run the examples of each '
+                       'module (fork) or each example (fork-example) in a '
+                       'forked child process, so changes to global state do '
+                       'not leak between them'))
+
+    add_argument(*('-x', '--exitfirst'), dest='maxfail', action='store_const',
+                 const=1, help='stop after the first failing example')
+
+    add_argument(*('--maxfail',), type=int, dest='maxfail', default=None,
+                 help=('stop after N failing examples. The failures found so '
+                       'far are still reported'))
+
+    add_argument(*('--lf', '--last-failed'), dest='last_failed',
+                 action='store_true',
+                 help=('only run the examples that failed last time, or '
+                       'everything if none failed'))
+
+    add_argument(*('--ff', '--failed-first'), dest='failed_first',
+                 action='store_true',
+                 help=('run the examples that failed last time first, then '
+                       'all others'))
+
+    add_argument(*('--num-shards',), type=int, dest='num_shards',
+                 default=None,
+                 help=('split the examples into N shards with about the '
+                       'same total runtime, based on the durations recorded '
+                       'by earlier runs with --cache-dir and without shards'))
+
+    add_argument(*('--shard-id',), type=int, dest='shard_id', default=None,
+                 help='only run the examples of shard K of --num-shards')
+
+    add_argument(*('--cache-dir',), type=str, dest='cache_dpath',
+                 nargs='?', const='.xdoctest_cache', default=None,
+                 help=('cache parsed doctests and compiled code in this '
+                       'directory and reuse them while the source is unchanged. '
+                       'Defaults to .xdoctest_cache if no value is given'))
+
+    add_argument(*('--watch',), dest='watch', action='store_true',
+                 help=('keep running and re-run the examples in modules '
+                       'whose content changes. Each re-run rewrites the '
+                       '--report-file'))
+
+    add_argument(*('--changed',), dest='changed', action='store_true',
+                 help=('only run examples that changed or did not pass '
+                       'since the last run with --changed'))
+
+    add_argument(*('--phase-times',), dest='phase_times',
+                 action='store_true',
+                 help=('report the time spent parsing, importing, compiling, '
+                       'executing, checking, and reporting examples'))
+
+    add_argument(*('--report-format',), type=str, dest='report_format',
+                 choices=['jsonl', 'junit'], default=None,
+                 help=('stream a machine readable record of each example to '
+                       '--report-file as soon as it finishes'))
+
+    add_argument(*('--report-file',), type=str, dest='report_file',
+                 default=None,
+                 help=('path of the machine readable report. Defaults to '
+                       'xdoctest-report.jsonl or xdoctest-junit.xml'))
+
     add_argument_kws = [
         # (['--style'], dict(dest='style',
         #                    type=str, help='choose your style',
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+A server that keeps the tested package imported between runs.
+
+Importing a large package and parsing its doctests often takes longer than
+running the examples that changed. ``xdoctest --serve`` starts a process that
+runs the doctests requested by ``xdoctest --client`` invocations, which accept
+the same arguments as a normal run. The server keeps the following in memory
+between requests:
+
+    * the imported modules of the tested package. Before each request the
+      modules whose content changed are reloaded, all others stay imported.
+
+    * the parsed doctests of each module (the parse cache of the
+      ``--cache-dir``, which defaults to ``.xdoctest_cache`` for requests).
+
+    * the compiled code of each example.
+
+Requests are read from a Unix socket (``.xdoctest_cache/server.sock`` by
+default) and run one at a time, in the working directory of the client. The
+client prints the output of the run and exits with its exit code. If no server
+is listening, the client runs the doctests itself.
+
+Modules that import a changed module keep references to its old objects
+until they are changed as well. Restart the server if a change does not seem
+to take effect.
+
+CommandLine:
+    python -m xdoctest --serve &
+    python -m xdoctest --client xdoctest all
+    python -m xdoctest --client xdoctest xdoctest.sharding:0 --verbose=1
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+from os.path import join, exists, dirname
+import json
+import os
+import socket
+import sys
+import traceback
+from xdoctest import cache
+from xdoctest import utils
+from xdoctest.exceptions import ServerUnavailable
+
+
+DEFAULT_SOCKET_FPATH = join(cache.DEFAULT_CACHE_DPATH, 'server.sock')
+
+# Options that do not make sense for a single request
+_REFUSED_ARGS = ['--serve', '--client', '--watch']
+
+_CHUNKSIZE = 65536
+
+
+class DoctestServer(object):
+    """
+    Runs the requests of clients in this process.
+
+    Args:
+        exclude (List[str]): glob patterns of module names that are never
+            reloaded
+
+    Example:
+        >>> from xdoctest.server import *
+        >>> from xdoctest import utils
+        >>> temp = utils.TempDoctest('>>> x = 1', modname='server_demo')
+        >>> self = DoctestServer()
+        >>> reply = self.handle({'argv': [temp.modpath, 'all'],
+        ...                      'cwd': temp.dpath})
+        >>> assert reply['exit_code'] == 0
+        >>> assert '1 passed' in reply['stdout']
+        >>> reply = self.handle({'argv': [temp.modpath, 'all', '--watch']})
+        >>> assert reply['exit_code'] == 2
+    """
+    def __init__(self, exclude=None):
+        self.exclude = [] if exclude is None else exclude
+        self.watchers = {}
+        self.n_requests = 0
+
+    def refresh(self, argv):
+        """
+        Reloads the modules of the requested package that changed since the
+        previous request for it.
+
+        Returns:
+            List[str]: the paths of the reloaded modules
+        """
+        from xdoctest import runner
+        modpath = _target_modpath(argv)
+        if modpath is None:
+            return []
+        watcher = self.watchers.get(modpath, None)
+        if watcher is None:
+            # Record the state of the files before they are first imported
+            self.watchers[modpath] = runner._ModuleWatcher(modpath,
+                                                           self.exclude)
+            return []
+        changed_modpaths = watcher.poll()
+        for changed_modpath in changed_modpaths:
+            runner._reload_modpath(changed_modpath)
+        return changed_modpaths
+
+    def handle(self, request):
+        """
+        Runs one request and returns its reply.
+
+        Args:
+            request (Dict): contains ``argv``, the command line arguments of
+                the client, and ``cwd``, its working directory
+
+        Returns:
+            Dict: the ``stdout`` and ``stderr`` text of the run and its
+                ``exit_code``
+        """
+        from xdoctest import __main__
+        self.n_requests += 1
+        argv = list(request.get('argv', []))
+        cwd = request.get('cwd', None) or os.getcwd()
+
+        refused = [arg for arg in argv if arg.split('=')[0] in _REFUSED_ARGS]
+        if refused:
+            return {
+                'stdout': '',
+                'stderr': 'the xdoctest server does not accept {}\n'.format(
+                    ', '.join(refused)),
+                'exit_code': 2,
+            }
+        if not any(arg.split('=')[0] == '--cache-dir' for arg in argv):
+            argv += ['--cache-dir', cache.DEFAULT_CACHE_DPATH]
+
+        exit_code = 0
+        orig_cwd = os.getcwd()
+        orig_argv = sys.argv
+        orig_path = sys.path[:]
+        orig_stderr = sys.stderr
+        cap_stderr = utils.TeeStringIO()
+        with utils.CaptureStdout(supress=True) as cap:
+            sys.stderr = cap_stderr
+            try:
+                os.chdir(cwd)
+                # Mimic running ``python -m xdoctest`` in the client directory
+                sys.argv = ['xdoctest'] + argv
+                sys.path.insert(0, cwd)
+                changed_modpaths = self.refresh(argv)
+                if changed_modpaths:
+                    print('reloaded {} changed module(s)'.format(
+                        len(changed_modpaths)))
+                __main__.main(argv)
+            except SystemExit as ex:
+                exit_code = _exit_code(ex.code)
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                sys.stderr = orig_stderr
+                sys.argv = orig_argv
+                sys.path[:] = orig_path
+                os.chdir(orig_cwd)
+        reply = {
+            'stdout': cap.text,
+            'stderr': cap_stderr.getvalue(),
+            'exit_code': exit_code,
+        }
+        cap.close()
+        cap_stderr.close()
+        return reply
+
+
+def serve(socket_fpath=None, max_requests=None):
+    """
+    Runs the requests of clients until shut down or interrupted.
+
+    Args:
+        socket_fpath (str): path of the Unix socket to listen on. Defaults to
+            ``DEFAULT_SOCKET_FPATH``.
+        max_requests (int): stop after this many requests. Defaults to None,
+            which runs until a shutdown request or Ctrl+C.
+    """
+    if socket_fpath is None:
+        socket_fpath = DEFAULT_SOCKET_FPATH
+    if not hasattr(socket, 'AF_UNIX'):  # nocover
+        raise RuntimeError('Unix sockets are not supported on this platform')
+    if exists(socket_fpath):
+        if _is_listening(socket_fpath):
+            raise RuntimeError('an xdoctest server is already listening on '
+                               '{}'.format(socket_fpath))
+        # The socket of a server that did not shut down cleanly
+        os.remove(socket_fpath)
+    if dirname(socket_fpath):
+        utils.ensuredir(dirname(socket_fpath))
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server = DoctestServer()
+    try:
+        sock.bind(socket_fpath)
+        sock.listen(5)
+        print('xdoctest server listening on {}. Press Ctrl+C to stop.'.format(
+            socket_fpath))
+        sys.stdout.flush()
+        while max_requests is None or server.n_requests < max_requests:
+            conn, _ = sock.accept()
+            try:
+                try:
+                    request = _recv_json(conn)
+                except ValueError as ex:
+                    _send_json(conn, {'stdout': '', 'exit_code': 2,
+                                      'stderr': 'bad request: {}\n'.format(ex)})
+                    continue
+                if request.get('action', None) == 'shutdown':
+                    _send_json(conn, {'stdout': '', 'stderr': '',
+                                      'exit_code': 0})
+                    break
+                _send_json(conn, server.handle(request))
+            except socket.error:  # nocover
+                # The client went away, which must not stop the server
+                pass
+            finally:
+                conn.close()
+    except KeyboardInterrupt:
+        print('Caught CTRL+c: Stopping server')
+    finally:
+        sock.close()
+        if exists(socket_fpath):
+            os.remove(socket_fpath)
+    print('xdoctest server handled {} request(s)'.format(server.n_requests))
+
+
+def request(argv, socket_fpath=None, cwd=None):
+    """
+    Asks a server to run doctests.
+
+    Args:
+        argv (List[str]): the command line arguments of the run
+        socket_fpath (str): path of the socket of the server
+        cwd (str): directory to run in. Defaults to the current directory.
+
+    Returns:
+        Dict: the ``stdout`` and ``stderr`` text of the run and its
+            ``exit_code``
+
+    Raises:
+        ServerUnavailable: if no server is listening on the socket
+    """
+    if cwd is None:
+        cwd = os.getcwd()
+    sock = _connect(socket_fpath)
+    try:
+        _send_json(sock, {'argv': list(argv), 'cwd': cwd})
+        return _recv_json(sock)
+    finally:
+        sock.close()
+
+
+def client(argv, socket_fpath=None):
+    """
+    Runs doctests in a server and prints their output.
+
+    Returns:
+        int: the exit code of the run
+
+    Raises:
+        ServerUnavailable: if no server is listening on the socket
+    """
+    reply = request(argv, socket_fpath)
+    sys.stdout.write(reply['stdout'])
+    sys.stdout.flush()
+    sys.stderr.write(reply['stderr'])
+    return reply['exit_code']
+
+
+def shutdown(socket_fpath=None):
+    """
+    Stops a server after its current request.
+
+    Raises:
+        ServerUnavailable: if no server is listening on the socket
+    """
+    sock = _connect(socket_fpath)
+    try:
+        _send_json(sock, {'action': 'shutdown'})
+        _recv_json(sock)
+    finally:
+        sock.close()
+
+
+def _strip_client_args(argv):
+    """
+    Removes the arguments that only concern the client.
+
+    Example:
+        >>> from xdoctest.server import _strip_client_args
+        >>> _strip_client_args(['--client', 'pkg', '--socket', 'a.sock', 'all'])
+        ['pkg', 'all']
+        >>> _strip_client_args(['pkg', '--socket=a.sock', '--client'])
+        ['pkg']
+    """
+    stripped = []
+    argv = list(argv)
+    while argv:
+        arg = argv.pop(0)
+        if arg == '--client' or arg.startswith('--socket='):
+            continue
+        if arg == '--socket':
+            if argv:
+                argv.pop(0)
+            continue
+        stripped.append(arg)
+    return stripped
+
+
+def _target_modpath(argv):
+    """
+    Returns the path of the package a request runs, or None if it cannot be
+    found (in which case the run reports the error).
+    """
+    from xdoctest import __main__
+    from xdoctest import core
+    args, _ = __main__._build_parser().parse_known_args(argv)
+    modname = args.modname
+    if modname is None:
+        if not args.arg:
+            return None
+        modname = args.arg[0]
+    try:
+        return core._rectify_to_modpath(modname)
+    except Exception:
+        return None
+
+
+def _exit_code(code):
+    """
+    Converts the argument of :class:`SystemExit` into a process exit code.
+
+    Example:
+        >>> from xdoctest.server import _exit_code
+        >>> _exit_code(None), _exit_code(3), _exit_code('error')
+        (0, 3, 1)
+    """
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    sys.stderr.write('{}\n'.format(code))
+    return 1
+
+
+def _connect(socket_fpath=None):
+    if socket_fpath is None:
+        socket_fpath = DEFAULT_SOCKET_FPATH
+    if not hasattr(socket, 'AF_UNIX'):  # nocover
+        raise ServerUnavailable('Unix sockets are not supported on this '
+                                'platform')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_fpath)
+    except socket.error:
+        sock.close()
+        raise ServerUnavailable('no xdoctest server is listening on '
+                                '{}'.format(socket_fpath))
+    return sock
+
+
+def _is_listening(socket_fpath):
+    try:
+        _connect(socket_fpath).close()
+    except ServerUnavailable:
+        return False
+    return True
+
+
+def _send_json(sock, data):
+    text = json.dumps(data)
+    if not isinstance(text, bytes):
+        text = text.encode('utf8')
+    sock.sendall(text + b'\n')
+    # Signal the end of the message to the reader
+    sock.shutdown(socket.SHUT_WR)
+
+
+def _recv_json(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(_CHUNKSIZE)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    text = b''.join(chunks).decode('utf8')
+    if not text.strip():
+        raise ValueError('empty message')
+    return json.loads(text)
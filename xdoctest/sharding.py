@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Splitting the examples of a run into shards that run on separate machines.
+
+Each machine collects every example and computes the same split, then only
+runs its own shard. Examples are assigned so each shard has about the same
+total runtime, using the durations recorded by previous runs without shards
+in the ``durations.json`` file of the cache directory. Only runs that are
+given a cache directory (``--cache-dir`` or ``--xdoctest-cache-dir``) record
+durations. Examples without a recorded duration count as the average of the
+known durations. Without any recorded durations every shard gets the same
+number of examples.
+
+The split only depends on the example keys, the number of shards, and the
+durations, so it is deterministic as long as every machine sees the same
+durations file (e.g. by restoring the same cache directory on every node).
+For this reason sharded runs never update the durations. Keys do not
+contain absolute paths, so the checkout location does not matter.
+
+CommandLine:
+    python -m xdoctest xdoctest all --cache-dir
+    python -m xdoctest xdoctest all --num-shards 2 --shard-id 0
+    python -m xdoctest xdoctest all --num-shards 2 --shard-id 1
+    pytest --xdoctest --xdoctest-cache-dir
+    pytest --xdoctest --xdoctest-num-shards 2 --xdoctest-shard-id 0
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+import heapq
+
+
+# Durations below this are rounded up, so examples that take no measurable
+# time are still spread over the shards.
+_MIN_WEIGHT = 1e-6
+
+
+def example_key(example):
+    """
+    The key of an example that is the same on every machine.
+
+    Example:
+        >>> from xdoctest.sharding import *
+        >>> from xdoctest import doctest_example
+        >>> from xdoctest import sharding
+        >>> example = doctest_example.DocTest('>>> x = 1', callname='Foo.bar',
+        ...                                   modpath=sharding.__file__, num=1)
+        >>> print(example_key(example))
+        xdoctest.sharding::Foo.bar:1
+    """
+    return example.modname + '::' + example.unique_callname
+
+
+def assign_shards(keys, num_shards, durations=None):
+    """
+    Assigns items to shards so the shards take about the same time.
+
+    Items are handed out from the slowest to the fastest, each to the shard
+    with the least total time so far (the longest processing time first
+    heuristic). Ties are broken by key and shard index, so the result does
+    not depend on the order of the keys.
+
+    Args:
+        keys (List[str]): the key of each item
+        num_shards (int): the number of shards
+        durations (Dict[str, float]): seconds each key took previously
+
+    Returns:
+        List[List[int]]: the indices of the items in each shard, in their
+            original order.
+
+    Example:
+        >>> from xdoctest.sharding import *
+        >>> keys = ['a', 'b', 'c', 'd', 'e']
+        >>> # Without durations each shard gets the same number of items
+        >>> assign_shards(keys, 2)
+        [[0, 2, 4], [1, 3]]
+        >>> # The slow item is balanced against all the others
+        >>> durations = {'a': 1.0, 'b': 1.0, 'c': 4.0, 'd': 1.0, 'e': 1.0}
+        >>> assign_shards(keys, 2, durations)
+        [[2], [0, 1, 3, 4]]
+    """
+    if num_shards < 1:
+        raise ValueError('num_shards must be at least 1, got {}'.format(
+            num_shards))
+    if durations is None:
+        durations = {}
+    known = [durations[key] for key in keys if key in durations]
+    default = sum(known) / len(known) if known else 1.0
+    weights = [max(durations.get(key, default), _MIN_WEIGHT) for key in keys]
+
+    order = sorted(range(len(keys)), key=lambda i: (-weights[i], keys[i], i))
+    heap = [(0.0, shard) for shard in range(num_shards)]
+    shards = [[] for _ in range(num_shards)]
+    for index in order:
+        load, shard = heapq.heappop(heap)
+        shards[shard].append(index)
+        heapq.heappush(heap, (load + weights[index], shard))
+    return [sorted(indices) for indices in shards]
+
+
+def verify_shards(shards, n_items):
+    """
+    Checks that the union of the shards contains every item exactly once.
+
+    Args:
+        shards (List[List[int]]): the indices of the items in each shard
+        n_items (int): the total number of items
+
+    Raises:
+        ValueError: if an item is missing, duplicated, or out of range
+
+    Example:
+        >>> from xdoctest.sharding import *
+        >>> verify_shards(assign_shards(list('abcdefg'), 3), 7)
+        >>> import pytest
+        >>> with pytest.raises(ValueError):
+        ...     verify_shards([[0, 1], [1]], 3)
+    """
+    counts = [0] * n_items
+    for indices in shards:
+        for index in indices:
+            if not 0 <= index < n_items:
+                raise ValueError('shard contains unknown item {}'.format(index))
+            counts[index] += 1
+    missing = [index for index, count in enumerate(counts) if count == 0]
+    repeated = [index for index, count in enumerate(counts) if count > 1]
+    if missing or repeated:
+        raise ValueError('shards do not cover every item exactly once: '
+                         'missing={}, repeated={}'.format(missing, repeated))
+
+
+def select_shard(items, shard_id, num_shards, keys, durations=None):
+    """
+    Returns the items that belong to one shard.
+
+    Args:
+        items (List): the items to split
+        shard_id (int): the index of the shard to return, starting at 0
+        num_shards (int): the number of shards
+        keys (List[str]): the key of each item
+        durations (Dict[str, float]): seconds each key took previously
+
+    Returns:
+        List: the items of the shard, in their original order
+
+    Example:
+        >>> from xdoctest.sharding import *
+        >>> items = ['a', 'b', 'c', 'd', 'e']
+        >>> shards = [select_shard(items, k, 2, items) for k in range(2)]
+        >>> print(shards)
+        [['a', 'c', 'e'], ['b', 'd']]
+    """
+    if not 0 <= shard_id < num_shards:
+        raise ValueError('shard_id must be in the range [0, {}), got '
+                         '{}'.format(num_shards, shard_id))
+    shards = assign_shards(keys, num_shards, durations)
+    verify_shards(shards, len(items))
+    return [items[index] for index in shards[shard_id]]
@@ -442,6 +442,46 @@ def parse_calldefs(source=None, fpath=None):
         raise
 
 
+# Files at least this large are scanned through a memory map
+_MMAP_THRESHOLD = 1 << 16
+
+
+def contains_doctest_prompt(fpath):
+    """
+    Quickly checks if a file could contain any doctest examples by searching
+    its raw bytes for the ``>>>`` prompt. This is much cheaper than parsing
+    the file, and a file without a prompt has nothing to run.
+
+    Args:
+        fpath (str): path to the file
+
+    Returns:
+        bool: False if the file definitely does not contain a prompt
+
+    Example:
+        >>> from xdoctest import static_analysis
+        >>> from xdoctest import utils
+        >>> from os.path import join
+        >>> temp = utils.TempDir()
+        >>> fpath = join(temp.ensure(), 'no_doctests.py')
+        >>> with open(fpath, 'w') as file:
+        ...     _ = file.write('x = 1')
+        >>> assert not static_analysis.contains_doctest_prompt(fpath)
+        >>> fpath = static_analysis.__file__.replace('.pyc', '.py')
+        >>> assert static_analysis.contains_doctest_prompt(fpath)
+    """
+    import contextlib
+    import mmap
+    prompt = b'>>>'
+    with open(fpath, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < _MMAP_THRESHOLD:
+            return prompt in file.read()
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        with contextlib.closing(data):
+            return data.find(prompt) != -1
+
+
 def _parse_static_node_value(node):
     """
     Extract a constant value from a node if possible
@@ -689,11 +729,74 @@ def is_balanced_statement(lines, only_tokens=False):
         return True
 
 
+def logical_line_starts(lines):
+    r"""
+    Finds the lines that begin a logical line of code using a single pass of
+    the tokenizer. Lines that continue an open bracket, a backslash, or a
+    multi-line string are not logical line starts. Blank and comment-only
+    lines outside of these spans are.
+
+    This gives the same answer as repeatedly checking
+    :func:`is_balanced_statement` on slices of the source, but runs in linear
+    time.
+
+    Args:
+        lines (List[str]): lines of source code without trailing newlines
+
+    Returns:
+        List[int]: sorted indices of the lines that begin a logical line
+
+    Raises:
+        tokenize.TokenError: if the source ends inside a bracket or string
+        SyntaxError: if the tokenizer cannot process the source (e.g.
+            inconsistent indentation) or if a bracket is closed before it was
+            opened.
+
+    Example:
+        >>> lines = ['x = [1,', '     2]', '# comment', "y = '''", "'''", 'z']
+        >>> logical_line_starts(lines)
+        [0, 2, 3, 5]
+        >>> lines = ['def foo():', '    return 0', '3']
+        >>> logical_line_starts(lines)
+        [0, 1, 2]
+        >>> import pytest
+        >>> with pytest.raises(tokenize.TokenError):
+        ...     logical_line_starts(['x = ('])
+    """
+    lines = list(lines)
+    if not lines:
+        return []
+    iterable = iter([line + '\n' for line in lines])
+    def _readline():
+        return next(iterable, '')
+    starts = [0]
+    depth = 0
+    for tok in tokenize.generate_tokens(_readline):
+        tok_type, tok_str = tok[0], tok[1]
+        if tok_type == tokenize.OP:
+            if tok_str in '([{':
+                depth += 1
+            elif tok_str in ')]}':
+                depth -= 1
+                if depth < 0:
+                    raise SyntaxError('unbalanced closing bracket')
+        elif tok_type == tokenize.NEWLINE or (tok_type == tokenize.NL and depth == 0):
+            # the line after the end of this token starts a new logical line
+            next_idx = tok[3][0]
+            if next_idx < len(lines) and next_idx > starts[-1]:
+                starts.append(next_idx)
+    return starts
+
+
 def extract_comments(source):
     """
     Returns the text in each comment in a block of python code.
     Uses tokenize to account for quotations.
 
+    Tokenizing is only necessary when a ``#`` could be inside of a string.
+    Lines without a ``#`` cannot contain a comment, and if the code has no
+    quotes, then every ``#`` starts a comment.
+
     CommandLine:
         python -m xdoctest.static_analysis extract_comments
 
@@ -709,14 +812,26 @@ def extract_comments(source):
         >>> assert comments == ['# comment 1', '# comment 2']
         >>> comments = list(extract_comments(source.splitlines()))
         >>> assert comments == ['# comment 1', '# comment 2']
+        >>> # Code without quotes does not need to be tokenized
+        >>> comments = list(extract_comments('x = 1  # comment 1\\ny = 2'))
+        >>> assert comments == ['# comment 1']
     """
     if isinstance(source, six.string_types):
         lines = source.splitlines()
     else:
         lines = source
 
+    lines = [line for line in lines if line]
+    comment_lines = [line for line in lines if '#' in line]
+    if not comment_lines:
+        return
+    if not any("'" in line or '"' in line for line in lines):
+        for line in comment_lines:
+            yield line[line.index('#'):]
+        return
+
     # Only iterate through non-empty lines otherwise tokenize will stop short
-    iterable = (line for line in lines if line)
+    iterable = iter(lines)
     def _readline():
         return next(iterable)
     try:
@@ -27,10 +27,10 @@ from xdoctest.utils.util_str import (add_line_numbers, codeblock, color_text,
                                      ensure_unicode, highlight_code, indent,
                                      strip_ansi,)
 from xdoctest.utils.util_stream import (CaptureStdout, CaptureStream,
-                                        TeeStringIO,)
+                                        SpilledText, TeeStringIO,)
 
 __all__ = ['CaptureStdout', 'CaptureStream', 'NiceRepr', 'PythonPathContext',
-           'TeeStringIO', 'TempDir', 'TempDoctest', 'add_line_numbers',
+           'SpilledText', 'TeeStringIO', 'TempDir', 'TempDoctest', 'add_line_numbers',
            'codeblock', 'color_text', 'ensure_unicode', 'ensuredir',
            'highlight_code', 'import_module_from_name',
            'import_module_from_path', 'indent', 'is_modname_importable',
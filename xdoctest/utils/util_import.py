@@ -359,6 +359,129 @@ def _platform_pylib_exts():  # nocover
     return tuple(valid_exts)
 
 
+class _SysPathIndex(object):
+    """
+    Caches the listings of the directories on the python path, so finding the
+    few directories that could contain a module is a dictionary lookup instead
+    of several stat calls per directory.
+
+    The directories that might contain a top level name are remembered for
+    each distinct search path, so they are recomputed when ``sys.path``
+    changes. The index is only a filter: candidates are still verified on
+    disk. Before a result is trusted, the directories searched ahead of it
+    (all of them when nothing is found) whose modification time changed are
+    listed again and the search is repeated, so newly created modules are
+    found as well, including ones that shadow a previous result.
+
+    Example:
+        >>> from xdoctest.utils.util_import import _SysPathIndex
+        >>> from xdoctest import utils
+        >>> from os.path import join
+        >>> temp = utils.TempDir()
+        >>> dpath1 = utils.ensuredir((temp.ensure(), 'dir1'))
+        >>> dpath2 = utils.ensuredir((temp.ensure(), 'dir2'))
+        >>> _ = open(join(dpath2, 'mymod.py'), 'w').write('')
+        >>> self = _SysPathIndex()
+        >>> names = {'mymod', 'mymod.py'}
+        >>> assert self.candidates([dpath1, dpath2], names) == [dpath2]
+        >>> assert self.candidates([dpath1], names) == []
+        >>> # Relative directories are resolved in the working directory
+        >>> orig_cwd = os.getcwd()
+        >>> os.chdir(dpath1)
+        >>> assert self.candidates(['.'], names) == []
+        >>> os.chdir(dpath2)
+        >>> assert self.candidates(['.'], names) == ['.']
+        >>> os.chdir(orig_cwd)
+
+    Example:
+        >>> # A module created in an earlier directory shadows a later one
+        >>> from xdoctest.utils.util_import import _syspath_modname_to_modpath
+        >>> from xdoctest import utils
+        >>> from os.path import join
+        >>> import time
+        >>> temp = utils.TempDir()
+        >>> dpath1 = utils.ensuredir((temp.ensure(), 'dir1'))
+        >>> dpath2 = utils.ensuredir((temp.ensure(), 'dir2'))
+        >>> _ = open(join(dpath2, 'shadowmod.py'), 'w').write('')
+        >>> sys_path = [dpath1, dpath2]
+        >>> found = _syspath_modname_to_modpath('shadowmod', sys_path=sys_path)
+        >>> assert found == join(dpath2, 'shadowmod.py')
+        >>> # make sure the modification time of the directory changes
+        >>> time.sleep(0.01)
+        >>> _ = open(join(dpath1, 'shadowmod.py'), 'w').write('')
+        >>> found = _syspath_modname_to_modpath('shadowmod', sys_path=sys_path)
+        >>> assert found == join(dpath1, 'shadowmod.py')
+    """
+    # Number of remembered searches before they are all forgotten
+    _MAX_MEMO = 4096
+
+    def __init__(self):
+        self._listings = {}
+        self._memo = {}
+
+    @staticmethod
+    def _key(dpath):
+        # Relative entries (e.g. '.') depend on the working directory
+        return dpath if os.path.isabs(dpath) else abspath(dpath)
+
+    def _listing(self, dpath):
+        key = self._key(dpath)
+        entry = self._listings.get(key, None)
+        if entry is None:
+            entry = self._listings[key] = _read_listing(key)
+        return entry[1]
+
+    def candidates(self, dpaths, names):
+        """
+        Returns the directories in ``dpaths`` that contain any of ``names``
+        """
+        memo_key = (tuple(map(self._key, dpaths)), frozenset(names))
+        found = self._memo.get(memo_key, None)
+        if found is None:
+            if len(self._memo) > self._MAX_MEMO:
+                self._memo.clear()
+            found = [dpath for dpath in dpaths
+                     if not self._listing(dpath).isdisjoint(names)]
+            self._memo[memo_key] = found
+        return found
+
+    def refresh(self, dpaths):
+        """
+        Lists the directories in ``dpaths`` that changed since they were
+        listed. Returns True if any of them changed.
+        """
+        changed = False
+        for dpath in dpaths:
+            key = self._key(dpath)
+            entry = self._listings.get(key, None)
+            if entry is not None and entry[0] != _mtime(key):
+                self._listings[key] = _read_listing(key)
+                changed = True
+        if changed:
+            self._memo.clear()
+        return changed
+
+
+def _mtime(dpath):
+    try:
+        stat = os.stat(dpath)
+    except OSError:
+        return None
+    return getattr(stat, 'st_mtime_ns', stat.st_mtime)
+
+
+def _read_listing(dpath):
+    mtime = _mtime(dpath)
+    try:
+        names = frozenset(os.listdir(dpath))
+    except OSError:
+        names = frozenset()
+    return mtime, names
+
+
+_SYSPATH_INDEX = _SysPathIndex()
+
+
 def _syspath_modname_to_modpath(modname, sys_path=None, exclude=None):
     """
     syspath version of modname_to_modpath
@@ -406,13 +529,12 @@ def _syspath_modname_to_modpath(modname, sys_path=None, exclude=None):
         return True
 
     _fname_we = modname.replace('.', os.path.sep)
-    candidate_fnames = [
-        _fname_we + '.py',
-        # _fname_we + '.pyc',
-        # _fname_we + '.pyo',
-    ]
-    # Add extension library suffixes
-    candidate_fnames += [_fname_we + ext for ext in _platform_pylib_exts()]
+    exts = ['.py'] + list(_platform_pylib_exts())
+    candidate_fnames = [_fname_we + ext for ext in exts]
+    # Only directories containing the top level package or module can
+    # contain the requested module
+    toplevel = modname.split('.')[0]
+    toplevel_names = {toplevel}.union(toplevel + ext for ext in exts)
 
     if sys_path is None:
         sys_path = sys.path
@@ -431,20 +553,33 @@ def _syspath_modname_to_modpath(modname, sys_path=None, exclude=None):
         candidate_dpaths = [p for p in candidate_dpaths
                             if normalize(p) not in real_exclude]
 
-    for dpath in candidate_dpaths:
-        # Check for directory-based modules (has presidence over files)
-        modpath = join(dpath, _fname_we)
-        if exists(modpath):
-            if isfile(join(modpath, '__init__.py')):
-                if _isvalid(modpath, dpath):
-                    return modpath
-
-        # If that fails, check for file-based modules
-        for fname in candidate_fnames:
-            modpath = join(dpath, fname)
-            if isfile(modpath):
-                if _isvalid(modpath, dpath):
-                    return modpath
+    def _search(dpaths):
+        for dpath in dpaths:
+            # Check for directory-based modules (has presidence over files)
+            modpath = join(dpath, _fname_we)
+            if exists(modpath):
+                if isfile(join(modpath, '__init__.py')):
+                    if _isvalid(modpath, dpath):
+                        return dpath, modpath
+
+            # If that fails, check for file-based modules
+            for fname in candidate_fnames:
+                modpath = join(dpath, fname)
+                if isfile(modpath):
+                    if _isvalid(modpath, dpath):
+                        return dpath, modpath
+
+    found = _search(_SYSPATH_INDEX.candidates(candidate_dpaths,
+                                              toplevel_names))
+    if found is None:
+        ahead_dpaths = candidate_dpaths
+    else:
+        # A module created in an earlier directory would shadow this one
+        ahead_dpaths = candidate_dpaths[:candidate_dpaths.index(found[0])]
+    if _SYSPATH_INDEX.refresh(ahead_dpaths):
+        found = _search(_SYSPATH_INDEX.candidates(candidate_dpaths,
+                                                  toplevel_names))
+    return None if found is None else found[1]
 
 
 def modname_to_modpath(modname, hide_init=True, hide_main=False, sys_path=None):
@@ -6,13 +6,52 @@ from __future__ import print_function, division, absolute_import, unicode_litera
 import sys
 import six
 import io
+import tempfile
+
+# Text moved to a temporary file is stored with a fixed number of bytes per
+# character, so positions in the file are positions in the text times four.
+_SPILL_ENCODING = 'utf-32-le'
+_SPILL_WIDTH = 4
 
 
 class TeeStringIO(io.StringIO):
-    """ simple class to write to a stdout and a StringIO """
-    def __init__(self, redirect=None):
+    """
+    simple class to write to a stdout and a StringIO
+
+    Args:
+        redirect (io.TextIOBase): if specified, everything written is also
+            written to this stream.
+        max_memory (int): if specified, once more than this many characters
+            are stored, the text is moved to a temporary file and everything
+            written afterwards is stored there as well. Parts of the text
+            returned by :func:`read_part` then refer to the file instead of
+            being read (see :class:`SpilledText`).
+
+    Example:
+        >>> self = TeeStringIO(max_memory=10)
+        >>> self.write('hello ')
+        >>> assert not self.spilled
+        >>> self.write('world ♥')
+        >>> assert self.spilled
+        >>> self.write('!')
+        >>> assert self.getvalue() == 'hello world ♥!'
+        >>> self.seek(6)
+        6
+        >>> assert self.read() == 'world ♥!'
+        >>> assert self.tell() == 14
+        >>> self.close()
+    """
+    def __init__(self, redirect=None, max_memory=None):
         self.redirect = redirect
+        self.max_memory = max_memory
+        self._spill = None
+        self._spill_ref = None
         super(TeeStringIO, self).__init__()
+        # see CaptureStdout.stream_to
+        self.consumer = None
+        self.stream_threshold = None
+        self.streaming = False
+        self._stream_pos = 0
 
     def isatty(self):  # nocover
         """
@@ -38,13 +77,164 @@ class TeeStringIO(io.StringIO):
         if six.PY2:
             from xdoctest.utils.util_str import ensure_unicode
             msg = ensure_unicode(msg)
-        super(TeeStringIO, self).write(msg)
+        if self.streaming:
+            self.consumer.feed(msg)
+            return
+        if self._spill is not None:
+            self._spill.write(msg.encode(_SPILL_ENCODING, 'surrogatepass'))
+        else:
+            super(TeeStringIO, self).write(msg)
+            if (self.max_memory is not None and
+                    super(TeeStringIO, self).tell() > self.max_memory):
+                self._spill_to_file()
+        if self.consumer is not None:
+            if self.tell() - self._stream_pos > self.stream_threshold:
+                # Hand over what was captured so far and stop storing
+                self.seek(self._stream_pos)
+                self.consumer.feed(self.read())
+                self.seek(self._stream_pos)
+                self.truncate()
+                self.streaming = True
 
     def flush(self):  # nocover
         if self.redirect is not None:
             self.redirect.flush()
         super(TeeStringIO, self).flush()
 
+    @property
+    def spilled(self):
+        """ True if the text was moved to a temporary file """
+        return self._spill is not None
+
+    def _spill_to_file(self):
+        pos = super(TeeStringIO, self).tell()
+        text = super(TeeStringIO, self).getvalue()
+        spill_ref = _SpillFile()
+        spill = spill_ref.file
+        spill.write(text.encode(_SPILL_ENCODING, 'surrogatepass'))
+        spill.seek(pos * _SPILL_WIDTH)
+        super(TeeStringIO, self).seek(0)
+        super(TeeStringIO, self).truncate()
+        self._spill = spill
+        self._spill_ref = spill_ref
+
+    def read_part(self, start):
+        """
+        Returns the text written since position ``start`` and moves to the
+        end. Once the text was moved to a file, the text is not read, and a
+        :class:`SpilledText` that refers to the file is returned instead.
+
+        Example:
+            >>> self = TeeStringIO(max_memory=4)
+            >>> self.write('ab')
+            >>> assert self.read_part(0) == 'ab'
+            >>> self.write('cdefgh')
+            >>> part = self.read_part(2)
+            >>> assert isinstance(part, SpilledText)
+            >>> self.close()
+            >>> assert len(part) == 6 and six.text_type(part) == 'cdefgh'
+        """
+        if self._spill is None:
+            super(TeeStringIO, self).seek(start)
+            return super(TeeStringIO, self).read()
+        self._spill.seek(0, 2)
+        stop = self._spill.tell() // _SPILL_WIDTH
+        if stop <= start:
+            return ''
+        return SpilledText(self._spill_ref, start, stop)
+
+    def tell(self):
+        if self._spill is None:
+            return super(TeeStringIO, self).tell()
+        return self._spill.tell() // _SPILL_WIDTH
+
+    def seek(self, pos, whence=0):
+        if self._spill is None:
+            return super(TeeStringIO, self).seek(pos, whence)
+        return self._spill.seek(pos * _SPILL_WIDTH, whence) // _SPILL_WIDTH
+
+    def read(self, size=-1):
+        if self._spill is None:
+            return super(TeeStringIO, self).read(size)
+        if size is not None and size >= 0:
+            size = size * _SPILL_WIDTH
+        else:
+            size = -1
+        data = self._spill.read(size)
+        return data.decode(_SPILL_ENCODING, 'surrogatepass')
+
+    def truncate(self, pos=None):
+        if self._spill is None:
+            return super(TeeStringIO, self).truncate(pos)
+        if pos is not None:
+            pos = pos * _SPILL_WIDTH
+        return self._spill.truncate(pos) // _SPILL_WIDTH
+
+    def getvalue(self):
+        if self._spill is None:
+            return super(TeeStringIO, self).getvalue()
+        pos = self._spill.tell()
+        self._spill.seek(0)
+        data = self._spill.read()
+        self._spill.seek(pos)
+        return data.decode(_SPILL_ENCODING, 'surrogatepass')
+
+    def close(self):
+        # The file is closed once no SpilledText refers to it either
+        self._spill = None
+        self._spill_ref = None
+        super(TeeStringIO, self).close()
+
+
+class _SpillFile(object):
+    """
+    A temporary file that is closed when it is no longer referenced
+    """
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+
+    def __del__(self):
+        self.file.close()
+
+
+@six.python_2_unicode_compatible
+class SpilledText(object):
+    """
+    Captured text that was moved to a temporary file. It is only read into
+    memory when it is converted to text (e.g. with ``six.text_type``).
+
+    Args:
+        spill (_SpillFile): the file that stores the text
+        start (int): the character position of the text in the file
+        stop (int): the character position after the end of the text
+    """
+    def __init__(self, spill, start, stop):
+        self._spill = spill
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __bool__(self):
+        return self.stop > self.start
+
+    __nonzero__ = __bool__
+
+    def __str__(self):
+        file = self._spill.file
+        pos = file.tell()
+        try:
+            file.seek(self.start * _SPILL_WIDTH)
+            data = file.read((self.stop - self.start) * _SPILL_WIDTH)
+        finally:
+            # The stream may still be writing to the end of the file
+            file.seek(pos)
+        return data.decode(_SPILL_ENCODING, 'surrogatepass')
+
+    def __repr__(self):
+        return '<SpilledText of {} characters>'.format(len(self))
+
 
 class CaptureStream(object):
     """
@@ -61,6 +251,14 @@ class CaptureStdout(CaptureStream):
             if True, stdout is not printed while captured
         enabled (bool, default=True):
             does nothing if this is False
+        max_memory (int, default=None):
+            if specified, captured text beyond this many characters is moved
+            to a temporary file (see :class:`TeeStringIO`). The text of
+            each logged part is then not kept in :attr:`parts`, and once the
+            text was moved, :attr:`text` is a :class:`SpilledText` that is
+            only read when it is needed. At most ``max_memory`` characters
+            are then held in memory while capturing, regardless of how large
+            a single part is.
 
     Example:
         >>> self = CaptureStdout(supress=True)
@@ -83,16 +281,39 @@ class CaptureStdout(CaptureStream):
         >>> with self:
         ...     print('dont capture')
         >>> assert self.text is None
+
+    Example:
+        >>> class Consumer(object):
+        ...     def __init__(self):
+        ...         self.started = False
+        ...         self.n_chars = 0
+        ...     def feed(self, text):
+        ...         self.started = True
+        ...         self.n_chars += len(text)
+        ...     text = '<streamed>'
+        >>> self = CaptureStdout(supress=True)
+        >>> consumer = Consumer()
+        >>> self.stream_to(consumer, threshold=100)
+        >>> with self:
+        ...     for i in range(100):
+        ...         print('spam')
+        >>> assert consumer.n_chars == 500
+        >>> assert self.text == '<streamed>'
+        >>> self.stream_to(Consumer(), threshold=100)
+        >>> with self:
+        ...     print('eggs')
+        >>> assert self.text == 'eggs\n'
     """
-    def __init__(self, supress=True, enabled=True):
+    def __init__(self, supress=True, enabled=True, max_memory=None):
         self.enabled = enabled
         self.supress = supress
+        self.max_memory = max_memory
         self.orig_stdout = sys.stdout
         if supress:
             redirect = None
         else:
             redirect = self.orig_stdout
-        self.cap_stdout = TeeStringIO(redirect)
+        self.cap_stdout = TeeStringIO(redirect, max_memory=max_memory)
         self.text = None
 
         self._pos = 0  # keep track of how much has been logged
@@ -101,12 +322,31 @@ class CaptureStdout(CaptureStream):
 
     def log_part(self):
         """ Log what has been captured so far """
-        self.cap_stdout.seek(self._pos)
-        text = self.cap_stdout.read()
+        text = self.cap_stdout.read_part(self._pos)
         self._pos = self.cap_stdout.tell()
-        self.parts.append(text)
+        stream = self.cap_stdout
+        if stream.consumer is not None:
+            if stream.streaming:
+                text = stream.consumer.text
+            stream.consumer = None
+            stream.streaming = False
+        if self.max_memory is None:
+            self.parts.append(text)
         self.text = text
 
+    def stream_to(self, consumer, threshold):
+        """
+        Streams the output of the next part to a consumer once it is large.
+
+        When more than ``threshold`` characters are captured before the next
+        call to :func:`log_part`, they are passed to ``consumer.feed`` along
+        with everything written afterwards instead of being stored. The text
+        logged for the part is then ``consumer.text``.
+        """
+        self.cap_stdout.consumer = consumer
+        self.cap_stdout.stream_threshold = threshold
+        self.cap_stdout._stream_pos = self._pos
+
     def start(self):
         if self.enabled:
             self.text = ''